@@ -0,0 +1,250 @@
+import threading
+import numpy as np
+import pandas as pd
+from datetime import datetime
+
+from onboarding import ITEM_KINDS, iter_employees
+from snapshot import NO_TIME
+
+# Percentiles reported on the SLA page
+PERCENTILES = [0.5, 0.75, 0.9, 0.95]
+
+# Stages measured for each item kind: (stage name, start field, end field).
+# A start field of None means the employee's start date.
+STAGES = {
+    'Document': [
+        ('Uploaded → Verified', 'uploaded', 'verified'),
+        ('Start Date → Verified', None, 'verified'),
+    ],
+    'Task': [
+        ('Started → Completed', 'started', 'completed'),
+        ('Start Date → Completed', None, 'completed'),
+    ],
+    'Compliance': [
+        ('Started → Completed', 'started', 'completed'),
+        ('Start Date → Completed', None, 'completed'),
+    ],
+}
+
+# Turnaround targets in hours; items carrying a due date breach when finished after it
+SLA_TARGET_HOURS = {
+    ('Document', 'Uploaded → Verified'): 48,
+    ('Document', 'Start Date → Verified'): 72,
+    ('Task', 'Started → Completed'): 72,
+    ('Compliance', 'Started → Completed'): 48,
+}
+
+RECORD_COLUMNS = ['employee_id', 'employee', 'department', 'cohort', 'kind', 'item', 'stage',
+                  'hours', 'breached', 'completed_at']
+
+SLICES = {
+    'Department': 'department',
+    'Item': 'item',
+    'Cohort': 'cohort',
+}
+
+
+def get_cohort(start_date):
+    """Return the intake cohort label (start month) for a start date"""
+    return start_date.strftime('%Y-%m')
+
+
+def build_duration_records(emp_data, kind, item_name, item):
+    """Build one duration record per stage for an item that just completed"""
+    records = []
+    for stage, start_field, end_field in STAGES[kind]:
+        end = item.get(end_field)
+        start = emp_data['start_date'] if start_field is None else item.get(start_field)
+        if end is None or start is None:
+            continue
+
+        hours = (end - start).total_seconds() / 3600
+        due_date = item.get('due_date')
+        if start_field is None and due_date is not None:
+            breached = end > due_date
+        else:
+            target = SLA_TARGET_HOURS.get((kind, stage))
+            breached = target is not None and hours > target
+
+        records.append({
+            'employee_id': emp_data['id'],
+            'employee': emp_data['name'],
+            'department': emp_data['department'],
+            'cohort': get_cohort(emp_data['start_date']),
+            'kind': kind,
+            'item': item_name,
+            'stage': stage,
+            'hours': hours,
+            'breached': breached,
+            'completed_at': end,
+        })
+    return records
+
+
+def employee_duration_records(emp_data):
+    """Duration records of every finished document, task and training of an employee"""
+    records = []
+    for kind in STAGES:
+        items = emp_data[ITEM_KINDS[kind]]
+        pairs = ((item['name'], item) for item in items) if isinstance(items, list) else items.items()
+        for item_name, item in pairs:
+            records.extend(build_duration_records(emp_data, kind, item_name, item))
+    return records
+
+
+def _records_frame(records):
+    df = pd.DataFrame(records, columns=RECORD_COLUMNS)
+    df['hours'] = df['hours'].astype(float)
+    df['breached'] = df['breached'].astype(bool)
+    df['completed_at'] = pd.to_datetime(df['completed_at'])
+    return df
+
+
+def _snapshot_frame(source, rows):
+    """Duration records of regular snapshot rows, computed from the timestamp columns"""
+    c = source.columns
+    m = source.manifest
+    start_date = np.asarray(c['employee.start_date'])[rows]
+    employee = {
+        'employee_id': np.asarray(c['employee.id'])[rows].astype(np.int64),
+        'employee': np.asarray(source.names, dtype=object)[rows],
+        'department': np.asarray(m['departments'], dtype=object)[np.asarray(c['employee.department'])[rows]],
+        'cohort': start_date.view('datetime64[us]').astype('datetime64[M]').astype(str),
+    }
+    parts = []
+    for kind, stages in STAGES.items():
+        key = ITEM_KINDS[kind]
+        names = np.asarray(m['item_names'][key], dtype=object)
+        due = np.asarray(c[f'{key}.due_date'])[rows] if f'{key}.due_date' in c else None
+        for stage, start_field, end_field in stages:
+            end = np.asarray(c[f'{key}.{end_field}'])[rows]
+            start = start_date[:, None] if start_field is None else np.asarray(c[f'{key}.{start_field}'])[rows]
+            row, col = np.nonzero((end != NO_TIME) & (start != NO_TIME))
+            finished = end[row, col]
+            hours = (finished - np.broadcast_to(start, end.shape)[row, col]) / 3_600_000_000
+            target = SLA_TARGET_HOURS.get((kind, stage))
+            breached = hours > target if target is not None else np.zeros(len(row), dtype=bool)
+            if start_field is None and due is not None:
+                due_dates = due[row, col]
+                breached = np.where(due_dates != NO_TIME, finished > due_dates, breached)
+            parts.append(pd.DataFrame({
+                **{column: values[row] for column, values in employee.items()},
+                'kind': kind,
+                'item': names[col],
+                'stage': stage,
+                'hours': hours.astype(float),
+                'breached': breached.astype(bool),
+                'completed_at': finished.view('datetime64[us]'),
+            }, columns=RECORD_COLUMNS))
+    return parts
+
+
+class SLACache:
+    """Completion durations of every employee, live and archived, with memoized percentile summaries
+
+    Durations come from the timestamps stored on each item, so the cache is
+    seeded from what is already stored: build() reads employees unchanged
+    since the store's snapshot from its timestamp columns and the rest, plus
+    the archive, from their records. update() marks changed employees, whose
+    durations are re-read from the store, or the archive once they have
+    moved there, the next time the frame is needed.
+    """
+
+    def __init__(self, employees=None, archive=None):
+        self.employees = employees
+        self.archive = archive
+        self._frame = _records_frame([])
+        self._stale = set()
+        self._summaries = {}
+        self._lock = threading.RLock()
+
+    @classmethod
+    def build(cls, employees, archive=None):
+        cache = cls(employees, archive)
+        ids = list(employees.keys())
+        parts = []
+        clean, rows = employees.source_rows(ids)
+        if clean:
+            irregular = np.asarray(employees.source.columns['employee.irregular'])[rows].astype(bool)
+            parts.extend(_snapshot_frame(employees.source, np.asarray(rows)[~irregular]))
+            clean = [i for i, skip in zip(clean, irregular) if not skip]
+        read = set(clean)
+        dirty = [emp_id for i, emp_id in enumerate(ids) if i not in read]
+        records = [record for _, emp in employees.scan(dirty) for record in employee_duration_records(emp)]
+        if archive is not None:
+            records.extend(record for _, emp in archive.scan() for record in employee_duration_records(emp))
+        parts.append(_records_frame(records))
+        cache._frame = pd.concat([part for part in parts if not part.empty] or [cache._frame], ignore_index=True)
+        return cache
+
+    def update(self, employees, ids):
+        """Mark changed, added, removed or archived employees for re-reading"""
+        with self._lock:
+            self._stale.update(ids)
+
+    def frame(self):
+        """Return all records as a DataFrame, re-reading only employees changed since the last call"""
+        with self._lock:
+            if self._stale:
+                stale, self._stale = self._stale, set()
+                live = [emp_id for emp_id in stale if emp_id in self.employees]
+                records = [record for _, emp in self.employees.scan(live) for record in employee_duration_records(emp)]
+                if self.archive is not None:
+                    for emp_id in stale.difference(live):
+                        emp = self.archive.get(emp_id)
+                        if emp is not None:
+                            records.extend(employee_duration_records(emp))
+                kept = self._frame[~self._frame['employee_id'].isin(list(stale))]
+                added = _records_frame(records)
+                self._frame = pd.concat([kept, added], ignore_index=True) if not added.empty else kept
+                self._summaries = {}
+            return self._frame
+
+    def summary(self, by=None):
+        """Percentile summary of durations per kind and stage, optionally sliced by a column"""
+        with self._lock:
+            df = self.frame()
+            if by in self._summaries:
+                return self._summaries[by]
+
+            keys = ['kind', 'stage'] + ([by] if by else [])
+            if df.empty:
+                result = pd.DataFrame(columns=keys + ['count', 'breaches'] +
+                                      [f"p{int(p * 100)}" for p in PERCENTILES])
+            else:
+                grouped = df.groupby(keys, sort=True)['hours']
+                result = grouped.quantile(PERCENTILES).unstack()
+                result.columns = [f"p{int(p * 100)}" for p in result.columns]
+                result.insert(0, 'count', grouped.size())
+                result.insert(1, 'breaches', df.groupby(keys, sort=True)['breached'].sum().astype(int))
+                result = result.reset_index()
+
+            self._summaries[by] = result
+            return result
+
+    def breach_counts(self):
+        """Breach count per kind and stage"""
+        return self.summary()[['kind', 'stage', 'count', 'breaches']]
+
+
+def get_open_item_ages(employees, now=None):
+    """Age in hours of every item currently waiting in an intermediate state"""
+    now = now or datetime.now()
+    rows = []
+    for emp_id, emp_data in iter_employees(employees):
+        emp = (emp_id, emp_data['name'], emp_data['department'])
+        for doc_name, doc in emp_data['documents'].items():
+            if doc['status'] == 'Uploaded' and doc.get('uploaded'):
+                rows.append((*emp, 'Document', doc_name,
+                             'Uploaded', (now - doc['uploaded']).total_seconds() / 3600))
+        for task in emp_data['tasks']:
+            if task['status'] == 'In Progress' and task.get('started'):
+                rows.append((*emp, 'Task', task['name'],
+                             'In Progress', (now - task['started']).total_seconds() / 3600))
+        for training_name, training in emp_data['compliance'].items():
+            if training['status'] == 'In Progress' and training.get('started'):
+                rows.append((*emp, 'Compliance', training_name,
+                             'In Progress', (now - training['started']).total_seconds() / 3600))
+
+    df = pd.DataFrame(rows, columns=['employee_id', 'employee', 'department', 'kind', 'item', 'status', 'hours'])
+    return df.sort_values('hours', ascending=False, ignore_index=True)
@@ -0,0 +1,365 @@
+"""Headless JSON API over the onboarding domain layer
+
+Serves the same employee store, transitions and snapshots as the Streamlit
+app, for integrations and scripts:
+
+    GET    /api/employees                  summary rows; ?limit=&cursor=&fields=&department=
+    POST   /api/employees                  create one employee
+    POST   /api/employees/bulk             create many: {"employees": [...]}
+    POST   /api/employees/bulk-get         full records: {"ids": [...], "fields": [...]}
+    GET    /api/employees/lookup           ids matching ?email=, ?external_id= or ?name=
+    GET    /api/employees/{id}             full record; ?fields=
+    DELETE /api/employees/{id}
+    GET    /api/employees/{id}/items       items of every kind, or ?kind=Task
+    POST   /api/transitions                {"ops": [{employee, kind, item, action, fields}], "strict": false}
+    GET    /api/calendars/employees/{id}.ics       iCalendar feed of meetings and deadlines
+    GET    /api/calendars/departments/{name}.ics   the same for everyone in a department
+
+Employees are addressed by the integer id the store assigns; `employee` in
+transition ops is that id. Emails are unique, so creating an employee with
+an email already in use answers 409.
+
+Lists are paginated with an opaque cursor over employee ids. GET
+responses carry a weak ETag built from the store or employee version
+counter and answer If-None-Match with 304; calendar feeds are also kept
+serialized until their employees change (see ical.FeedCache). Writes are saved through the
+background snapshot writer, which merges only the changed employees into
+the latest snapshot, so the API, the app and HR sync can share one
+snapshot directory without overwriting each other's changes. The same
+writer polls for their snapshots and rebases the API's store onto them,
+so reads and ETags follow their changes within seconds, with or without
+--no-persist.
+
+    python -m api --port 8600
+"""
+import argparse
+import base64
+import binascii
+import bisect
+import json
+import os
+from datetime import date, datetime
+
+from starlette.applications import Starlette
+from starlette.responses import Response, StreamingResponse
+from starlette.routing import Route
+
+import catalogs
+import ical
+import snapshot
+from employee_store import DuplicateEmployeeError, EmployeeStore
+from onboarding import (BatchError, ITEM_KINDS, OP_FIELDS, create_employee, get_item_names, get_item,
+                        make_op, run_batch)
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+MAX_BULK = 1000
+
+# ETags from a previous process must not match version counters that restarted at zero
+EPOCH = binascii.hexlify(os.urandom(4)).decode()
+
+
+class APIError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+def _json_default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, (set, tuple)):
+        return list(value)
+    raise TypeError(f"Cannot serialize {type(value).__name__}")
+
+
+def json_response(data, status=200, etag=None):
+    body = json.dumps(data, default=_json_default, separators=(',', ':')).encode()
+    headers = {'ETag': etag} if etag else None
+    return Response(body, status_code=status, media_type='application/json', headers=headers)
+
+
+def not_modified(request, etag):
+    """304 if the client already holds this version"""
+    tags = [tag.strip() for tag in request.headers.get('if-none-match', '').split(',')]
+    if etag in tags or '*' in tags:
+        return Response(status_code=304, headers={'ETag': etag})
+    return None
+
+
+def project(record, fields):
+    if not fields:
+        return record
+    return {field: record[field] for field in fields if field in record}
+
+
+def parse_fields(request):
+    fields = request.query_params.get('fields')
+    return [f.strip() for f in fields.split(',') if f.strip()] if fields else None
+
+
+def encode_cursor(emp_id):
+    return base64.urlsafe_b64encode(json.dumps({'after': emp_id}).encode()).decode()
+
+
+def decode_cursor(cursor):
+    try:
+        return int(json.loads(base64.urlsafe_b64decode(cursor.encode()))['after'])
+    except (ValueError, KeyError, TypeError):
+        raise APIError(400, "Invalid cursor")
+
+
+def parse_date(value, field):
+    try:
+        return datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        raise APIError(400, f"'{field}' must be an ISO date")
+
+
+class OnboardingAPI:
+    """Request handlers bound to one employee store"""
+
+    def __init__(self, store=None, writer=None, persist=True):
+        self.store = store if store is not None else EmployeeStore(snapshot.load_snapshot())
+        self.writer = writer
+        self.persist = persist
+        self.calendars = ical.FeedCache(self.store)
+        self._sorted = (None, [])
+
+    def sorted_ids(self):
+        """Employee ids in cursor order, re-sorted only after the store changes"""
+        version, ids = self._sorted
+        if version != self.store.version:
+            ids = sorted(self.store)
+            self._sorted = (self.store.version, ids)
+        return ids
+
+    def changed(self, *ids):
+        self.store.touch(*ids)
+        if self.writer is not None and self.persist:
+            self.writer.schedule()
+
+    def employee_or_404(self, emp_id):
+        if emp_id not in self.store:
+            raise APIError(404, f"No employee with id {emp_id}")
+        return self.store[emp_id]
+
+    # Employees
+    async def list_employees(self, request):
+        etag = f'W/"{EPOCH}-{self.store.version}"'
+        cached = not_modified(request, etag)
+        if cached:
+            return cached
+
+        params = request.query_params
+        try:
+            limit = min(int(params.get('limit', DEFAULT_PAGE_SIZE)), MAX_PAGE_SIZE)
+        except ValueError:
+            raise APIError(400, "'limit' must be an integer")
+        if limit < 1:
+            raise APIError(400, "'limit' must be positive")
+        fields = parse_fields(request)
+        department = params.get('department')
+
+        ids = self.sorted_ids()
+        start = bisect.bisect_right(ids, decode_cursor(params['cursor'])) if params.get('cursor') else 0
+        rows = []
+        position = start
+        while position < len(ids) and len(rows) < limit:
+            summary = self.store.summary(ids[position])
+            position += 1
+            if department and summary['department'] != department:
+                continue
+            rows.append(project(summary, fields))
+        next_cursor = encode_cursor(ids[position - 1]) if position < len(ids) else None
+        return json_response({'employees': rows, 'next_cursor': next_cursor, 'total': len(ids)}, etag=etag)
+
+    async def lookup(self, request):
+        params = request.query_params
+        if params.get('email'):
+            emp_id = self.store.by_email(params['email'])
+            ids = [emp_id] if emp_id is not None else []
+        elif params.get('external_id'):
+            emp_id = self.store.by_external_id(params['external_id'])
+            ids = [emp_id] if emp_id is not None else []
+        elif params.get('name'):
+            ids = self.store.by_name(params['name'])
+        else:
+            raise APIError(400, "Pass one of 'email', 'external_id' or 'name'")
+        return json_response({'ids': ids})
+
+    def _create(self, data):
+        missing = [f for f in ('name', 'email', 'role', 'start_date') if not data.get(f)]
+        if missing:
+            raise APIError(400, f"Missing required field(s): {', '.join(missing)}")
+        emp = create_employee(data['name'], data['email'], data.get('department', 'Engineering'),
+                              parse_date(data['start_date'], 'start_date'), data['role'],
+                              external_id=data.get('external_id'))
+        try:
+            return self.store.add(emp)
+        except DuplicateEmployeeError as e:
+            raise APIError(409, str(e))
+
+    async def create_employee(self, request):
+        emp_id = self._create(await read_json(request))
+        self.changed(emp_id)
+        return json_response(self.store.summary(emp_id), status=201)
+
+    async def bulk_create(self, request):
+        items = (await read_json(request)).get('employees') or []
+        if len(items) > MAX_BULK:
+            raise APIError(413, f"At most {MAX_BULK} employees per request")
+        created, errors = [], []
+        for index, data in enumerate(items):
+            try:
+                created.append(self._create(data))
+            except APIError as e:
+                errors.append({'index': index, 'name': data.get('name'), 'error': e.message})
+        if created:
+            self.changed(*created)
+        return json_response({'created': created, 'errors': errors}, status=201 if created else 400)
+
+    async def bulk_get(self, request):
+        data = await read_json(request)
+        ids = data.get('ids') or []
+        if len(ids) > MAX_BULK:
+            raise APIError(413, f"At most {MAX_BULK} employees per request")
+        if not all(isinstance(emp_id, int) for emp_id in ids):
+            raise APIError(400, "'ids' must be a list of integers")
+        fields = data.get('fields')
+        # peek: a bulk read shouldn't push the employees being edited out of the cache
+        found = {emp_id: project(self.store.peek(emp_id), fields) for emp_id in ids if emp_id in self.store}
+        return json_response({'employees': found, 'missing': [i for i in ids if i not in self.store]})
+
+    async def get_employee(self, request):
+        emp_id = request.path_params['emp_id']
+        emp = self.employee_or_404(emp_id)
+        etag = f'W/"{EPOCH}-{emp_id}-{self.store.employee_version(emp_id)}"'
+        cached = not_modified(request, etag)
+        if cached:
+            return cached
+        return json_response(project(emp, parse_fields(request)), etag=etag)
+
+    async def delete_employee(self, request):
+        emp_id = request.path_params['emp_id']
+        self.employee_or_404(emp_id)
+        del self.store[emp_id]
+        self.changed(emp_id)
+        return Response(status_code=204)
+
+    async def list_items(self, request):
+        emp_id = request.path_params['emp_id']
+        emp = self.employee_or_404(emp_id)
+        etag = f'W/"{EPOCH}-{emp_id}-{self.store.employee_version(emp_id)}-items"'
+        cached = not_modified(request, etag)
+        if cached:
+            return cached
+        kinds = [request.query_params['kind']] if request.query_params.get('kind') else list(ITEM_KINDS)
+        unknown = [k for k in kinds if k not in ITEM_KINDS]
+        if unknown:
+            raise APIError(400, f"Unknown kind '{unknown[0]}'; expected one of {', '.join(ITEM_KINDS)}")
+        items = [{'kind': kind, 'item': item_name, **get_item(emp, kind, item_name)}
+                 for kind in kinds for item_name in get_item_names(emp, kind)]
+        return json_response({'employee': emp_id, 'items': items}, etag=etag)
+
+    # Transitions
+    async def transitions(self, request):
+        data = await read_json(request)
+        raw_ops = data.get('ops') or []
+        if len(raw_ops) > MAX_BULK:
+            raise APIError(413, f"At most {MAX_BULK} operations per request")
+        required = ('employee', 'kind', 'item', 'action')
+        if not all(isinstance(op, dict) and isinstance(op.get('employee'), int)
+                   and all(isinstance(op.get(f), str) for f in required[1:]) for op in raw_ops):
+            raise APIError(400, "Each op needs an integer 'employee' id and 'kind', 'item' and 'action' strings")
+        for op in raw_ops:
+            fields = op.get('fields') or {}
+            if not isinstance(fields, dict):
+                raise APIError(400, "An op's 'fields' must be an object")
+            unknown = sorted(set(fields) - OP_FIELDS)
+            if unknown:
+                raise APIError(400, f"Unknown op field '{unknown[0]}'; expected one of {', '.join(sorted(OP_FIELDS))}")
+        ops = [make_op(*(op[f] for f in required), **(op.get('fields') or {})) for op in raw_ops]
+        try:
+            events, errors = run_batch(self.store, ops, actor=data.get('actor', 'API'), strict=bool(data.get('strict')))
+        except BatchError as e:
+            return json_response({'applied': [], 'errors': [{'op': op, 'error': reason} for op, reason in e.errors]},
+                                 status=409)
+        if events:
+            self.changed(*{event['employee'] for event in events})
+        return json_response({'applied': events, 'errors': [{'op': op, 'error': reason} for op, reason in errors]})
+
+    # Calendars
+    def calendar_response(self, request, tag, chunks):
+        etag = f'W/"{EPOCH}-cal-{tag}"'
+        cached = not_modified(request, etag)
+        if cached:
+            return cached
+        return StreamingResponse(chunks, media_type='text/calendar; charset=utf-8', headers={'ETag': etag})
+
+    async def employee_calendar(self, request):
+        emp_id = request.path_params['emp_id']
+        if emp_id not in self.store:
+            raise APIError(404, f"No employee with id {emp_id}")
+        return self.calendar_response(request, *self.calendars.employee_feed(emp_id))
+
+    async def department_calendar(self, request):
+        department = request.path_params['department']
+        if department not in catalogs.DEPARTMENTS and not self.calendars.department_members(department):
+            raise APIError(404, f"No department named '{department}'")
+        return self.calendar_response(request, *self.calendars.department_feed(department))
+
+
+async def read_json(request):
+    try:
+        data = await request.json()
+    except ValueError:
+        raise APIError(400, "Request body must be JSON")
+    if not isinstance(data, dict):
+        raise APIError(400, "Request body must be a JSON object")
+    return data
+
+
+async def handle_api_error(request, exc):
+    return json_response({'error': exc.message}, status=exc.status)
+
+
+def create_app(store=None, writer=None, persist=True):
+    api = OnboardingAPI(store, writer, persist)
+    app = Starlette(
+        routes=[
+            Route('/api/employees', api.list_employees, methods=['GET']),
+            Route('/api/employees', api.create_employee, methods=['POST']),
+            Route('/api/employees/bulk', api.bulk_create, methods=['POST']),
+            Route('/api/employees/bulk-get', api.bulk_get, methods=['POST']),
+            Route('/api/employees/lookup', api.lookup, methods=['GET']),
+            Route('/api/employees/{emp_id:int}', api.get_employee, methods=['GET']),
+            Route('/api/employees/{emp_id:int}', api.delete_employee, methods=['DELETE']),
+            Route('/api/employees/{emp_id:int}/items', api.list_items, methods=['GET']),
+            Route('/api/transitions', api.transitions, methods=['POST']),
+            Route('/api/calendars/employees/{emp_id:int}.ics', api.employee_calendar, methods=['GET']),
+            Route('/api/calendars/departments/{department}.ics', api.department_calendar, methods=['GET']),
+        ],
+        exception_handlers={APIError: handle_api_error},
+    )
+    app.state.api = api
+    return app
+
+
+def main():
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Onboarding JSON API")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8600)
+    parser.add_argument('--no-persist', action='store_true', help="don't write snapshots")
+    args = parser.parse_args()
+    store = EmployeeStore(snapshot.load_snapshot(), allocate_id=snapshot.IdAllocator())
+    # The writer also keeps the store current with what the app and HR sync write
+    writer = snapshot.SnapshotWriter(store)
+    uvicorn.run(create_app(store, writer, persist=not args.no_persist), host=args.host, port=args.port, log_level='warning')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,9 +1,33 @@
+import os
+import threading
+import uuid
+
 import streamlit as st
 import pandas as pd
-from datetime import datetime, timedelta
+from datetime import datetime
 import plotly.express as px
 import plotly.graph_objects as go
 
+import analytics
+import archive
+import catalogs
+import cube
+import dashboard
+import forecast
+from employee_store import DuplicateEmployeeError, EmployeeStore
+import hr_sync
+import ical
+import jobs
+import kpi_history
+from onboarding import (BatchError, create_employee, get_completion_percentage, get_compliance_reminders,
+                        get_item_names, make_op, plan_batch, run_batch)
+import notifications
+import reports
+import snapshot
+import timeline
+import uploads
+from verification_queue import VerificationQueue, queue_key
+
 # Page config
 st.set_page_config(
     page_title="Smart Onboarding Platform", 
@@ -107,109 +131,704 @@ st.markdown("""
     </style>
 """, unsafe_allow_html=True)
 
+@st.cache_resource
+def get_job_manager():
+    """Process-wide worker pools for org-wide reports"""
+    return jobs.JobManager()
+
+@st.cache_resource
+def get_notification_service():
+    """Process-wide outbox and delivery worker"""
+    return notifications.NotificationService().start()
+
+@st.cache_resource
+def get_reminder_scanner():
+    """Process-wide background scan queueing everyone's due compliance reminders"""
+    return notifications.ReminderScanner(get_notification_service())
+
+def queue_reminders(emp_data, reminders):
+    """Queue compliance reminders for an employee; returns the trainings newly queued"""
+    return notifications.queue_compliance_reminders(get_notification_service(), emp_data, reminders)
+
+@st.cache_resource
+def get_employee_store():
+    """The process-wide employee store every session reads and writes: warm start from
+    the latest snapshot, with full records loaded on first access"""
+    allocate_id = snapshot.IdAllocator()
+    store = EmployeeStore(allocate_id=allocate_id)
+    path = snapshot.latest_snapshot()
+    if path is not None:
+        try:
+            store = EmployeeStore(snapshot.load_snapshot(path), allocate_id=allocate_id)
+        except (OSError, ValueError, KeyError, snapshot.SnapshotVersionError) as e:
+            st.warning(f"Could not load saved onboarding data: {e}")
+    return store
+
+@st.cache_resource
+def get_write_lock():
+    """Serializes updates to the views derived from the shared store"""
+    return threading.RLock()
+
+@st.cache_resource
+def get_shared_views():
+    """The shared store's funnel cube, verification queue, at-risk forecasts and SLA durations,
+    kept current by record_write and by changes other processes write; each is built on first
+    use, so no session's first run waits for a pass over every employee"""
+    return {'cube': None, 'queue': None, 'forecast': None, 'sla': None}
+
+def update_views(store, views, ids):
+    """Replace changed employees' contributions to the shared views"""
+    with get_write_lock():
+        if views['cube'] is not None:
+            views['cube'].update(store, ids)
+        if views['forecast'] is not None:
+            views['forecast'].update(store, ids)
+        if views['sla'] is not None:
+            views['sla'].update(store, ids)
+
+def get_verification_queue():
+    """The org-wide queue of uploaded documents, shared by every session so a claim
+    holds across them; built from the snapshot's document columns on first use"""
+    views = get_shared_views()
+    with get_write_lock():
+        if views['queue'] is None:
+            views['queue'] = VerificationQueue()
+            views['queue'].rebuild(get_employee_store())
+        return views['queue']
+
+def get_cube():
+    """The shared funnel cube, built on first use"""
+    views = get_shared_views()
+    with get_write_lock():
+        if views['cube'] is None:
+            views['cube'] = cube.OnboardingCube.build(get_employee_store())
+        return views['cube']
+
+def dashboard_rows():
+    """A copy of the shared store's summary rows, taken between writes to the shared views"""
+    with get_write_lock():
+        return get_employee_store().summaries()
+
+@st.cache_resource
+def get_dashboard():
+    """The materialized Dashboard every session reads and the KPI history samples"""
+    view = dashboard.MaterializedDashboard(dashboard_rows)
+    get_kpi_recorder().watch(view)
+    return view
+
+@st.cache_resource
+def get_snapshot_writer():
+    """Process-wide background writer for the shared store, which merges its changes into
+    the snapshot directory and picks up changes the API or HR sync wrote there"""
+    store, views, write_lock = get_employee_store(), get_shared_views(), get_write_lock()
+    view = get_dashboard()
+
+    def on_change(ids):
+        update_views(store, views, ids)
+        with write_lock:
+            if views['queue'] is not None:
+                views['queue'].sync_employees(store, ids)
+        view.record_write(len(ids))
+    return snapshot.SnapshotWriter(store, on_change=on_change)
+
+@st.cache_resource
+def get_archive_sweeper():
+    """Process-wide background archive sweep of the shared store, run after startup
+    rather than before the first page renders"""
+    return archive.ArchiveSweeper(get_archive(), get_employee_store(), on_archive=archived)
+
+@st.cache_resource
+def get_calendar_feeds():
+    """Process-wide serialized calendar feeds of the shared store; a feed is rebuilt once
+    its employees' versions move, whichever session or process changed them"""
+    return ical.FeedCache(get_employee_store())
+
+@st.cache_resource
+def get_hr_sync_state():
+    """Process-wide HR sync cursors, digests and conflicts"""
+    return hr_sync.SyncState()
+
+@st.cache_resource
+def get_hr_sync_lock():
+    """One HR sync at a time per process, so two sessions never apply the same records"""
+    return threading.Lock()
+
+def run_hr_sync(drop_dir, url):
+    """Apply new HR file drops and endpoint changes to the shared store"""
+    report = hr_sync.SyncReport('hr')
+    with get_hr_sync_lock():
+        if drop_dir:
+            connector = hr_sync.SyncConnector(get_employee_store(), get_hr_sync_state(), on_batch=record_write,
+                                              archive=get_archive())
+            report.merge(connector.sync_directory(drop_dir))
+        if url:
+            connector = hr_sync.SyncConnector(get_employee_store(), get_hr_sync_state(), feed='hr-api',
+                                              on_batch=record_write, archive=get_archive())
+            report.merge(connector.sync_endpoint(url))
+    for emp_id in report.removed:
+        get_verification_queue().remove_employee(emp_id)
+    return report
+
+@st.cache_resource
+def get_kpi_recorder():
+    """Process-wide KPI history, sampled from the shared Dashboard"""
+    return kpi_history.KpiRecorder()
+
+@st.cache_resource
+def get_archive():
+    """Process-wide cold archive of finished onboardings"""
+    return archive.EmployeeArchive()
+
+def archived(ids):
+    """Drop archived employees from the shared views, queue their removal for the next
+    snapshot and refresh the Dashboard; safe to call from the sweeper's thread"""
+    if not ids:
+        return
+    views = get_shared_views()
+    with get_write_lock():
+        if views['queue'] is not None:
+            for emp_id in ids:
+                views['queue'].remove_employee(emp_id)
+    update_views(get_employee_store(), views, ids)
+    get_snapshot_writer().schedule()
+    get_dashboard().record_write(len(ids))
+    get_dashboard().request_refresh()
+
+def archive_employees(reasons=None):
+    """Move employees to the cold archive: the given {id: reason}, or everyone the
+    lifecycle policy selects. Returns the ids moved."""
+    store = st.session_state.employees
+    if reasons is None:
+        moved = get_archive().sweep(store)
+    else:
+        moved = get_archive().archive(store, reasons)
+        for emp_id in set(reasons) & set(get_archive().clashes):
+            st.error(f"❌ Could not archive: {get_archive().clashes[emp_id]}")
+    if st.session_state.current_employee in moved:
+        st.session_state.current_employee = None
+    archived(moved)
+    return moved
+
+def get_forecast():
+    """The shared at-risk forecasts, built on first use and refit once a day"""
+    views = get_shared_views()
+    with get_write_lock():
+        if views['forecast'] is None:
+            views['forecast'] = forecast.RiskForecaster.build(get_employee_store(), archived=get_archive().item_history)
+        if views['forecast'].computed_at.date() != datetime.now().date():
+            views['forecast'].refresh()
+        return views['forecast']
+
+def get_sla():
+    """The shared SLA durations, seeded from every live and archived employee on first use"""
+    views = get_shared_views()
+    with get_write_lock():
+        if views['sla'] is None:
+            views['sla'] = analytics.SLACache.build(get_employee_store(), archive=get_archive())
+        return views['sla']
+
+def record_write(ids, count=1):
+    """Bump the changed employees' versions, update the funnel cube and at-risk forecasts,
+    queue a background snapshot and count the change toward the next Dashboard refresh;
+    safe to call from worker threads"""
+    store = get_employee_store()
+    store.touch(*ids)
+    update_views(store, get_shared_views(), ids)
+    get_snapshot_writer().schedule()
+    get_dashboard().record_write(count)
+
 # Initialize session state
-if 'employees' not in st.session_state:
-    st.session_state.employees = {}
+# Every session works on the one process-wide store
+st.session_state.employees = get_employee_store()
+get_snapshot_writer()
+get_reminder_scanner()
+get_archive_sweeper()
 if 'current_employee' not in st.session_state:
     st.session_state.current_employee = None
-if 'notifications' not in st.session_state:
-    st.session_state.notifications = []
-
-# Sample data structure for a new employee
-def create_employee(name, email, department, start_date, role):
-    return {
-        'name': name,
-        'email': email,
-        'department': department,
-        'role': role,
-        'start_date': start_date,
-        'created_at': datetime.now(),
-        'documents': {
-            'Government ID': {'status': 'Pending', 'uploaded': None, 'verified_by': None, 'priority': 'High'},
-            'Tax Forms (W-4/W-9)': {'status': 'Pending', 'uploaded': None, 'verified_by': None, 'priority': 'High'},
-            'Direct Deposit Form': {'status': 'Pending', 'uploaded': None, 'verified_by': None, 'priority': 'High'},
-            'Emergency Contact Info': {'status': 'Pending', 'uploaded': None, 'verified_by': None, 'priority': 'High'},
-            'Signed Offer Letter': {'status': 'Pending', 'uploaded': None, 'verified_by': None, 'priority': 'High'},
-            'I-9 Employment Eligibility': {'status': 'Pending', 'uploaded': None, 'verified_by': None, 'priority': 'Critical'},
-            'Background Check Consent': {'status': 'Pending', 'uploaded': None, 'verified_by': None, 'priority': 'Medium'},
-            'NDA Agreement': {'status': 'Pending', 'uploaded': None, 'verified_by': None, 'priority': 'High'}
-        },
-        'tasks': [
-            {'name': 'Complete Employee Profile', 'status': 'Not Started', 'dependency': None, 'due_date': start_date + timedelta(days=1), 'category': 'Administrative', 'progress': 0},
-            {'name': 'Review Company Handbook', 'status': 'Locked', 'dependency': 'Complete Employee Profile', 'due_date': start_date + timedelta(days=2), 'category': 'Orientation', 'progress': 0},
-            {'name': 'Setup Work Email & Accounts', 'status': 'Locked', 'dependency': 'Complete Employee Profile', 'due_date': start_date + timedelta(days=1), 'category': 'IT Setup', 'progress': 0},
-            {'name': 'Attend Welcome Orientation', 'status': 'Locked', 'dependency': 'Setup Work Email & Accounts', 'due_date': start_date + timedelta(days=2), 'category': 'Orientation', 'progress': 0},
-            {'name': 'Meet Team Members', 'status': 'Locked', 'dependency': 'Attend Welcome Orientation', 'due_date': start_date + timedelta(days=3), 'category': 'Social', 'progress': 0},
-            {'name': 'Setup Development Environment', 'status': 'Locked', 'dependency': 'Setup Work Email & Accounts', 'due_date': start_date + timedelta(days=3), 'category': 'IT Setup', 'progress': 0},
-            {'name': 'Shadow Team Member', 'status': 'Locked', 'dependency': 'Meet Team Members', 'due_date': start_date + timedelta(days=5), 'category': 'Training', 'progress': 0},
-            {'name': 'Review First Assignment', 'status': 'Locked', 'dependency': 'Shadow Team Member', 'due_date': start_date + timedelta(days=7), 'category': 'Work', 'progress': 0},
-            {'name': '30-Day Check-in with Manager', 'status': 'Locked', 'dependency': 'Review First Assignment', 'due_date': start_date + timedelta(days=30), 'category': 'Review', 'progress': 0}
-        ],
-        'meetings': [],
-        'equipment': {
-            'MacBook Pro / Windows Laptop': {'status': 'Pending', 'assigned_date': None, 'serial_number': '', 'assigned_by': None},
-            'External Monitor(s)': {'status': 'Pending', 'assigned_date': None, 'serial_number': '', 'assigned_by': None},
-            'Keyboard & Mouse': {'status': 'Pending', 'assigned_date': None, 'serial_number': '', 'assigned_by': None},
-            'Access Card/Badge': {'status': 'Pending', 'assigned_date': None, 'serial_number': '', 'assigned_by': None},
-            'Mobile Phone': {'status': 'Pending', 'assigned_date': None, 'serial_number': '', 'assigned_by': None},
-            'Headset': {'status': 'Pending', 'assigned_date': None, 'serial_number': '', 'assigned_by': None},
-            'Desk & Chair': {'status': 'Pending', 'assigned_date': None, 'serial_number': '', 'assigned_by': None}
-        },
-        'compliance': {
-            'Data Protection & Privacy (GDPR)': {'status': 'Not Started', 'due_date': start_date + timedelta(days=5), 'completed': None, 'duration': '45 min', 'priority': 'Critical'},
-            'Information Security Awareness': {'status': 'Not Started', 'due_date': start_date + timedelta(days=7), 'completed': None, 'duration': '30 min', 'priority': 'Critical'},
-            'Workplace Health & Safety': {'status': 'Not Started', 'due_date': start_date + timedelta(days=3), 'completed': None, 'duration': '20 min', 'priority': 'High'},
-            'Code of Conduct & Ethics': {'status': 'Not Started', 'due_date': start_date + timedelta(days=2), 'completed': None, 'duration': '25 min', 'priority': 'High'},
-            'Anti-Harassment Policy': {'status': 'Not Started', 'due_date': start_date + timedelta(days=5), 'completed': None, 'duration': '30 min', 'priority': 'High'},
-            'Cybersecurity Best Practices': {'status': 'Not Started', 'due_date': start_date + timedelta(days=10), 'completed': None, 'duration': '40 min', 'priority': 'Medium'}
-        },
-        'surveys': [],
-        'notes': []
-    }
+# A full run redraws every row anyway
+st.session_state.pop('full_rerun', None)
+if 'upload_pending' not in st.session_state:
+    st.session_state.upload_pending = {}    # (employee id, document) -> upload future
+if get_dashboard().wants_rows():
+    # The refresher builds from a copy taken here, never from records a script may be changing
+    get_dashboard().offer(dashboard_rows())
+
+def current_user():
+    """Who this session acts as: the signed-in user's email or name, or a name
+    generated once for an anonymous session"""
+    if st.user.get('is_logged_in'):
+        return st.user.get('email') or st.user.get('name')
+    if 'session_user' not in st.session_state:
+        st.session_state.session_user = f"Session {uuid.uuid4().hex[:6]}"
+    return st.session_state.session_user
+
+def get_status_color(status):
+    """Return color code for status"""
+    return catalogs.status_color(status)
+
+@st.cache_resource
+def get_upload_pipeline():
+    """Process-wide worker pool for document uploads"""
+    return uploads.UploadPipeline()
+
+def upload_finished(result):
+    """Attach a finished upload to its document in the shared store; runs on the upload
+    worker, so the file is kept even if the session that sent it has ended"""
+    emp_id, doc_name = result['ref']
+    views = get_shared_views()
+    with get_write_lock():
+        try:
+            with get_employee_store().edit(emp_id) as emp_data:
+                doc = emp_data['documents'][doc_name]
+                if result['error']:
+                    doc['upload_error'] = f"{result['filename']}: {result['error']}"
+                elif doc['status'] == 'Verified':
+                    # Verified while the upload ran; a late file must not reopen the document
+                    doc['upload_error'] = f"{result['filename']}: not attached, the document was already verified"
+                else:
+                    doc['status'] = 'Uploaded'
+                    doc['uploaded'] = result['finished_at']
+                    doc['file'] = result['file']
+                    doc['upload_error'] = None
+                    if views['queue'] is not None:
+                        views['queue'].push((emp_id, doc_name), queue_key(emp_data, doc))
+        except KeyError:
+            return    # removed or archived while the upload ran
+    record_write([emp_id])
+
+def finished_uploads():
+    """Forget this session's uploads that have finished; returns their documents"""
+    pending = st.session_state.upload_pending
+    done = [ref for ref, future in pending.items() if future.done()]
+    for ref in done:
+        del pending[ref]
+    return done
+
+def refresh_uploads(ref):
+    """on_click callback for an upload's Refresh button; reruns the whole page if other
+    rows' uploads finished too"""
+    if any(done != ref for done in finished_uploads()):
+        st.session_state.full_rerun = True
+
+def publish_events(events):
+    """Feed a batch of transitions to the verification queue and the shared views"""
+    for event in events:
+        if event['kind'] == 'Document':
+            get_verification_queue().remove((event['employee'], event['item']))
+    if events:
+        record_write({event['employee'] for event in events}, len(events))
+
+def run_actions(ops, actor='Admin'):
+    """Apply one or more status changes and update aggregates once"""
+    events, errors = run_batch(st.session_state.employees, ops, actor)
+    publish_events(events)
+    return events, errors
+
+finished_uploads()
+
+# Row fragments: widget actions inside a row rerun only that row and the summary slots
+def draw_summaries(summaries, emp_data):
+    """Redraw summary metrics into slots owned by the main script"""
+    for slot, render in summaries:
+        with slot.container():
+            render(emp_data)
+
+def row_action(ops):
+    """on_click callback for row buttons, applied before the row re-renders"""
+    events, _ = run_actions(ops)
+    changed = {(e['employee'], e['kind'], e['item']) for e in events}
+    requested = {(op['employee'], op['kind'], op['item']) for op in ops}
+    if changed - requested:
+        # e.g. a completed task unlocked its dependents, which live in other rows
+        st.session_state.full_rerun = True
+
+def apply_claimed(verifier, items, action):
+    """on_click callback for the Verification Queue; applies an action to the items selected
+    when the button was drawn, leaving out those whose lease the verifier no longer holds"""
+    # The lease may have run out, and the item gone to someone else, since the table was drawn
+    held = set(get_verification_queue().claimed_by(verifier))
+    claimed = [item for item in items if item in held]
+    if len(claimed) < len(items):
+        st.toast(f"⚠️ {len(items) - len(claimed)} item(s) skipped: your claim on them expired.")
+    run_actions([make_op(emp_id, 'Document', doc_name, action) for emp_id, doc_name in claimed], actor=verifier)
+
+def rerun_page_if_needed():
+    """Escalate a fragment rerun to a full rerun when an action changed other rows"""
+    if st.session_state.pop('full_rerun', False):
+        st.rerun()
+
+def assign_equipment(emp_id, eq_name):
+    """on_click callback; picks up the serial number typed in the same row"""
+    serial_val = st.session_state.get(f"serial_{eq_name}_{emp_id}")
+    row_action([make_op(emp_id, 'Equipment', eq_name, 'assign', serial_number=serial_val)])
+
+def meeting_key(meeting):
+    """A meeting's identity across copies of the record: when it was created, as in its calendar UID"""
+    return meeting.get('created_at') or meeting['datetime']
+
+def find_meeting(emp_data, key):
+    return next((meeting for meeting in emp_data['meetings'] if meeting_key(meeting) == key), None)
+
+def cancel_meeting(emp_id, key):
+    """on_click callback; removing a meeting shifts the list, so the whole page reruns"""
+    try:
+        with st.session_state.employees.edit(emp_id) as emp_data:
+            meeting = find_meeting(emp_data, key)
+            if meeting is not None:
+                emp_data['meetings'].remove(meeting)
+    except KeyError:
+        meeting = None    # the employee was removed meanwhile
+    if meeting is not None:
+        record_write([emp_id])
+    st.session_state.full_rerun = True
 
-def get_completion_percentage(emp_data):
-    """Calculate overall onboarding completion percentage"""
-    total_items = 0
-    completed_items = 0
+def complete_meeting(emp_id, key):
+    """on_click callback for a meeting's Complete button"""
+    try:
+        with st.session_state.employees.edit(emp_id) as emp_data:
+            meeting = find_meeting(emp_data, key)
+            if meeting is not None:
+                meeting['status'] = 'Completed'
+    except KeyError:
+        meeting = None
+    if meeting is None:
+        # Cancelled in another session; redraw the list as it is now
+        st.session_state.full_rerun = True
+    else:
+        record_write([emp_id])
+
+def render_progress(emp_data):
+    """Sidebar onboarding progress for the selected employee"""
+    completion = get_completion_percentage(emp_data)
+    st.metric("Onboarding Progress", f"{completion}%")
+    st.progress(completion / 100)
+
+def render_document_stats(emp_data):
+    """Document status counts"""
+    col1, col2, col3, col4 = st.columns(4)
+    total_docs = len(emp_data['documents'])
+    verified = sum(1 for d in emp_data['documents'].values() if d['status'] == 'Verified')
+    uploaded = sum(1 for d in emp_data['documents'].values() if d['status'] == 'Uploaded')
+    pending = sum(1 for d in emp_data['documents'].values() if d['status'] == 'Pending')
+
+    col1.metric("Total Documents", total_docs)
+    col2.metric("✅ Verified", verified)
+    col3.metric("📤 Uploaded", uploaded)
+    col4.metric("⏳ Pending", pending)
+
+def render_task_stats(emp_data):
+    """Task status counts"""
+    col1, col2, col3, col4 = st.columns(4)
+    total_tasks = len(emp_data['tasks'])
+    completed = sum(1 for t in emp_data['tasks'] if t['status'] == 'Completed')
+    in_progress = sum(1 for t in emp_data['tasks'] if t['status'] == 'In Progress')
+    locked = sum(1 for t in emp_data['tasks'] if t['status'] == 'Locked')
+
+    col1.metric("Total Tasks", total_tasks)
+    col2.metric("✅ Completed", completed)
+    col3.metric("🔄 In Progress", in_progress)
+    col4.metric("🔒 Locked", locked)
+
+def render_equipment_stats(emp_data):
+    """Equipment assignment counts"""
+    col1, col2, col3 = st.columns(3)
+    total_items = len(emp_data['equipment'])
+    assigned = sum(1 for e in emp_data['equipment'].values() if e['status'] == 'Assigned')
+    pending = total_items - assigned
+
+    col1.metric("Total Items", total_items)
+    col2.metric("✅ Assigned", assigned)
+    col3.metric("⏳ Pending", pending)
+
+def render_compliance_stats(emp_data):
+    """Compliance training counts"""
+    col1, col2, col3, col4 = st.columns(4)
+    total_training = len(emp_data['compliance'])
+    completed = sum(1 for c in emp_data['compliance'].values() if c['status'] == 'Completed')
+    overdue = sum(1 for c in emp_data['compliance'].values() 
+                 if c['status'] != 'Completed' and c['due_date'] < datetime.now())
+    in_progress = sum(1 for c in emp_data['compliance'].values() if c['status'] == 'In Progress')
+
+    col1.metric("Total Modules", total_training)
+    col2.metric("✅ Completed", completed)
+    col3.metric("⚠️ Overdue", overdue, delta_color="inverse")
+    col4.metric("🔄 In Progress", in_progress)
+
+def render_meeting_stats(emp_data):
+    """Meeting counts"""
+    scheduled = sum(1 for m in emp_data['meetings'] if m['status'] == 'Scheduled')
+    completed = sum(1 for m in emp_data['meetings'] if m['status'] == 'Completed')
+
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Total Meetings", len(emp_data['meetings']))
+    col2.metric("📅 Scheduled", scheduled)
+    col3.metric("✅ Completed", completed)
+
+@st.fragment
+def document_row(emp_id, doc_name, summaries):
+    """One document row; its actions rerun only this row and the summary metrics"""
+    rerun_page_if_needed()
+    emp_data = st.session_state.employees[emp_id]
+    doc_info = emp_data['documents'][doc_name]
+    with st.container():
+        col1, col2, col3, col4, col5 = st.columns([3, 1.5, 1, 1.5, 1.5])
+        
+        with col1:
+            st.markdown(f"{catalogs.PRIORITY_ICONS.get(doc_info['priority'], '⚪')} **{doc_name}**")
+            st.caption(f"Priority: {doc_info['priority']}")
+        
+        with col2:
+            emoji = catalogs.DOCUMENT_STATUS_ICONS.get(doc_info['status'], '⚪')
+            color = get_status_color(doc_info['status'])
+            st.markdown(f"<span style='color: {color}; font-weight: 600;'>{emoji} {doc_info['status']}</span>", 
+                      unsafe_allow_html=True)
+        
+        with col3:
+            if doc_info['uploaded']:
+                st.caption(f"📅 {doc_info['uploaded'].strftime('%m/%d/%y')}")
+            if doc_info.get('file'):
+                st.caption(f"📎 {doc_info['file']['size'] / 1024:.0f} KB")
+        
+        with col4:
+            uploaded_file = st.file_uploader("Upload", 
+                                            key=f"upload_{doc_name}_{emp_id}",
+                                            label_visibility="collapsed",
+                                            accept_multiple_files=False)
+            # The widget keeps its file across reruns, so submit each file only once
+            if uploaded_file and uploaded_file.file_id != doc_info.get('last_file_id'):
+                with st.session_state.employees.edit(emp_id) as emp:
+                    emp['documents'][doc_name]['last_file_id'] = uploaded_file.file_id
+                record_write([emp_id])
+                st.session_state.upload_pending[(emp_id, doc_name)] = get_upload_pipeline().submit(
+                    uploaded_file, uploaded_file.name, (emp_id, doc_name), upload_finished)
+            if (emp_id, doc_name) in st.session_state.upload_pending:
+                st.caption("⏳ Processing upload...")
+                st.button("🔄 Refresh", key=f"refresh_upload_{doc_name}_{emp_id}",
+                          on_click=refresh_uploads, args=((emp_id, doc_name),))
+            elif doc_info.get('upload_error'):
+                st.caption(f"❌ {doc_info['upload_error']}")
+        
+        with col5:
+            if doc_info['status'] == 'Uploaded':
+                col_a, col_b = st.columns(2)
+                col_a.button("✓", key=f"verify_{doc_name}_{emp_id}", type="primary",
+                             on_click=row_action, args=([make_op(emp_id, 'Document', doc_name, 'verify')],))
+                col_b.button("✗", key=f"reject_{doc_name}_{emp_id}", type="secondary",
+                             on_click=row_action, args=([make_op(emp_id, 'Document', doc_name, 'reject')],))
+        
+        st.divider()
     
-    # Documents
-    total_items += len(emp_data['documents'])
-    completed_items += sum(1 for d in emp_data['documents'].values() if d['status'] == 'Verified')
+    draw_summaries(summaries, emp_data)
+
+@st.fragment
+def task_row(emp_id, idx, summaries):
+    """One task row in the workflow"""
+    rerun_page_if_needed()
+    emp_data = st.session_state.employees[emp_id]
+    task = emp_data['tasks'][idx]
+    with st.container():
+        col1, col2, col3, col4 = st.columns([4, 1.5, 1.5, 2])
+        
+        with col1:
+            # Task icon based on status
+            icon = catalogs.TASK_STATUS_ICONS.get(task['status'], '⭕')
+            
+            st.markdown(f"{icon} **{task['name']}**")
+            
+            if task['dependency']:
+                st.caption(f"🔗 Requires: *{task['dependency']}*")
+            
+            st.caption(f"📂 {task['category']}")
+        
+        with col2:
+            due_date = task['due_date']
+            days_left = (due_date - datetime.now()).days
+            
+            if days_left < 0 and task['status'] != 'Completed':
+                st.markdown(f"<span style='color: #ef4444; font-weight: 600;'>⚠️ Overdue</span>", unsafe_allow_html=True)
+            else:
+                st.write(f"📅 {due_date.strftime('%m/%d/%y')}")
+                if days_left <= 3 and task['status'] != 'Completed':
+                    st.caption(f"⏰ {days_left} days left")
+        
+        with col3:
+            color = get_status_color(task['status'])
+            st.markdown(f"<span style='color: {color}; font-weight: 600;'>{task['status']}</span>", 
+                      unsafe_allow_html=True)
+        
+        with col4:
+            if task['status'] == 'Locked':
+                st.button("🔒 Locked", disabled=True, key=f"task_{idx}_{emp_id}")
+            elif task['status'] == 'Completed':
+                st.success("✅ Done!")
+            elif task['status'] == 'Not Started':
+                st.button("▶️ Start Task", key=f"task_{idx}_{emp_id}", type="primary",
+                          on_click=row_action, args=([make_op(emp_id, 'Task', task['name'], 'start')],))
+            else:  # In Progress
+                st.button("✓ Complete", key=f"task_{idx}_{emp_id}", type="primary",
+                          on_click=row_action, args=([make_op(emp_id, 'Task', task['name'], 'complete')],))
+        
+        st.divider()
     
-    # Tasks
-    total_items += len(emp_data['tasks'])
-    completed_items += sum(1 for t in emp_data['tasks'] if t['status'] == 'Completed')
+    draw_summaries(summaries, emp_data)
+
+@st.fragment
+def equipment_row(emp_id, eq_name, summaries):
+    """One equipment item; typing a serial number reruns only this row"""
+    rerun_page_if_needed()
+    emp_data = st.session_state.employees[emp_id]
+    eq_info = emp_data['equipment'][eq_name]
+    with st.container():
+        col1, col2, col3, col4 = st.columns([3, 2, 2, 2])
+        
+        with col1:
+            st.markdown(f"**{eq_name}**")
+            if eq_info.get('serial_number'):
+                st.caption(f"S/N: {eq_info['serial_number']}")
+        
+        with col2:
+            if eq_info['status'] == 'Assigned':
+                st.success(f"✅ Assigned")
+                if eq_info['assigned_date']:
+                    st.caption(f"{eq_info['assigned_date'].strftime('%m/%d/%y')}")
+            else:
+                st.warning("⏳ Pending")
+        
+        with col3:
+            if eq_info['status'] == 'Pending':
+                serial = st.text_input("Serial #", key=f"serial_{eq_name}_{emp_id}", 
+                                     placeholder="Optional", label_visibility="collapsed")
+        
+        with col4:
+            if eq_info['status'] == 'Pending':
+                st.button("✓ Assign", key=f"eq_{eq_name}_{emp_id}", type="primary",
+                          on_click=assign_equipment, args=(emp_id, eq_name))
+            else:
+                if eq_info.get('assigned_by'):
+                    st.caption(f"By: {eq_info['assigned_by']}")
+        
+        st.divider()
     
-    # Equipment
-    total_items += len(emp_data['equipment'])
-    completed_items += sum(1 for e in emp_data['equipment'].values() if e['status'] == 'Assigned')
+    draw_summaries(summaries, emp_data)
+
+@st.fragment
+def training_row(emp_id, training_name, summaries):
+    """One compliance training module"""
+    rerun_page_if_needed()
+    emp_data = st.session_state.employees[emp_id]
+    training_info = emp_data['compliance'][training_name]
+    with st.container():
+        col1, col2, col3, col4, col5 = st.columns([3, 1, 1.5, 1, 1.5])
+        
+        with col1:
+            priority_icon = catalogs.PRIORITY_ICONS.get(training_info['priority'], '⚪')
+            
+            st.markdown(f"{priority_icon} **{training_name}**")
+            st.caption(f"⏱️ Duration: {training_info['duration']} | Priority: {training_info['priority']}")
+        
+        with col2:
+            due_date = training_info['due_date']
+            days_left = (due_date - datetime.now()).days
+            
+            if training_info['status'] == 'Completed':
+                st.success("✅ Done")
+            elif days_left < 0:
+                st.error("⚠️ Overdue")
+            else:
+                st.write(f"📅 {due_date.strftime('%m/%d')}")
+        
+        with col3:
+            if training_info['status'] == 'Completed':
+                st.caption(f"✓ {training_info['completed'].strftime('%m/%d/%y')}")
+            elif days_left < 0:
+                st.caption(f"{abs(days_left)} days overdue")
+            else:
+                st.caption(f"{days_left} days left")
+        
+        with col4:
+            color = get_status_color(training_info['status'])
+            st.markdown(f"<span style='color: {color}; font-weight: 600;'>{training_info['status']}</span>", 
+                      unsafe_allow_html=True)
+        
+        with col5:
+            if training_info['status'] == 'Not Started':
+                st.button("▶️ Start", key=f"start_{training_name}_{emp_id}", type="primary",
+                          on_click=row_action, args=([make_op(emp_id, 'Compliance', training_name, 'start')],))
+            elif training_info['status'] == 'In Progress':
+                st.button("✓ Complete", key=f"comp_{training_name}_{emp_id}", type="primary",
+                          on_click=row_action, args=([make_op(emp_id, 'Compliance', training_name, 'complete')],))
+        
+        st.divider()
     
-    # Compliance
-    total_items += len(emp_data['compliance'])
-    completed_items += sum(1 for c in emp_data['compliance'].values() if c['status'] == 'Completed')
+    draw_summaries(summaries, emp_data)
+
+@st.fragment
+def meeting_row(emp_id, key, idx, summaries):
+    """One scheduled meeting, found by its meeting_key() in the current record"""
+    rerun_page_if_needed()
+    emp_data = st.session_state.employees[emp_id]
+    meeting = find_meeting(emp_data, key)
+    if meeting is None:
+        return
+    meeting_dt = meeting['datetime']
+    is_upcoming = meeting_dt > datetime.now()
     
-    return int((completed_items / total_items * 100)) if total_items > 0 else 0
+    with st.expander(
+        f"{'📅' if is_upcoming else '✅'} {meeting['department']} - {meeting_dt.strftime('%b %d, %Y at %I:%M %p')}",
+        expanded=is_upcoming and meeting['status'] == 'Scheduled'
+    ):
+        col1, col2 = st.columns([2, 1])
+        
+        with col1:
+            st.write(f"**Duration:** {meeting['duration']}")
+            if meeting['location']:
+                st.write(f"**Location:** {meeting['location']}")
+            if meeting['attendees']:
+                st.write(f"**Attendees:** {meeting['attendees']}")
+            if meeting['notes']:
+                st.write(f"**Notes:** {meeting['notes']}")
+        
+        with col2:
+            if meeting['status'] == 'Scheduled':
+                st.button("✓ Mark Complete", key=f"meeting_{idx}_{emp_id}", type="primary",
+                          on_click=complete_meeting, args=(emp_id, key))
+                st.button("🗑️ Cancel", key=f"cancel_meeting_{idx}_{emp_id}",
+                          on_click=cancel_meeting, args=(emp_id, key))
+            else:
+                st.success("✅ Completed")
+    
+    draw_summaries(summaries, emp_data)
 
-def get_status_color(status):
-    """Return color code for status"""
-    colors = {
-        'Pending': '#fbbf24',
-        'Uploaded': '#60a5fa',
-        'Verified': '#34d399',
-        'Rejected': '#f87171',
-        'Not Started': '#94a3b8',
-        'In Progress': '#60a5fa',
-        'Completed': '#34d399',
-        'Locked': '#cbd5e1',
-        'Assigned': '#34d399',
-        'Scheduled': '#60a5fa',
-        'Overdue': '#ef4444',
-        'Critical': '#dc2626',
-        'High': '#f59e0b',
-        'Medium': '#3b82f6',
-        'Low': '#6b7280'
-    }
-    return colors.get(status, '#6b7280')
+# Background reports
+def submit_report(owner, report_name):
+    """Start a report job; records are read by the job's workers, not the script thread"""
+    store = st.session_state.employees
+    manager = get_job_manager()
+    if report_name in reports.MAP_REDUCE_REPORTS:
+        reduce_func = reports.MAP_REDUCE_REPORTS[report_name][2]
+        return manager.submit_map_reduce(
+            owner, report_name, lambda: reports.report_chunks(report_name, store), reports.map_report, reduce_func,
+            release=reports.release_chunks)
+    if report_name == "Archived Item Export":
+        cold = get_archive()
+        return manager.submit_io(owner, report_name, reports.export_items, cold.scan(), len(cold))
+    return manager.submit_io(owner, report_name, reports.export_items, store.scan(), len(store))
+
+@st.fragment(run_every=2)
+def active_reports(owner, watching):
+    """Poll running jobs; a finished job reruns the page to show its result"""
+    manager = get_job_manager()
+    running = [job for job in manager.jobs(owner) if job.active]
+    if any(job.id not in {j.id for j in running} for job in watching):
+        st.rerun()
+    for job in running:
+        col1, col2 = st.columns([4, 1])
+        with col1:
+            st.progress(job.progress, text=f"**{job.name}** · {job.status} · started {job.submitted_at.strftime('%H:%M:%S')}")
+        with col2:
+            st.button("⛔ Cancel", key=f"cancel_job_{job.id}", on_click=manager.cancel, args=(job.id,))
+    if not running:
+        st.caption("No reports running.")
 
 # Sidebar
 with st.sidebar:
@@ -221,26 +840,33 @@ with st.sidebar:
                     ["📊 Dashboard", 
                      "👥 Employee Management", 
                      "📄 Documents", 
+                     "🗂️ Verification Queue", 
                      "✅ Tasks & Workflow", 
+                     "📆 Cohort Timeline",
                      "📅 Meetings", 
                      "💻 Equipment", 
                      "📚 Compliance Training", 
-                     "📊 Surveys & Analytics"],
+                     "📊 Surveys & Analytics",
+                     "⚡ Batch Actions",
+                     "⏱️ SLA Analytics",
+                     "⚠️ At-Risk Forecast",
+                     "🔻 Funnel Analysis",
+                     "📑 Reports",
+                     "📬 Notifications"],
                     label_visibility="collapsed")
     
     # Employee selector
     if st.session_state.employees:
         st.markdown("---")
         st.markdown("**Select Employee**")
-        employee_names = list(st.session_state.employees.keys())
-        selected = st.selectbox("", ["All Employees"] + employee_names, label_visibility="collapsed")
-        st.session_state.current_employee = None if selected == "All Employees" else selected
+        store = st.session_state.employees
+        selected = st.selectbox("", [None] + list(store.keys()), label_visibility="collapsed",
+                                format_func=lambda emp_id: "All Employees" if emp_id is None else store.label(emp_id))
+        st.session_state.current_employee = selected
         
+        progress_slot = st.empty()
         if st.session_state.current_employee:
-            emp_data = st.session_state.employees[st.session_state.current_employee]
-            completion = get_completion_percentage(emp_data)
-            st.metric("Onboarding Progress", f"{completion}%")
-            st.progress(completion / 100)
+            render_progress(st.session_state.employees[st.session_state.current_employee])
     
     st.markdown("---")
     st.caption("v2.0 Professional Edition")
@@ -266,27 +892,55 @@ if page == "📊 Dashboard":
         </div>
         """, unsafe_allow_html=True)
     else:
-        # Key metrics
+        # Figures come from the materialized snapshot, refreshed in the background
+        view = get_dashboard()
+        snap = view.current()
+        
+        col1, col2 = st.columns([4, 1])
+        with col1:
+            age = int(snap.age())
+            freshness = "just now" if age < 5 else f"{age}s ago" if age < 120 else f"{age // 60} min ago"
+            pending = f" · {view.writes_since} change(s) since" if view.writes_since else ""
+            st.caption(f"🕒 Updated {freshness} ({snap.computed_at.strftime('%H:%M:%S')}){pending}")
+        with col2:
+            st.button("🔄 Refresh now", key="dashboard_refresh", use_container_width=True, on_click=view.refresh)
+        
+        # Key metrics, with deltas and sparklines from the KPI history
+        history = get_kpi_recorder()
+        periods = {"vs yesterday": 86400, "vs last week": 7 * 86400}
+        period = st.radio("Compare", list(periods), horizontal=True, label_visibility="collapsed",
+                          key="dashboard_period")
+        
+        def kpi_metric(column, label, kpi, delta_color="normal", unit=""):
+            value = getattr(snap, kpi)
+            delta = history.delta(kpi, value, periods[period])
+            _, trend = history.series(kpi, periods[period], max_points=kpi_history.SPARKLINE_POINTS)
+            column.metric(label, f"{value}{unit}",
+                          delta=None if delta is None else f"{delta:+.0f}{unit}",
+                          delta_color=delta_color,
+                          delta_description=period if delta is not None else None,
+                          chart_data=trend.tolist() if len(trend) > 1 else None)
+        
         col1, col2, col3, col4, col5 = st.columns(5)
         
-        total_employees = len(st.session_state.employees)
-        pending_docs = sum(1 for emp in st.session_state.employees.values() 
-                          for doc in emp['documents'].values() if doc['status'] in ['Pending', 'Uploaded'])
-        pending_equipment = sum(1 for emp in st.session_state.employees.values() 
-                               for eq in emp['equipment'].values() if eq['status'] == 'Pending')
-        overdue_compliance = sum(1 for emp in st.session_state.employees.values() 
-                                for comp in emp['compliance'].values() 
-                                if comp['status'] != 'Completed' and comp['due_date'] < datetime.now())
-        avg_completion = int(sum(get_completion_percentage(emp) for emp in st.session_state.employees.values()) / total_employees)
-        
-        col1.metric("Active Employees", total_employees, delta=None)
-        col2.metric("Pending Documents", pending_docs, delta=None, delta_color="inverse")
-        col3.metric("Equipment Requests", pending_equipment, delta=None, delta_color="inverse")
-        col4.metric("Overdue Training", overdue_compliance, delta=None, delta_color="inverse")
-        col5.metric("Avg. Completion", f"{avg_completion}%", delta=None)
+        kpi_metric(col1, "Active Employees", 'total_employees')
+        kpi_metric(col2, "Pending Documents", 'pending_documents', delta_color="inverse")
+        kpi_metric(col3, "Equipment Requests", 'pending_equipment', delta_color="inverse")
+        kpi_metric(col4, "Overdue Training", 'overdue_compliance', delta_color="inverse")
+        kpi_metric(col5, "Avg. Completion", 'avg_completion', unit="%")
         
         st.markdown("---")
         
+        # The per-employee chart and cards show one page of employees at a time
+        page_size = dashboard.OVERVIEW_PAGE_SIZE
+        offsets = list(range(0, len(snap.employees), page_size))
+        offset = 0
+        if len(offsets) > 1:
+            offset = st.select_slider(
+                "Employees", offsets, key="dashboard_page",
+                format_func=lambda start: f"#{start + 1}–{min(start + page_size, len(snap.employees))}")
+        window = slice(offset, offset + page_size)
+        
         # Charts
         col1, col2 = st.columns(2)
         
@@ -294,14 +948,11 @@ if page == "📊 Dashboard":
             st.markdown("### 📈 Onboarding Progress by Employee")
             
             # Progress chart
-            emp_names = []
-            completions = []
-            for emp_name, emp_data in st.session_state.employees.items():
-                emp_names.append(emp_name)
-                completions.append(get_completion_percentage(emp_data))
+            emp_labels = [label for label, _ in snap.progress[window]]
+            completions = [completion for _, completion in snap.progress[window]]
             
             fig = go.Figure(data=[
-                go.Bar(x=emp_names, y=completions, 
+                go.Bar(x=emp_labels, y=completions, 
                        marker_color='#667eea',
                        text=completions,
                        texttemplate='%{text}%',
@@ -321,16 +972,13 @@ if page == "📊 Dashboard":
             st.markdown("### 🎯 Task Status Distribution")
             
             # Task status pie chart
-            status_counts = {'Not Started': 0, 'In Progress': 0, 'Completed': 0, 'Locked': 0}
-            for emp_data in st.session_state.employees.values():
-                for task in emp_data['tasks']:
-                    status_counts[task['status']] = status_counts.get(task['status'], 0) + 1
+            status_counts = dict(snap.task_status)
             
             fig = go.Figure(data=[go.Pie(
                 labels=list(status_counts.keys()),
                 values=list(status_counts.values()),
                 hole=.4,
-                marker_colors=['#94a3b8', '#60a5fa', '#34d399', '#cbd5e1']
+                marker_colors=[get_status_color(status) for status in status_counts]
             )])
             fig.update_layout(
                 height=300,
@@ -339,55 +987,65 @@ if page == "📊 Dashboard":
             )
             st.plotly_chart(fig, use_container_width=True)
         
+        st.markdown("### 🏢 Progress by Department")
+        dept_df = pd.DataFrame(list(snap.departments), columns=['Department', 'Employees', 'Avg. Completion %'])
+        fig = px.bar(dept_df, x='Department', y='Avg. Completion %', text='Avg. Completion %',
+                     hover_data=['Employees'], color_discrete_sequence=['#764ba2'])
+        fig.update_layout(
+            yaxis_range=[0, 110],
+            height=300,
+            margin=dict(l=20, r=20, t=20, b=20),
+            plot_bgcolor='rgba(0,0,0,0)',
+            paper_bgcolor='rgba(0,0,0,0)'
+        )
+        st.plotly_chart(fig, use_container_width=True)
+        
         st.markdown("---")
         
         # Employee cards
         st.markdown("### 👥 Employee Overview")
         
-        for emp_name, emp_data in st.session_state.employees.items():
-            with st.expander(f"**{emp_name}** - {emp_data['role']} | {emp_data['department']}", expanded=False):
+        for summary in snap.employees[window]:
+            emp_id = summary['id']
+            with st.expander(f"**{summary['name']}** - {summary['role']} | {summary['department']}", expanded=False):
                 col1, col2, col3, col4 = st.columns(4)
                 
                 with col1:
-                    docs_complete = sum(1 for d in emp_data['documents'].values() if d['status'] == 'Verified')
-                    st.metric("Documents", f"{docs_complete}/{len(emp_data['documents'])}")
+                    st.metric("Documents", f"{summary['documents_done']}/{summary['documents_total']}")
                 
                 with col2:
-                    tasks_complete = sum(1 for t in emp_data['tasks'] if t['status'] == 'Completed')
-                    st.metric("Tasks", f"{tasks_complete}/{len(emp_data['tasks'])}")
+                    st.metric("Tasks", f"{summary['tasks_done']}/{summary['tasks_total']}")
                 
                 with col3:
-                    equipment_assigned = sum(1 for e in emp_data['equipment'].values() if e['status'] == 'Assigned')
-                    st.metric("Equipment", f"{equipment_assigned}/{len(emp_data['equipment'])}")
+                    st.metric("Equipment", f"{summary['equipment_done']}/{summary['equipment_total']}")
                 
                 with col4:
-                    compliance_done = sum(1 for c in emp_data['compliance'].values() if c['status'] == 'Completed')
-                    st.metric("Training", f"{compliance_done}/{len(emp_data['compliance'])}")
+                    st.metric("Training", f"{summary['compliance_done']}/{summary['compliance_total']}")
                 
                 # Progress bar
-                completion = get_completion_percentage(emp_data)
+                completion = summary['completion']
                 st.markdown(f"**Overall Progress:** {completion}%")
                 st.progress(completion / 100)
                 
                 # Quick actions
                 col1, col2, col3 = st.columns(3)
                 with col1:
-                    if st.button("📄 View Documents", key=f"docs_{emp_name}"):
-                        st.session_state.current_employee = emp_name
+                    if st.button("📄 View Documents", key=f"docs_{emp_id}"):
+                        st.session_state.current_employee = emp_id
                         st.rerun()
                 with col2:
-                    if st.button("✅ View Tasks", key=f"tasks_{emp_name}"):
-                        st.session_state.current_employee = emp_name
+                    if st.button("✅ View Tasks", key=f"tasks_{emp_id}"):
+                        st.session_state.current_employee = emp_id
                         st.rerun()
                 with col3:
-                    if st.button("📊 View Analytics", key=f"analytics_{emp_name}"):
-                        st.session_state.current_employee = emp_name
+                    if st.button("📊 View Analytics", key=f"analytics_{emp_id}"):
+                        st.session_state.current_employee = emp_id
                         st.rerun()
 
 elif page == "👥 Employee Management":
     st.title("👥 Employee Management")
     
-    tab1, tab2 = st.tabs(["➕ Add New Employee", "📋 View All Employees"])
+    tab1, tab2, tab3, tab4 = st.tabs(["➕ Add New Employee", "📋 View All Employees", "🔄 HR Sync", "🗄️ Archive"])
     
     with tab1:
         st.markdown("### Add New Hire to Onboarding")
@@ -401,9 +1059,7 @@ elif page == "👥 Employee Management":
                 role = st.text_input("Job Title *", placeholder="Senior Software Engineer")
             
             with col2:
-                department = st.selectbox("Department *", 
-                    ["Engineering", "Product", "Design", "Sales", "Marketing", 
-                     "Customer Success", "HR", "Finance", "Operations", "Legal"])
+                department = st.selectbox("Department *", catalogs.DEPARTMENTS)
                 start_date = st.date_input("Start Date *", min_value=datetime.now())
                 manager = st.text_input("Direct Manager", placeholder="Jane Smith")
             
@@ -411,16 +1067,18 @@ elif page == "👥 Employee Management":
             
             if submitted:
                 if name and email and role:
-                    if name not in st.session_state.employees:
-                        st.session_state.employees[name] = create_employee(
+                    try:
+                        emp_id = st.session_state.employees.add(create_employee(
                             name, email, department, 
                             datetime.combine(start_date, datetime.min.time()), role
-                        )
+                        ))
+                    except DuplicateEmployeeError:
+                        st.error("❌ An employee with this email address already exists!")
+                    else:
+                        record_write([emp_id])
                         st.success(f"✅ Successfully created onboarding plan for **{name}**!")
                         st.balloons()
                         st.rerun()
-                    else:
-                        st.error("❌ An employee with this name already exists!")
                 else:
                     st.error("❌ Please fill in all required fields!")
     
@@ -429,41 +1087,143 @@ elif page == "👥 Employee Management":
             st.markdown("### All Employees")
             
             # Create DataFrame
-            emp_list = []
-            for emp_name, emp_data in st.session_state.employees.items():
-                emp_list.append({
-                    'Name': emp_name,
-                    'Role': emp_data['role'],
-                    'Department': emp_data['department'],
-                    'Start Date': emp_data['start_date'].strftime('%Y-%m-%d'),
-                    'Progress': f"{get_completion_percentage(emp_data)}%",
-                    'Email': emp_data['email']
-                })
-            
-            df = pd.DataFrame(emp_list)
+            df = st.session_state.employees.summary_frame()
+            df['Start Date'] = df['Start Date'].dt.strftime('%Y-%m-%d')
+            df['Progress'] = df['Progress'].astype(str) + '%'
             st.dataframe(df, use_container_width=True, hide_index=True)
             
             st.markdown("---")
             
             # Individual employee management
             st.markdown("### Manage Individual Employees")
-            for emp_name, emp_data in st.session_state.employees.items():
-                with st.expander(f"{emp_name} - {emp_data['role']}"):
+            for summary in st.session_state.employees.summaries():
+                emp_id = summary['id']
+                with st.expander(f"{summary['name']} - {summary['role']}"):
                     col1, col2 = st.columns([3, 1])
                     
                     with col1:
-                        st.write(f"**Email:** {emp_data['email']}")
-                        st.write(f"**Department:** {emp_data['department']}")
-                        st.write(f"**Start Date:** {emp_data['start_date'].strftime('%B %d, %Y')}")
-                        st.write(f"**Days Since Start:** {(datetime.now() - emp_data['start_date']).days} days")
+                        st.write(f"**Employee ID:** {emp_id}")
+                        st.write(f"**Email:** {summary['email']}")
+                        st.write(f"**Department:** {summary['department']}")
+                        st.write(f"**Start Date:** {summary['start_date'].strftime('%B %d, %Y')}")
+                        st.write(f"**Days Since Start:** {(datetime.now() - summary['start_date']).days} days")
                     
                     with col2:
-                        if st.button("🗑️ Remove", key=f"remove_{emp_name}", type="secondary"):
-                            del st.session_state.employees[emp_name]
-                            st.success(f"Removed {emp_name}")
+                        if st.button("🗑️ Remove", key=f"remove_{emp_id}", type="secondary"):
+                            del st.session_state.employees[emp_id]
+                            get_verification_queue().remove_employee(emp_id)
+                            record_write([emp_id])
+                            st.success(f"Removed {summary['name']}")
                             st.rerun()
+                        if st.button("🗄️ Archive", key=f"archive_{emp_id}", type="secondary"):
+                            if archive_employees({emp_id: archive.REASON_MANUAL}):
+                                st.rerun()
         else:
             st.info("👆 No employees added yet. Use the form above to add your first employee.")
+    
+    with tab3:
+        st.markdown("### Sync New Hires from the HR System")
+        st.caption("Only records that changed since the last sync are applied; replaying a feed is a no-op.")
+        
+        col1, col2 = st.columns(2)
+        with col1:
+            drop_dir = st.text_input("File drop directory", value=hr_sync.DROP_DIR,
+                                     help="JSON Lines or CSV exports; *.delta.* files hold changes only")
+        with col2:
+            feed_url = st.text_input("Changes endpoint (optional)", value=hr_sync.FEED_URL,
+                                     placeholder="http://hr.example.com/changes")
+        
+        if st.button("🔄 Sync Now", type="primary", use_container_width=True):
+            try:
+                report = run_hr_sync(drop_dir if os.path.isdir(drop_dir) else None, feed_url)
+            except (OSError, ValueError) as e:
+                st.error(f"❌ Sync failed: {e}")
+            else:
+                st.success(f"✅ {len(report.created)} created, {len(report.updated)} updated, "
+                           f"{len(report.removed)} removed, {report.unchanged} unchanged "
+                           f"in {report.seconds:.2f}s")
+                if report.conflicts:
+                    st.warning(f"⚠️ {len(report.conflicts)} record(s) could not be applied; see conflicts below.")
+        
+        sync_state = get_hr_sync_state()
+        status = sync_state.status()
+        if status:
+            st.markdown("#### Feeds")
+            st.dataframe(pd.DataFrame(status), use_container_width=True, hide_index=True)
+        conflicts = sync_state.conflicts()
+        if conflicts:
+            st.markdown("#### Conflicts")
+            st.dataframe(pd.DataFrame(conflicts), use_container_width=True, hide_index=True)
+    
+    with tab4:
+        st.markdown("### Archived Onboardings")
+        cold = get_archive()
+        policy = f"or started more than {archive.ARCHIVE_AFTER_DAYS} days ago " if archive.ARCHIVE_AFTER_DAYS else ""
+        st.caption(f"Employees at 100% {policy}are moved here by a sweep every "
+                   f"{archive.SWEEP_INTERVAL / 60:.0f} minutes, so live views only cover active hires. "
+                   f"Restored employees are kept live for {archive.RESTORE_HOLD_DAYS} days.")
+        
+        sweeper = get_archive_sweeper()
+        if sweeper.last_error:
+            st.warning(f"⚠️ The last automatic sweep failed: {sweeper.last_error}")
+        if cold.clashes:
+            st.warning(f"⚠️ {len(cold.clashes)} employee(s) can't be archived: "
+                       + "; ".join(list(cold.clashes.values())[:5]))
+        
+        stats = cold.stats()
+        col1, col2, col3, col4 = st.columns(4)
+        col1.metric("Archived", stats['employees'])
+        col2.metric("✅ Completed", stats['reasons'].get(archive.REASON_COMPLETED, 0))
+        col3.metric("⌛ Aged Out", stats['reasons'].get(archive.REASON_AGED, 0))
+        col4.metric("Stored", f"{stats['stored_bytes'] / 1024:.0f} KB")
+        
+        if st.button("🗄️ Archive Finished Onboardings Now"):
+            moved = archive_employees()
+            st.success(f"✅ Archived {len(moved)} employee(s).")
+        
+        col1, col2, col3, col4 = st.columns(4)
+        with col1:
+            text = st.text_input("Name or Email", key="archive_text")
+        with col2:
+            department = st.selectbox("Department", ["All Departments"] + cold.options('department'), key="archive_department")
+        with col3:
+            cohort = st.selectbox("Cohort", ["All Cohorts"] + cold.options('cohort')[::-1], key="archive_cohort")
+        with col4:
+            reason = st.selectbox("Reason", ["All Reasons"] + cold.options('reason'), key="archive_reason")
+        
+        matches = cold.search(text=text or None,
+                              department=None if department == "All Departments" else department,
+                              cohort=None if cohort == "All Cohorts" else cohort,
+                              reason=None if reason == "All Reasons" else reason)
+        if not matches:
+            st.info("No archived employees match.")
+        else:
+            frame = pd.DataFrame(matches)
+            frame['Start Date'] = frame['Start Date'].dt.strftime('%Y-%m-%d')
+            frame['Progress'] = frame['Progress'].astype(str) + '%'
+            st.dataframe(frame, use_container_width=True, hide_index=True)
+            
+            col1, col2 = st.columns([3, 1])
+            with col1:
+                restore_id = st.selectbox("Restore", [row['ID'] for row in matches],
+                                          format_func=lambda emp_id: next(f"{row['Name']} ({row['Email']})"
+                                                                          for row in matches if row['ID'] == emp_id))
+            with col2:
+                st.write("")
+                if st.button("♻️ Restore", type="primary", use_container_width=True):
+                    try:
+                        cold.restore(st.session_state.employees, restore_id)
+                    except (KeyError, DuplicateEmployeeError) as e:
+                        st.error(f"❌ Could not restore: {e}")
+                    else:
+                        restored = st.session_state.employees[restore_id]
+                        for doc_name, doc in restored['documents'].items():
+                            if doc['status'] == 'Uploaded':
+                                get_verification_queue().push((restore_id, doc_name),
+                                                                         queue_key(restored, doc))
+                        record_write([restore_id])
+                        st.success(f"♻️ Restored {restored['name']}")
+                        st.rerun()
 
 elif page == "📄 Documents":
     st.title("📄 Document Collection & Verification")
@@ -471,22 +1231,14 @@ elif page == "📄 Documents":
     if not st.session_state.current_employee:
         st.warning("⚠️ Please select an employee from the sidebar to manage their documents.")
     else:
-        emp_name = st.session_state.current_employee
-        emp_data = st.session_state.employees[emp_name]
+        emp_id = st.session_state.current_employee
+        emp_data = st.session_state.employees[emp_id]
         
-        st.markdown(f"### Documents for **{emp_name}**")
+        st.markdown(f"### Documents for **{emp_data['name']}**")
         
         # Document stats
-        col1, col2, col3, col4 = st.columns(4)
-        total_docs = len(emp_data['documents'])
-        verified = sum(1 for d in emp_data['documents'].values() if d['status'] == 'Verified')
-        uploaded = sum(1 for d in emp_data['documents'].values() if d['status'] == 'Uploaded')
-        pending = sum(1 for d in emp_data['documents'].values() if d['status'] == 'Pending')
-        
-        col1.metric("Total Documents", total_docs)
-        col2.metric("✅ Verified", verified)
-        col3.metric("📤 Uploaded", uploaded)
-        col4.metric("⏳ Pending", pending)
+        summaries = [(progress_slot, render_progress), (st.empty(), render_document_stats)]
+        draw_summaries(summaries, emp_data)
         
         st.markdown("---")
         
@@ -498,51 +1250,92 @@ elif page == "📄 Documents":
         # Documents table
         for doc_name, doc_info in emp_data['documents'].items():
             if doc_info['status'] in filter_status or not filter_status:
-                with st.container():
-                    col1, col2, col3, col4, col5 = st.columns([3, 1.5, 1, 1.5, 1.5])
-                    
-                    with col1:
-                        priority_emoji = {"Critical": "🔴", "High": "🟠", "Medium": "🟡", "Low": "⚪"}
-                        st.markdown(f"{priority_emoji.get(doc_info['priority'], '⚪')} **{doc_name}**")
-                        st.caption(f"Priority: {doc_info['priority']}")
-                    
-                    with col2:
-                        status_colors = {
-                            'Pending': ('⏳', '#fbbf24'),
-                            'Uploaded': ('📤', '#60a5fa'),
-                            'Verified': ('✅', '#34d399'),
-                            'Rejected': ('❌', '#f87171')
-                        }
-                        emoji, color = status_colors.get(doc_info['status'], ('⚪', '#6b7280'))
-                        st.markdown(f"<span style='color: {color}; font-weight: 600;'>{emoji} {doc_info['status']}</span>", 
-                                  unsafe_allow_html=True)
-                    
-                    with col3:
-                        if doc_info['uploaded']:
-                            st.caption(f"📅 {doc_info['uploaded'].strftime('%m/%d/%y')}")
-                    
-                    with col4:
-                        uploaded_file = st.file_uploader("Upload", 
-                                                        key=f"upload_{doc_name}_{emp_name}",
-                                                        label_visibility="collapsed",
-                                                        accept_multiple_files=False)
-                        if uploaded_file:
-                            emp_data['documents'][doc_name]['status'] = 'Uploaded'
-                            emp_data['documents'][doc_name]['uploaded'] = datetime.now()
-                            st.rerun()
-                    
-                    with col5:
-                        if doc_info['status'] == 'Uploaded':
-                            col_a, col_b = st.columns(2)
-                            if col_a.button("✓", key=f"verify_{doc_name}_{emp_name}", type="primary"):
-                                emp_data['documents'][doc_name]['status'] = 'Verified'
-                                emp_data['documents'][doc_name]['verified_by'] = 'Admin'
-                                st.rerun()
-                            if col_b.button("✗", key=f"reject_{doc_name}_{emp_name}", type="secondary"):
-                                emp_data['documents'][doc_name]['status'] = 'Rejected'
-                                st.rerun()
-                    
-                    st.divider()
+                document_row(emp_id, doc_name, summaries)
+
+elif page == "🗂️ Verification Queue":
+    st.title("🗂️ Document Verification Queue")
+    
+    vq = get_verification_queue()
+    vq.expire_leases()
+    
+    # Queue stats
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Awaiting Verification", len(vq))
+    col2.metric("🔒 Claimed", vq.lease_count())
+    col3.metric("🔴 Critical Next", sum(1 for emp_id, doc_name in vq.peek(20)
+                                          if st.session_state.employees[emp_id]['documents'][doc_name]['priority'] == 'Critical'))
+    
+    st.markdown("---")
+    
+    verifier = current_user()
+    col1, col2, col3 = st.columns([2, 1, 1])
+    with col1:
+        st.text_input("Verifier", value=verifier, disabled=True,
+                      help="Claims are held under your sign-in, or this session if you aren't signed in")
+    with col2:
+        batch_size = st.number_input("Batch Size", min_value=1, max_value=100, value=10)
+    with col3:
+        st.write("")
+        if st.button("📥 Claim Next", type="primary", use_container_width=True, disabled=not verifier):
+            if vq.claim(verifier, batch_size):
+                st.rerun()
+            st.info("📭 The queue is empty.")
+    
+    # My claimed items
+    my_items = vq.claimed_by(verifier) if verifier else []
+    if my_items:
+        st.markdown(f"### Claimed by **{verifier}** ({len(my_items)})")
+        
+        rows = []
+        for emp_id, doc_name in my_items:
+            emp_data = st.session_state.employees[emp_id]
+            doc_info = emp_data['documents'][doc_name]
+            rows.append({
+                'Select': True,
+                'Employee': st.session_state.employees.label(emp_id),
+                'Document': doc_name,
+                'Priority': doc_info['priority'],
+                'Start Date': emp_data['start_date'].strftime('%Y-%m-%d'),
+                'Uploaded': doc_info['uploaded'].strftime('%m/%d/%y %H:%M') if doc_info['uploaded'] else '',
+                'File': (doc_info.get('file') or {}).get('filename', '')
+            })
+        
+        edited = st.data_editor(pd.DataFrame(rows), use_container_width=True, hide_index=True,
+                                disabled=['Employee', 'Document', 'Priority', 'Start Date', 'Uploaded', 'File'],
+                                key="verification_batch")
+        selected_items = [item for item, selected in zip(my_items, edited['Select']) if selected]
+        
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            st.button(f"✓ Verify Selected ({len(selected_items)})", type="primary", use_container_width=True,
+                      disabled=not selected_items, on_click=apply_claimed, args=(verifier, selected_items, 'verify'))
+        with col2:
+            st.button(f"✗ Reject Selected ({len(selected_items)})", use_container_width=True,
+                      disabled=not selected_items, on_click=apply_claimed, args=(verifier, selected_items, 'reject'))
+        with col3:
+            if st.button("↩️ Release All", use_container_width=True):
+                vq.release(verifier)
+                st.rerun()
+    
+    st.markdown("---")
+    st.markdown("### ⏭️ Up Next")
+    
+    upcoming = vq.peek(20)
+    if upcoming:
+        next_rows = []
+        for emp_id, doc_name in upcoming:
+            emp_data = st.session_state.employees[emp_id]
+            doc_info = emp_data['documents'][doc_name]
+            next_rows.append({
+                'Priority': f"{catalogs.PRIORITY_ICONS.get(doc_info['priority'], '⚪')} {doc_info['priority']}",
+                'Employee': st.session_state.employees.label(emp_id),
+                'Document': doc_name,
+                'Start Date': emp_data['start_date'].strftime('%Y-%m-%d'),
+                'Waiting': f"{(datetime.now() - doc_info['uploaded']).total_seconds() / 3600:.1f} h" if doc_info['uploaded'] else ''
+            })
+        st.dataframe(pd.DataFrame(next_rows), use_container_width=True, hide_index=True)
+    else:
+        st.success("✅ No documents are waiting for verification.")
 
 elif page == "✅ Tasks & Workflow":
     st.title("✅ Progressive Task Management")
@@ -550,22 +1343,14 @@ elif page == "✅ Tasks & Workflow":
     if not st.session_state.current_employee:
         st.warning("⚠️ Please select an employee from the sidebar to manage their tasks.")
     else:
-        emp_name = st.session_state.current_employee
-        emp_data = st.session_state.employees[emp_name]
+        emp_id = st.session_state.current_employee
+        emp_data = st.session_state.employees[emp_id]
         
-        st.markdown(f"### Task Workflow for **{emp_name}**")
+        st.markdown(f"### Task Workflow for **{emp_data['name']}**")
         
         # Task stats
-        col1, col2, col3, col4 = st.columns(4)
-        total_tasks = len(emp_data['tasks'])
-        completed = sum(1 for t in emp_data['tasks'] if t['status'] == 'Completed')
-        in_progress = sum(1 for t in emp_data['tasks'] if t['status'] == 'In Progress')
-        locked = sum(1 for t in emp_data['tasks'] if t['status'] == 'Locked')
-        
-        col1.metric("Total Tasks", total_tasks)
-        col2.metric("✅ Completed", completed)
-        col3.metric("🔄 In Progress", in_progress)
-        col4.metric("🔒 Locked", locked)
+        summaries = [(progress_slot, render_progress), (st.empty(), render_task_stats)]
+        draw_summaries(summaries, emp_data)
         
         st.markdown("---")
         
@@ -576,68 +1361,63 @@ elif page == "✅ Tasks & Workflow":
         # Tasks with dependency chain visualization
         for idx, task in enumerate(emp_data['tasks']):
             if selected_category == "All Categories" or task['category'] == selected_category:
-                with st.container():
-                    col1, col2, col3, col4 = st.columns([4, 1.5, 1.5, 2])
-                    
-                    with col1:
-                        # Task icon based on status
-                        icons = {
-                            'Locked': '🔒',
-                            'Not Started': '⭕',
-                            'In Progress': '🔄',
-                            'Completed': '✅'
-                        }
-                        icon = icons.get(task['status'], '⭕')
-                        
-                        st.markdown(f"{icon} **{task['name']}**")
-                        
-                        if task['dependency']:
-                            st.caption(f"🔗 Requires: *{task['dependency']}*")
-                        
-                        st.caption(f"📂 {task['category']}")
-                    
-                    with col2:
-                        due_date = task['due_date']
-                        days_left = (due_date - datetime.now()).days
-                        
-                        if days_left < 0 and task['status'] != 'Completed':
-                            st.markdown(f"<span style='color: #ef4444; font-weight: 600;'>⚠️ Overdue</span>", unsafe_allow_html=True)
-                        else:
-                            st.write(f"📅 {due_date.strftime('%m/%d/%y')}")
-                            if days_left <= 3 and task['status'] != 'Completed':
-                                st.caption(f"⏰ {days_left} days left")
-                    
-                    with col3:
-                        status_colors = {
-                            'Locked': '#cbd5e1',
-                            'Not Started': '#94a3b8',
-                            'In Progress': '#60a5fa',
-                            'Completed': '#34d399'
-                        }
-                        color = status_colors.get(task['status'], '#6b7280')
-                        st.markdown(f"<span style='color: {color}; font-weight: 600;'>{task['status']}</span>", 
-                                  unsafe_allow_html=True)
-                    
-                    with col4:
-                        if task['status'] == 'Locked':
-                            st.button("🔒 Locked", disabled=True, key=f"task_{idx}_{emp_name}")
-                        elif task['status'] == 'Completed':
-                            st.success("✅ Done!")
-                        elif task['status'] == 'Not Started':
-                            if st.button("▶️ Start Task", key=f"task_{idx}_{emp_name}", type="primary"):
-                                task['status'] = 'In Progress'
-                                st.rerun()
-                        else:  # In Progress
-                            if st.button("✓ Complete", key=f"task_{idx}_{emp_name}", type="primary"):
-                                task['status'] = 'Completed'
-                                task['progress'] = 100
-                                # Unlock dependent tasks
-                                for t in emp_data['tasks']:
-                                    if t['dependency'] == task['name'] and t['status'] == 'Locked':
-                                        t['status'] = 'Not Started'
-                                st.rerun()
-                    
-                    st.divider()
+                task_row(emp_id, idx, summaries)
+
+elif page == "📆 Cohort Timeline":
+    st.title("📆 Cohort Task Timeline")
+    
+    store = st.session_state.employees
+    summaries = store.summaries()
+    
+    if not summaries:
+        st.info("📆 No employees yet. Add employees to see their task timelines.")
+    else:
+        col1, col2, col3, col4 = st.columns([2, 2, 1, 1])
+        with col1:
+            cohorts = sorted({analytics.get_cohort(s['start_date']) for s in summaries}, reverse=True)
+            cohort = st.selectbox("Cohort", ["All Cohorts"] + cohorts)
+        with col2:
+            departments = sorted({s['department'] for s in summaries})
+            department = st.selectbox("Department", ["All Departments"] + departments)
+        with col3:
+            window_size = st.selectbox("Employees per View", timeline.WINDOW_SIZES, index=1)
+        with col4:
+            show_dependencies = st.toggle("Show Dependencies")
+        
+        ids = timeline.cohort_ids(summaries,
+                                  cohort=None if cohort == "All Cohorts" else cohort,
+                                  department=None if department == "All Departments" else department)
+        layout = timeline.task_layout()
+        statuses = store.item_statuses('tasks', layout.names, ids)
+        starts = {s['id']: s['start_date'] for s in summaries}
+        start_dates = [starts[emp_id] for emp_id in ids]
+        
+        # Cohort-wide stats
+        counts = timeline.status_counts(statuses)
+        overdue = timeline.overdue_mask(layout, timeline.to_ms(start_dates), statuses)
+        col1, col2, col3, col4 = st.columns(4)
+        col1.metric("Employees", len(ids))
+        col2.metric("✅ Tasks Completed", counts['Completed'])
+        col3.metric("🔄 In Progress", counts['In Progress'])
+        col4.metric("⚠️ Overdue Tasks", int(overdue.sum()), delta_color="inverse")
+        
+        st.markdown("---")
+        
+        if not ids:
+            st.info("No employees match these filters.")
+        else:
+            offsets = list(range(0, len(ids), window_size))
+            offset = 0
+            if len(offsets) > 1:
+                offset = st.select_slider(
+                    "Employees", offsets,
+                    format_func=lambda start: f"#{start + 1}–{min(start + window_size, len(ids))}")
+            window = slice(offset, offset + window_size)
+            window_ids = ids[window]
+            fig = timeline.timeline_figure(layout, [store.label(emp_id) for emp_id in window_ids],
+                                           start_dates[window], statuses[window],
+                                           show_dependencies=show_dependencies)
+            st.plotly_chart(fig, use_container_width=True)
 
 elif page == "📅 Meetings":
     st.title("📅 Orientation Meeting Scheduler")
@@ -645,38 +1425,31 @@ elif page == "📅 Meetings":
     if not st.session_state.current_employee:
         st.warning("⚠️ Please select an employee from the sidebar to schedule meetings.")
     else:
-        emp_name = st.session_state.current_employee
-        emp_data = st.session_state.employees[emp_name]
+        emp_id = st.session_state.current_employee
+        emp_data = st.session_state.employees[emp_id]
+        
+        st.markdown(f"### Meeting Schedule for **{emp_data['name']}**")
         
-        st.markdown(f"### Meeting Schedule for **{emp_name}**")
+        _, feed = get_calendar_feeds().employee_feed(emp_id)
+        st.download_button("🗓️ Export to Calendar (.ics)", data=b''.join(feed), file_name=f"onboarding-{emp_id}.ics",
+                           mime='text/calendar')
+        st.caption(f"Meetings and open task and training due dates. Calendar apps can subscribe to "
+                   f"`/api/calendars/employees/{emp_id}.ics` on the JSON API to stay up to date.")
         
         tab1, tab2 = st.tabs(["📅 Schedule New Meeting", "📋 Upcoming Meetings"])
         
         with tab1:
-            departments = [
-                "HR Orientation",
-                "IT Setup & Security",
-                "Direct Manager 1:1",
-                "Team Introduction",
-                "Finance & Benefits",
-                "Facilities Tour",
-                "Legal & Compliance",
-                "Product Training",
-                "Engineering Team",
-                "Customer Success Team"
-            ]
-            
             with st.form("schedule_meeting"):
                 col1, col2 = st.columns(2)
                 
                 with col1:
-                    dept = st.selectbox("Meeting Type", departments)
+                    dept = st.selectbox("Meeting Type", catalogs.MEETING_TYPES)
                     meeting_date = st.date_input("Date", min_value=datetime.now())
                     attendees = st.text_input("Attendees (optional)", placeholder="john@company.com, jane@company.com")
                 
                 with col2:
                     meeting_time = st.time_input("Time", value=datetime.now().replace(hour=10, minute=0))
-                    duration = st.selectbox("Duration", ["15 min", "30 min", "45 min", "1 hour", "1.5 hours", "2 hours"])
+                    duration = st.selectbox("Duration", catalogs.MEETING_DURATIONS)
                     location = st.text_input("Location/Link", placeholder="Conference Room A or Zoom link")
                 
                 notes = st.text_area("Meeting Notes/Agenda")
@@ -694,7 +1467,9 @@ elif page == "📅 Meetings":
                         'status': 'Scheduled',
                         'created_at': datetime.now()
                     }
-                    emp_data['meetings'].append(meeting)
+                    with st.session_state.employees.edit(emp_id) as emp:
+                        emp['meetings'].append(meeting)
+                    record_write([emp_id])
                     st.success(f"✅ Meeting '{dept}' scheduled successfully!")
                     st.rerun()
         
@@ -704,45 +1479,13 @@ elif page == "📅 Meetings":
                 sorted_meetings = sorted(emp_data['meetings'], key=lambda x: x['datetime'])
                 
                 # Stats
-                scheduled = sum(1 for m in emp_data['meetings'] if m['status'] == 'Scheduled')
-                completed = sum(1 for m in emp_data['meetings'] if m['status'] == 'Completed')
-                
-                col1, col2, col3 = st.columns(3)
-                col1.metric("Total Meetings", len(emp_data['meetings']))
-                col2.metric("📅 Scheduled", scheduled)
-                col3.metric("✅ Completed", completed)
+                summaries = [(st.empty(), render_meeting_stats)]
+                draw_summaries(summaries, emp_data)
                 
                 st.markdown("---")
                 
                 for idx, meeting in enumerate(sorted_meetings):
-                    meeting_dt = meeting['datetime']
-                    is_upcoming = meeting_dt > datetime.now()
-                    
-                    with st.expander(
-                        f"{'📅' if is_upcoming else '✅'} {meeting['department']} - {meeting_dt.strftime('%b %d, %Y at %I:%M %p')}",
-                        expanded=is_upcoming and meeting['status'] == 'Scheduled'
-                    ):
-                        col1, col2 = st.columns([2, 1])
-                        
-                        with col1:
-                            st.write(f"**Duration:** {meeting['duration']}")
-                            if meeting['location']:
-                                st.write(f"**Location:** {meeting['location']}")
-                            if meeting['attendees']:
-                                st.write(f"**Attendees:** {meeting['attendees']}")
-                            if meeting['notes']:
-                                st.write(f"**Notes:** {meeting['notes']}")
-                        
-                        with col2:
-                            if meeting['status'] == 'Scheduled':
-                                if st.button("✓ Mark Complete", key=f"meeting_{idx}", type="primary"):
-                                    emp_data['meetings'][idx]['status'] = 'Completed'
-                                    st.rerun()
-                                if st.button("🗑️ Cancel", key=f"cancel_meeting_{idx}"):
-                                    emp_data['meetings'].pop(idx)
-                                    st.rerun()
-                            else:
-                                st.success("✅ Completed")
+                    meeting_row(emp_id, meeting_key(meeting), idx, summaries)
             else:
                 st.info("📅 No meetings scheduled yet. Use the form above to schedule orientation meetings.")
 
@@ -752,62 +1495,20 @@ elif page == "💻 Equipment":
     if not st.session_state.current_employee:
         st.warning("⚠️ Please select an employee from the sidebar to manage equipment.")
     else:
-        emp_name = st.session_state.current_employee
-        emp_data = st.session_state.employees[emp_name]
+        emp_id = st.session_state.current_employee
+        emp_data = st.session_state.employees[emp_id]
         
-        st.markdown(f"### Equipment for **{emp_name}**")
+        st.markdown(f"### Equipment for **{emp_data['name']}**")
         
         # Equipment stats
-        col1, col2, col3 = st.columns(3)
-        total_items = len(emp_data['equipment'])
-        assigned = sum(1 for e in emp_data['equipment'].values() if e['status'] == 'Assigned')
-        pending = total_items - assigned
-        
-        col1.metric("Total Items", total_items)
-        col2.metric("✅ Assigned", assigned)
-        col3.metric("⏳ Pending", pending)
+        summaries = [(progress_slot, render_progress), (st.empty(), render_equipment_stats)]
+        draw_summaries(summaries, emp_data)
         
         st.markdown("---")
         
         # Equipment table
         for eq_name, eq_info in emp_data['equipment'].items():
-            with st.container():
-                col1, col2, col3, col4 = st.columns([3, 2, 2, 2])
-                
-                with col1:
-                    st.markdown(f"**{eq_name}**")
-                    if eq_info.get('serial_number'):
-                        st.caption(f"S/N: {eq_info['serial_number']}")
-                
-                with col2:
-                    if eq_info['status'] == 'Assigned':
-                        st.success(f"✅ Assigned")
-                        if eq_info['assigned_date']:
-                            st.caption(f"{eq_info['assigned_date'].strftime('%m/%d/%y')}")
-                    else:
-                        st.warning("⏳ Pending")
-                
-                with col3:
-                    if eq_info['status'] == 'Pending':
-                        serial = st.text_input("Serial #", key=f"serial_{eq_name}_{emp_name}", 
-                                             placeholder="Optional", label_visibility="collapsed")
-                
-                with col4:
-                    if eq_info['status'] == 'Pending':
-                        if st.button("✓ Assign", key=f"eq_{eq_name}_{emp_name}", type="primary"):
-                            emp_data['equipment'][eq_name]['status'] = 'Assigned'
-                            emp_data['equipment'][eq_name]['assigned_date'] = datetime.now()
-                            emp_data['equipment'][eq_name]['assigned_by'] = 'Admin'
-                            if f"serial_{eq_name}_{emp_name}" in st.session_state:
-                                serial_val = st.session_state[f"serial_{eq_name}_{emp_name}"]
-                                if serial_val:
-                                    emp_data['equipment'][eq_name]['serial_number'] = serial_val
-                            st.rerun()
-                    else:
-                        if eq_info.get('assigned_by'):
-                            st.caption(f"By: {eq_info['assigned_by']}")
-                
-                st.divider()
+            equipment_row(emp_id, eq_name, summaries)
 
 elif page == "📚 Compliance Training":
     st.title("📚 Compliance Training Tracker")
@@ -815,104 +1516,40 @@ elif page == "📚 Compliance Training":
     if not st.session_state.current_employee:
         st.warning("⚠️ Please select an employee from the sidebar to manage training.")
     else:
-        emp_name = st.session_state.current_employee
-        emp_data = st.session_state.employees[emp_name]
+        emp_id = st.session_state.current_employee
+        emp_data = st.session_state.employees[emp_id]
         
-        st.markdown(f"### Compliance Training for **{emp_name}**")
+        st.markdown(f"### Compliance Training for **{emp_data['name']}**")
         
         # Training stats
-        col1, col2, col3, col4 = st.columns(4)
-        total_training = len(emp_data['compliance'])
-        completed = sum(1 for c in emp_data['compliance'].values() if c['status'] == 'Completed')
-        overdue = sum(1 for c in emp_data['compliance'].values() 
-                     if c['status'] != 'Completed' and c['due_date'] < datetime.now())
-        in_progress = sum(1 for c in emp_data['compliance'].values() if c['status'] == 'In Progress')
-        
-        col1.metric("Total Modules", total_training)
-        col2.metric("✅ Completed", completed)
-        col3.metric("⚠️ Overdue", overdue, delta_color="inverse")
-        col4.metric("🔄 In Progress", in_progress)
+        summaries = [(progress_slot, render_progress), (st.empty(), render_compliance_stats)]
+        draw_summaries(summaries, emp_data)
         
         st.markdown("---")
         
         # Training modules
         for training_name, training_info in emp_data['compliance'].items():
-            with st.container():
-                col1, col2, col3, col4, col5 = st.columns([3, 1, 1.5, 1, 1.5])
-                
-                with col1:
-                    priority_colors = {
-                        'Critical': '🔴',
-                        'High': '🟠',
-                        'Medium': '🟡',
-                        'Low': '⚪'
-                    }
-                    priority_icon = priority_colors.get(training_info['priority'], '⚪')
-                    
-                    st.markdown(f"{priority_icon} **{training_name}**")
-                    st.caption(f"⏱️ Duration: {training_info['duration']} | Priority: {training_info['priority']}")
-                
-                with col2:
-                    due_date = training_info['due_date']
-                    days_left = (due_date - datetime.now()).days
-                    
-                    if training_info['status'] == 'Completed':
-                        st.success("✅ Done")
-                    elif days_left < 0:
-                        st.error("⚠️ Overdue")
-                    else:
-                        st.write(f"📅 {due_date.strftime('%m/%d')}")
-                
-                with col3:
-                    if training_info['status'] == 'Completed':
-                        st.caption(f"✓ {training_info['completed'].strftime('%m/%d/%y')}")
-                    elif days_left < 0:
-                        st.caption(f"{abs(days_left)} days overdue")
-                    else:
-                        st.caption(f"{days_left} days left")
-                
-                with col4:
-                    status_colors = {
-                        'Not Started': '#94a3b8',
-                        'In Progress': '#60a5fa',
-                        'Completed': '#34d399'
-                    }
-                    color = status_colors.get(training_info['status'], '#6b7280')
-                    st.markdown(f"<span style='color: {color}; font-weight: 600;'>{training_info['status']}</span>", 
-                              unsafe_allow_html=True)
-                
-                with col5:
-                    if training_info['status'] == 'Not Started':
-                        if st.button("▶️ Start", key=f"start_{training_name}_{emp_name}", type="primary"):
-                            emp_data['compliance'][training_name]['status'] = 'In Progress'
-                            st.rerun()
-                    elif training_info['status'] == 'In Progress':
-                        if st.button("✓ Complete", key=f"comp_{training_name}_{emp_name}", type="primary"):
-                            emp_data['compliance'][training_name]['status'] = 'Completed'
-                            emp_data['compliance'][training_name]['completed'] = datetime.now()
-                            st.rerun()
-                
-                st.divider()
+            training_row(emp_id, training_name, summaries)
         
         # Automatic reminders section
         st.markdown("---")
         st.markdown("### 📧 Automatic Reminders")
         
-        reminders = []
-        for training_name, training_info in emp_data['compliance'].items():
-            if training_info['status'] != 'Completed':
-                days_until_due = (training_info['due_date'] - datetime.now()).days
-                if days_until_due <= 7:
-                    reminders.append((training_name, training_info, days_until_due))
+        reminders = get_compliance_reminders(emp_data)
         
         if reminders:
-            for training_name, training_info, days_left in sorted(reminders, key=lambda x: x[2]):
+            queued = queue_reminders(emp_data, reminders)
+            for training_name, training_info, days_left in reminders:
                 if days_left < 0:
                     st.error(f"🚨 **Urgent:** {training_name} is {abs(days_left)} days overdue!")
                 elif days_left <= 3:
                     st.warning(f"⚠️ **Reminder:** {training_name} due in {days_left} days")
-                else:
+                elif training_name in queued:
                     st.info(f"📧 Reminder sent for {training_name} (due in {days_left} days)")
+                else:
+                    st.info(f"📧 {training_name} due in {days_left} days; already reminded today")
+            st.caption(f"📬 {len(queued)} new reminder(s) queued for {emp_data['email']}; "
+                       "repeats within 24 hours are suppressed and reminders queued together go out as one digest.")
         else:
             st.success("✅ All trainings are on track!")
 
@@ -922,13 +1559,13 @@ elif page == "📊 Surveys & Analytics":
     if not st.session_state.current_employee:
         st.warning("⚠️ Please select an employee from the sidebar.")
     else:
-        emp_name = st.session_state.current_employee
-        emp_data = st.session_state.employees[emp_name]
+        emp_id = st.session_state.current_employee
+        emp_data = st.session_state.employees[emp_id]
         
         tab1, tab2, tab3 = st.tabs(["📝 Submit Survey", "📈 View Analytics", "💬 Survey History"])
         
         with tab1:
-            st.markdown(f"### Weekly Check-in for **{emp_name}**")
+            st.markdown(f"### Weekly Check-in for **{emp_data['name']}**")
             
             with st.form("survey_form"):
                 st.markdown("#### Rate Your Experience")
@@ -986,14 +1623,16 @@ elif page == "📊 Surveys & Analytics":
                         'needs': needs,
                         'sentiment': 'Positive' if avg_score >= 7 else 'Neutral' if avg_score >= 4 else 'Negative'
                     }
-                    emp_data['surveys'].append(survey)
+                    with st.session_state.employees.edit(emp_id) as emp:
+                        emp['surveys'].append(survey)
+                    record_write([emp_id])
                     st.success("✅ Survey submitted successfully! Thank you for your feedback.")
                     st.balloons()
                     st.rerun()
         
         with tab2:
             if emp_data['surveys']:
-                st.markdown(f"### Analytics Dashboard for **{emp_name}**")
+                st.markdown(f"### Analytics Dashboard for **{emp_data['name']}**")
                 
                 # Calculate comprehensive metrics
                 surveys = emp_data['surveys']
@@ -1039,7 +1678,7 @@ elif page == "📊 Surveys & Analytics":
                         labels=list(sentiment_counts.keys()),
                         values=list(sentiment_counts.values()),
                         hole=.4,
-                        marker_colors=['#34d399', '#fbbf24', '#f87171']
+                        marker_colors=[catalogs.SENTIMENT_COLORS[sentiment] for sentiment in sentiment_counts]
                     )])
                     fig.update_layout(height=300, margin=dict(l=20, r=20, t=20, b=20))
                     st.plotly_chart(fig, use_container_width=True)
@@ -1099,22 +1738,11 @@ elif page == "📊 Surveys & Analytics":
         
         with tab3:
             if emp_data['surveys']:
-                st.markdown(f"### Survey History for **{emp_name}**")
+                st.markdown(f"### Survey History for **{emp_data['name']}**")
                 
                 for idx, survey in enumerate(reversed(emp_data['surveys'])):
-                    sentiment_colors = {
-                        'Positive': '#34d399',
-                        'Neutral': '#fbbf24',
-                        'Negative': '#f87171'
-                    }
-                    sentiment_icons = {
-                        'Positive': '😊',
-                        'Neutral': '😐',
-                        'Negative': '😟'
-                    }
-                    
-                    color = sentiment_colors[survey['sentiment']]
-                    icon = sentiment_icons[survey['sentiment']]
+                    color = catalogs.SENTIMENT_COLORS[survey['sentiment']]
+                    icon = catalogs.SENTIMENT_ICONS[survey['sentiment']]
                     
                     with st.expander(
                         f"{icon} {survey['date'].strftime('%B %d, %Y')} - {survey['sentiment']} (Score: {survey['avg_score']:.1f}/10)",
@@ -1144,6 +1772,443 @@ elif page == "📊 Surveys & Analytics":
             else:
                 st.info("📝 No surveys submitted yet. Use the 'Submit Survey' tab to add your first check-in!")
 
+elif page == "⏱️ SLA Analytics":
+    st.title("⏱️ Time-to-Complete & SLA Analytics")
+    
+    sla = get_sla()
+    durations = sla.frame()
+    
+    if durations.empty:
+        st.info("⏱️ No completed items yet. Durations appear here as documents are verified and tasks and trainings are completed.")
+    else:
+        # SLA stats
+        col1, col2, col3, col4 = st.columns(4)
+        total_breaches = int(durations['breached'].sum())
+        
+        col1.metric("Measured Durations", len(durations))
+        col2.metric("⚠️ SLA Breaches", total_breaches, delta_color="inverse")
+        col3.metric("Breach Rate", f"{total_breaches / len(durations) * 100:.0f}%")
+        col4.metric("Median Time", f"{durations['hours'].median():.1f} h")
+        
+        st.markdown("---")
+        
+        col1, col2 = st.columns([1, 3])
+        with col1:
+            slice_label = st.selectbox("Slice by", ["None"] + list(analytics.SLICES.keys()))
+            kind = st.selectbox("Item Type", ["All Types"] + list(analytics.STAGES.keys()))
+        
+        summary = sla.summary(analytics.SLICES.get(slice_label))
+        if kind != "All Types":
+            summary = summary[summary['kind'] == kind]
+        
+        with col2:
+            st.markdown("### 📊 p90 Hours by Stage")
+            chart_data = summary.copy()
+            chart_data['label'] = chart_data['kind'] + ': ' + chart_data['stage']
+            if slice_label != "None":
+                chart_data['label'] = chart_data[analytics.SLICES[slice_label]] + ' | ' + chart_data['label']
+            fig = go.Figure(data=[
+                go.Bar(x=chart_data['label'],
+                       y=chart_data['p90'],
+                       marker_color=['#ef4444' if b else '#667eea' for b in chart_data['breaches']],
+                       text=[f"{h:.1f}h" for h in chart_data['p90']],
+                       textposition='outside')
+            ])
+            fig.update_layout(
+                yaxis_title="Hours (p90)",
+                height=300,
+                margin=dict(l=20, r=20, t=20, b=20),
+                plot_bgcolor='rgba(0,0,0,0)',
+                paper_bgcolor='rgba(0,0,0,0)'
+            )
+            st.plotly_chart(fig, use_container_width=True)
+        
+        st.markdown("### 📋 Percentile Summary (hours)")
+        st.dataframe(summary.round(1), use_container_width=True, hide_index=True)
+        
+        st.markdown("---")
+        st.markdown("### 🚨 SLA Breaches by Stage")
+        breaches = sla.breach_counts()
+        breaches = breaches[breaches['breaches'] > 0]
+        if breaches.empty:
+            st.success("✅ No SLA breaches recorded!")
+        else:
+            st.dataframe(breaches, use_container_width=True, hide_index=True)
+    
+    st.markdown("---")
+    st.markdown("### 🐢 Longest Waiting Items")
+    open_items = analytics.get_open_item_ages(st.session_state.employees)
+    if open_items.empty:
+        st.success("✅ Nothing is currently waiting for review or completion.")
+    else:
+        st.dataframe(open_items.head(20).round(1), use_container_width=True, hide_index=True)
+
+elif page == "⚠️ At-Risk Forecast":
+    st.title("⚠️ At-Risk Onboarding Forecast")
+    
+    if not st.session_state.employees:
+        st.info("⚠️ No employees yet. Forecasts appear here once employees are added.")
+    else:
+        forecaster = get_forecast()
+        store = st.session_state.employees
+        
+        col1, col2, col3 = st.columns([2, 2, 1])
+        with col1:
+            departments = st.multiselect("Department", catalogs.DEPARTMENTS, placeholder="All Departments")
+        with col2:
+            threshold = st.slider("Flag when compliance miss probability reaches", 10, 100,
+                                  int(forecast.RISK_THRESHOLD * 100), step=5, format="%d%%")
+        with col3:
+            st.write("")
+            if st.button("🔄 Refresh Forecast", use_container_width=True):
+                with get_write_lock():
+                    forecaster.refresh()
+        
+        with get_write_lock():
+            forecasts = forecaster.frame()
+        summaries = {emp_id: store.summary(emp_id) for emp_id in forecasts['id']}
+        forecasts['Name'] = [summaries[emp_id]['name'] for emp_id in forecasts['id']]
+        forecasts['Department'] = [summaries[emp_id]['department'] for emp_id in forecasts['id']]
+        forecasts['Progress'] = [summaries[emp_id]['completion'] for emp_id in forecasts['id']]
+        if departments:
+            forecasts = forecasts[forecasts['Department'].isin(departments)]
+        at_risk = forecast.rank_at_risk(forecasts, threshold / 100)
+        
+        # Forecast stats
+        col1, col2, col3, col4 = st.columns(4)
+        col1.metric("Active Onboardings", len(forecasts))
+        col2.metric("⚠️ At Risk", len(at_risk))
+        col3.metric("📚 Expected Training Misses", f"{forecasts['expected_misses'].sum():.1f}")
+        col4.metric("🐢 Projected Behind Plan", int((forecasts['days_late'] > 0).sum()))
+        st.caption(f"Forecast as of {forecaster.computed_at.strftime('%b %d, %H:%M')} from "
+                   f"{forecaster.history_size()} completed tasks and trainings, including archived onboardings; "
+                   f"changes are reflected as they are made.")
+        
+        st.markdown("---")
+        
+        if at_risk.empty:
+            st.success("✅ No onboardings are at risk.")
+        else:
+            st.markdown("### 🚨 Ranked At-Risk List")
+            table = pd.DataFrame({
+                'ID': at_risk['id'],
+                'Name': at_risk['Name'],
+                'Department': at_risk['Department'],
+                'Progress': at_risk['Progress'],
+                'Miss Probability': at_risk['miss_probability'] * 100,
+                'Overdue': at_risk['overdue'],
+                'Next Training at Risk': at_risk['next_at_risk'],
+                'Due': at_risk['next_at_risk_due'],
+                'Projected Completion': at_risk['projected_completion'],
+                'Days Behind Plan': at_risk['days_late'].clip(lower=0),
+                'Survey Score': at_risk['survey_score'],
+            })
+            st.dataframe(table, use_container_width=True, hide_index=True, column_config={
+                'Progress': st.column_config.ProgressColumn(format="%d%%", min_value=0, max_value=100),
+                'Miss Probability': st.column_config.ProgressColumn(format="%.0f%%", min_value=0, max_value=100),
+                'Due': st.column_config.DateColumn(format="MMM DD"),
+                'Projected Completion': st.column_config.DateColumn(format="MMM DD, YYYY"),
+                'Survey Score': st.column_config.NumberColumn(format="%.1f"),
+            })
+            
+            col1, col2 = st.columns(2)
+            with col1:
+                st.markdown("### 🏢 At Risk by Department")
+                by_department = at_risk['Department'].value_counts()
+                fig = go.Figure(data=[go.Bar(x=by_department.values, y=by_department.index, orientation='h',
+                                             marker_color=catalogs.status_color('Overdue'))])
+                fig.update_layout(
+                    yaxis=dict(autorange='reversed'),
+                    height=max(300, len(by_department) * 32),
+                    margin=dict(l=20, r=20, t=20, b=20),
+                    plot_bgcolor='rgba(0,0,0,0)',
+                    paper_bgcolor='rgba(0,0,0,0)'
+                )
+                st.plotly_chart(fig, use_container_width=True)
+            with col2:
+                st.markdown("### 📅 Days Behind Plan")
+                fig = px.histogram(forecasts, x='days_late', nbins=30,
+                                   labels={'days_late': 'Projected days behind plan (negative = ahead)'})
+                fig.update_layout(
+                    yaxis_title="Employees",
+                    height=300,
+                    margin=dict(l=20, r=20, t=20, b=20),
+                    plot_bgcolor='rgba(0,0,0,0)',
+                    paper_bgcolor='rgba(0,0,0,0)'
+                )
+                st.plotly_chart(fig, use_container_width=True)
+
+elif page == "🔻 Funnel Analysis":
+    st.title("🔻 Onboarding Funnel Analysis")
+    
+    funnel_cube = get_cube()
+    
+    if not st.session_state.employees:
+        st.info("🔻 No employees yet. Funnels appear here once employees are added.")
+    else:
+        breakdowns = {
+            "Item Type": ['kind'],
+            "Category / Priority": ['kind', 'group'],
+            "Department": ['department'],
+            "Cohort": ['cohort'],
+        }
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            departments = st.multiselect("Department", funnel_cube.labels('department'), placeholder="All Departments")
+        with col2:
+            cohorts = st.multiselect("Cohort", funnel_cube.labels('cohort'), placeholder="All Cohorts")
+        with col3:
+            kinds = st.multiselect("Item Type", funnel_cube.labels('kind'), placeholder="All Types")
+        
+        col1, col2 = st.columns(2)
+        with col1:
+            breakdown = st.selectbox("Break down by", list(breakdowns.keys()), index=1)
+        with col2:
+            by_day = st.slider("Done by day", 1, cube.MAX_DAY, 7)
+        
+        filters = {'department': departments or None, 'cohort': cohorts or None, 'kind': kinds or None}
+        by = breakdowns[breakdown]
+        with get_write_lock():
+            funnel = funnel_cube.funnel(by=by, **filters)
+        funnel['label'] = funnel[by].astype(str).agg(' · '.join, axis=1)
+        at_day = funnel[funnel['day'] == by_day]
+        ever = funnel[funnel['day'] == cube.MAX_DAY]
+        
+        # Funnel stats
+        items = int(at_day['items'].sum())
+        col1, col2, col3, col4 = st.columns(4)
+        col1.metric("Items", items)
+        col2.metric("✅ Finished", int(ever['done'].sum()))
+        col3.metric(f"Done by Day {by_day}", int(at_day['done'].sum()))
+        col4.metric(f"Share by Day {by_day}", f"{at_day['done'].sum() / items * 100:.0f}%" if items else "–")
+        
+        st.markdown("---")
+        
+        col1, col2 = st.columns(2)
+        with col1:
+            st.markdown(f"### 📊 Share Done by Day {by_day}")
+            fig = go.Figure(data=[
+                go.Bar(x=at_day['share'] * 100,
+                       y=at_day['label'],
+                       orientation='h',
+                       marker_color='#667eea',
+                       text=[f"{share:.0%}" for share in at_day['share'].fillna(0)],
+                       textposition='outside')
+            ])
+            fig.update_layout(
+                xaxis_title="% of items done",
+                xaxis_range=[0, 110],
+                yaxis=dict(autorange='reversed'),
+                height=max(300, len(at_day) * 28),
+                margin=dict(l=20, r=20, t=20, b=20),
+                plot_bgcolor='rgba(0,0,0,0)',
+                paper_bgcolor='rgba(0,0,0,0)'
+            )
+            st.plotly_chart(fig, use_container_width=True)
+        
+        with col2:
+            st.markdown("### 📈 Completion Funnel by Days Since Start")
+            fig = px.line(funnel, x='day', y=funnel['share'] * 100, color='label',
+                          labels={'day': 'Days since start', 'y': '% of items done', 'label': breakdown})
+            fig.add_vline(x=by_day, line_dash='dash', line_color='#475569')
+            fig.update_layout(
+                height=max(300, len(at_day) * 28),
+                margin=dict(l=20, r=20, t=20, b=20),
+                plot_bgcolor='rgba(0,0,0,0)',
+                paper_bgcolor='rgba(0,0,0,0)'
+            )
+            st.plotly_chart(fig, use_container_width=True)
+        
+        st.markdown("### 📋 Items by Status")
+        st.dataframe(funnel_cube.pivot(by, **filters).reset_index(), use_container_width=True, hide_index=True)
+
+elif page == "⚡ Batch Actions":
+    st.title("⚡ Batch Status Updates")
+    
+    if not st.session_state.employees:
+        st.info("👆 No employees added yet. Add employees in the Employee Management section first.")
+    else:
+        batch_actions = {
+            'Document': ['verify', 'reject'],
+            'Task': ['start', 'complete'],
+            'Equipment': ['assign'],
+            'Compliance': ['start', 'complete']
+        }
+        
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            kind = st.selectbox("Item Type", list(batch_actions.keys()))
+        with col2:
+            action = st.selectbox("Action", batch_actions[kind], format_func=str.capitalize)
+        with col3:
+            departments = sorted(set(s['department'] for s in st.session_state.employees.summaries()))
+            dept_filter = st.multiselect("Department", departments, placeholder="All departments")
+        
+        store = st.session_state.employees
+        candidates = [s['id'] for s in store.summaries()
+                      if not dept_filter or s['department'] in dept_filter]
+        select_all = st.checkbox(f"Select all {len(candidates)} employees", value=False)
+        selected_emps = candidates if select_all else st.multiselect("Employees", candidates, format_func=store.label)
+        
+        # Items offered are the union over the selected employees, in template order
+        item_names = []
+        for emp_id in selected_emps:
+            for item_name in get_item_names(store.peek(emp_id), kind):
+                if item_name not in item_names:
+                    item_names.append(item_name)
+        selected_items = st.multiselect("Items", item_names)
+        
+        # Template order lets a task and its dependents complete in the same batch
+        ops = [make_op(emp_id, kind, item_name, action)
+               for emp_id in selected_emps for item_name in item_names if item_name in selected_items]
+        changes, errors = plan_batch(st.session_state.employees, ops)
+        
+        st.markdown("---")
+        st.markdown("### 🔍 Preview")
+        
+        col1, col2, col3 = st.columns(3)
+        col1.metric("Selected", len(ops))
+        col2.metric("✅ Will Change", len(changes))
+        col3.metric("⚠️ Skipped", len(errors), delta_color="inverse")
+        
+        if changes:
+            st.dataframe(pd.DataFrame([
+                {'Employee': store.label(op['employee']), 'Item': op['item'], 'From': from_status, 'To': to_status}
+                for op, from_status, to_status in changes
+            ]), use_container_width=True, hide_index=True)
+        
+        if errors:
+            with st.expander(f"⚠️ {len(errors)} item(s) cannot be changed"):
+                st.dataframe(pd.DataFrame([
+                    {'Employee': store.label(op['employee']) if op['employee'] in store else op['employee'],
+                     'Item': op['item'], 'Reason': reason}
+                    for op, reason in errors
+                ]), use_container_width=True, hide_index=True)
+        
+        all_or_nothing = st.checkbox("All or nothing", value=False,
+                                     help="Refuse the whole batch if any item cannot be changed")
+        
+        if st.button(f"⚡ Apply {len(changes)} Change(s)", type="primary", use_container_width=True,
+                     disabled=not changes or (all_or_nothing and bool(errors))):
+            # Planned again and applied under the store's lock, against the records as they are now
+            try:
+                events, _ = run_batch(store, ops, strict=all_or_nothing)
+            except BatchError as e:
+                st.error(f"❌ Nothing was applied: {len(e.errors)} item(s) can no longer be changed.")
+            else:
+                publish_events(events)
+                st.rerun()
+
+elif page == "📑 Reports":
+    st.title("📑 Org-wide Reports")
+    
+    if not st.session_state.employees:
+        st.info("👆 No employees added yet. Add employees to run org-wide reports.")
+    else:
+        manager = get_job_manager()
+        
+        col1, col2, col3 = st.columns([2, 2, 1])
+        with col1:
+            owner = current_user()
+            st.text_input("Requested by", value=owner, disabled=True,
+                          help="Reports are limited per sign-in, or per session if you aren't signed in")
+        with col2:
+            report_name = st.selectbox("Report", list(reports.MAP_REDUCE_REPORTS) +
+                                       ["Full Item Export", "Archived Item Export"])
+        with col3:
+            st.write("")
+            run_clicked = st.button("▶️ Run Report", type="primary", use_container_width=True)
+        
+        if run_clicked:
+            try:
+                submit_report(owner, report_name)
+            except jobs.JobLimitExceeded as e:
+                st.error(f"❌ {e}")
+        
+        st.caption(f"Reports run in background workers; up to {manager.per_owner_limit} at a time per person. "
+                   f"{sum(1 for job in manager.jobs() if job.active)} running org-wide.")
+        
+        st.markdown("### ⏳ Running")
+        active_reports(owner, [job for job in manager.jobs(owner) if job.active])
+        
+        st.markdown("### 📋 Results")
+        finished = [job for job in manager.jobs(owner) if not job.active]
+        if not finished:
+            st.info("No finished reports yet.")
+        for idx, job in enumerate(finished):
+            cached = " · cached" if job.cached else ""
+            with st.expander(f"{job.name} · {job.status}{cached} · {job.finished_at.strftime('%H:%M:%S')}",
+                             expanded=idx == 0):
+                if job.status == 'Failed':
+                    st.error(job.error)
+                elif job.status == 'Cancelled':
+                    st.caption("Cancelled before it finished.")
+                elif job.name == 'Cohort Rollup':
+                    df = pd.DataFrame(job.result)
+                    if df.empty:
+                        st.caption("Nothing to report.")
+                    else:
+                        fig = px.bar(df, x='Cohort', y='Completion %', color='Area', barmode='group',
+                                     facet_col='Department', facet_col_wrap=3, height=400)
+                        st.plotly_chart(fig, use_container_width=True, key=f"report_chart_{job.id}")
+                        st.dataframe(df, use_container_width=True, hide_index=True)
+                elif job.name == 'Survey Themes':
+                    st.metric("Survey Responses", job.result['responses'])
+                    if job.result['terms']:
+                        st.dataframe(pd.DataFrame(job.result['terms']), use_container_width=True, hide_index=True)
+                    else:
+                        st.caption("No free-text answers yet.")
+                else:
+                    st.write(f"**{job.result['rows']}** items exported to `{job.result['path']}`")
+                    if os.path.exists(job.result['path']):
+                        with open(job.result['path'], 'rb') as f:
+                            st.download_button("⬇️ Download CSV", f.read(), file_name=os.path.basename(job.result['path']),
+                                               mime='text/csv', key=f"download_{job.id}")
+
+elif page == "📬 Notifications":
+    st.title("📬 Outbound Notifications")
+    
+    service = get_notification_service()
+    counts = service.outbox.counts()
+    
+    col1, col2, col3, col4, col5, col6 = st.columns(6)
+    col1.metric("Queue Depth", counts.get('Pending', 0))
+    col2.metric("Sent", counts.get('Sent', 0))
+    col3.metric("Digests / min", f"{service.throughput():.1f}")
+    col4.metric("Duplicates Suppressed", service.stats['suppressed'])
+    col5.metric("Rate Limited", service.stats['rate_limited'])
+    col6.metric("Failed", counts.get('Failed', 0))
+    
+    if service.stats['last_error']:
+        st.warning(f"⚠️ Last delivery error: {service.stats['last_error']}")
+    scanner = get_reminder_scanner()
+    last_scan = scanner.last_scan.strftime('%H:%M') if scanner.last_scan else "not yet"
+    st.caption(f"Transport: {type(service.transport).__name__} · digests after {service.coalesce_seconds}s · "
+               f"duplicates suppressed for {int(notifications.DEDUPE_WINDOW.total_seconds() // 3600)}h · "
+               f"org-wide reminder scan every {int(scanner.interval // 60)} min, last {last_scan} "
+               f"({scanner.last_queued} new)")
+    if scanner.last_error:
+        st.warning(f"⚠️ Last reminder scan failed: {scanner.last_error}")
+    
+    col1, col2 = st.columns(2)
+    with col1:
+        if st.button("📨 Queue Due Reminders for Everyone", use_container_width=True, type="primary",
+                     disabled=not st.session_state.employees):
+            # Scan now rather than waiting for the background scan, with this session's changes saved first
+            get_snapshot_writer().flush()
+            queued = get_reminder_scanner().scan()
+            st.success(f"✅ {queued} new reminder(s) queued")
+    with col2:
+        if st.button("🔄 Refresh", use_container_width=True):
+            st.rerun()
+    
+    st.markdown("### 📋 Recent Messages")
+    recent = service.outbox.recent()
+    if recent:
+        st.dataframe(pd.DataFrame(recent), use_container_width=True, hide_index=True)
+    else:
+        st.info("📭 Nothing queued yet. Reminders are queued by the background scan, the Compliance Training page or the button above.")
+
 # Footer
 st.markdown("---")
 col1, col2, col3 = st.columns(3)
@@ -0,0 +1,349 @@
+"""Cold archive for finished onboardings
+
+Employees whose onboarding is complete, or who started more than
+ARCHIVE_AFTER_DAYS ago, are moved out of the live store into a SQLite
+archive, so the Dashboard, employee lists, reminder scans and snapshots
+only cover active hires. Each archived record is kept whole as compressed
+JSON (the snapshot detail encoding) next to a few indexed columns for
+audit searches, and can be restored under its original id on demand.
+The archive also keeps per-item histograms of the days since start at which
+archived employees finished their tasks and trainings, or had left them
+open, so at-risk forecasts keep learning from finished onboardings.
+A restored employee is held back from the automatic sweep for
+RESTORE_HOLD_DAYS so the next sweep doesn't archive them again.
+
+Archiving and restoring run against the process-wide store. Records move
+in transactions that are also serialized with other archive calls, and an
+id is only ever archived once. An id that is already archived is settled
+on its own rather than failing the rest: if the archive holds the same
+employee, e.g. archived by another process sharing the snapshots, the
+leftover live copy is dropped; if it holds someone else, the live employee
+is skipped and listed in `clashes`.
+"""
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+import snapshot
+from analytics import get_cohort
+from forecast import item_observations
+from employee_store import DuplicateEmployeeError
+
+ARCHIVE_PATH = os.environ.get(
+    'ONBOARDING_ARCHIVE',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'archive.sqlite3')
+)
+# Employees who started longer ago than this are archived even if unfinished; 0 disables
+ARCHIVE_AFTER_DAYS = int(os.environ.get('ONBOARDING_ARCHIVE_AFTER_DAYS', '180'))
+RESTORE_HOLD_DAYS = 30
+# Seconds between automatic sweeps
+SWEEP_INTERVAL = float(os.environ.get('ONBOARDING_ARCHIVE_SWEEP_INTERVAL', 3600))
+SCAN_BATCH = 500
+
+REASON_COMPLETED = 'Completed'
+REASON_AGED = 'Aged out'
+REASON_MANUAL = 'Manual'
+
+
+def archive_reason(summary, now=None, max_age_days=ARCHIVE_AFTER_DAYS):
+    """Why the sweep would archive an employee's summary row, or None to keep them live"""
+    if summary['completion'] >= 100:
+        return REASON_COMPLETED
+    if max_age_days and ((now or datetime.now()) - summary['start_date']).days > max_age_days:
+        return REASON_AGED
+    return None
+
+
+class EmployeeArchive:
+    """Compressed archived employee records, searchable by name, email, department and cohort"""
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS archived (
+            id INTEGER PRIMARY KEY,
+            external_id TEXT,
+            name TEXT NOT NULL,
+            email TEXT NOT NULL,
+            department TEXT NOT NULL,
+            role TEXT NOT NULL,
+            start_date TEXT NOT NULL,
+            cohort TEXT NOT NULL,
+            completion INTEGER NOT NULL,
+            reason TEXT NOT NULL,
+            archived_at REAL NOT NULL,
+            record BLOB NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS archived_external_id ON archived (external_id);
+        CREATE INDEX IF NOT EXISTS archived_department ON archived (department, cohort);
+        CREATE TABLE IF NOT EXISTS holds (
+            id INTEGER PRIMARY KEY,
+            until REAL NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS item_history (
+            item TEXT NOT NULL,
+            day INTEGER NOT NULL,
+            finished INTEGER NOT NULL DEFAULT 0,
+            censored INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (item, day)
+        );
+    """
+
+    def __init__(self, path=ARCHIVE_PATH):
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.executescript(self.SCHEMA)
+        self._lock = threading.Lock()
+        self.clashes = {}     # live employee id -> why it couldn't be archived under that id
+        if len(self) and not self._conn.execute("SELECT 1 FROM item_history LIMIT 1").fetchone():
+            self._backfill_history()
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM archived").fetchone()[0]
+
+    # Moving employees in and out
+    def archive(self, employees, reasons, now=None):
+        """Move employees from an EmployeeStore into the archive; `reasons` maps id
+        to reason. Returns the ids moved out of the store.
+
+        Ids the archive already holds for the same employee are only dropped
+        from the store; ids it holds for someone else are left live and
+        recorded in `clashes`.
+        """
+        now = now or time.time()
+        ids = [emp_id for emp_id in reasons if emp_id in employees]
+        moved = []
+        with self._lock:
+            for start in range(0, len(ids), SCAN_BATCH):
+                batch = ids[start:start + SCAN_BATCH]
+                # Nobody can change or evict these records until they are deleted below
+                with employees.pinned(*batch):
+                    moved += self._archive_batch(employees, batch, reasons, now)
+        return moved
+
+    def _archive_batch(self, employees, ids, reasons, now):
+        rows = {}
+        for emp_id in ids:
+            if emp_id not in employees:
+                continue
+            emp = employees.peek(emp_id)
+            rows[emp_id] = (emp, (emp_id, emp.get('external_id'), emp['name'], emp['email'], emp['department'],
+                                  emp['role'], emp['start_date'].isoformat(), get_cohort(emp['start_date']),
+                                  employees.summary(emp_id)['completion'], reasons[emp_id], now, snapshot.pack(emp)))
+        if not rows:
+            return []
+        self._conn.execute('BEGIN IMMEDIATE')
+        try:
+            taken = dict(self._conn.execute(
+                f"SELECT id, email FROM archived WHERE id IN ({', '.join('?' * len(rows))})", list(rows)).fetchall())
+            leftover = []
+            for emp_id, email in taken.items():
+                emp = rows.pop(emp_id)[0]
+                if email == emp['email']:
+                    leftover.append(emp_id)
+                else:
+                    self.clashes[emp_id] = f"Employee #{emp_id} ({emp['email']}) has the id of archived employee {email}"
+            self._conn.executemany(
+                """INSERT INTO archived (id, external_id, name, email, department, role, start_date,
+                                         cohort, completion, reason, archived_at, record)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""", [row for _, row in rows.values()])
+            self._conn.executemany("DELETE FROM holds WHERE id = ?", [(emp_id,) for emp_id in rows])
+            self._add_history([(emp, now) for emp, _ in rows.values()], 1)
+            self._conn.execute('COMMIT')
+        except BaseException:
+            self._conn.execute('ROLLBACK')
+            raise
+        # Only drop them from the store once the archive has them
+        moved = list(rows) + leftover
+        for emp_id in moved:
+            del employees[emp_id]
+            self.clashes.pop(emp_id, None)
+        return moved
+
+    def sweep(self, employees, now=None, max_age_days=ARCHIVE_AFTER_DAYS):
+        """Archive every completed or aged-out employee not held after a restore; returns the ids moved"""
+        now = now or datetime.now()
+        with self._lock:
+            held = {row[0] for row in self._conn.execute("SELECT id FROM holds WHERE until > ?", (now.timestamp(),))}
+        reasons = {}
+        for summary in employees.summaries():
+            reason = archive_reason(summary, now, max_age_days)
+            if reason is not None and summary['id'] not in held:
+                reasons[summary['id']] = reason
+        return self.archive(employees, reasons, now.timestamp()) if reasons else []
+
+    def restore(self, employees, emp_id, hold_days=RESTORE_HOLD_DAYS):
+        """Put an archived employee back into the store under their original id
+
+        Raises KeyError if they aren't archived and DuplicateEmployeeError if
+        their email or HR id has since been given to a live employee.
+        """
+        with self._lock:
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                row = self._conn.execute("SELECT record, archived_at FROM archived WHERE id = ?", (emp_id,)).fetchone()
+                if row is None:
+                    raise KeyError(emp_id)
+                emp = snapshot.unpack(row[0])
+                if emp_id in employees:
+                    raise DuplicateEmployeeError(f"Employee #{emp_id} is already live")
+                employees.check_unique(emp, emp_id)
+                self._conn.execute("DELETE FROM archived WHERE id = ?", (emp_id,))
+                self._add_history([(emp, row[1])], -1)
+                self._conn.execute("INSERT OR REPLACE INTO holds (id, until) VALUES (?, ?)",
+                                   (emp_id, time.time() + hold_days * 86400))
+                employees[emp_id] = emp
+                self._conn.execute('COMMIT')
+            except BaseException:
+                self._conn.execute('ROLLBACK')
+                raise
+        return emp
+
+    # Completion history
+    def _add_history(self, records, sign):
+        """Add (or with sign -1, take back) the forecast observations of (record, archived_at) pairs"""
+        counts = {}
+        for emp, archived_at in records:
+            for key, day, finished in item_observations(emp, datetime.fromtimestamp(archived_at)):
+                count = counts.setdefault((key, day), [0, 0])
+                count[0 if finished else 1] += sign
+        self._conn.executemany(
+            """INSERT INTO item_history (item, day, finished, censored) VALUES (?, ?, ?, ?)
+               ON CONFLICT (item, day) DO UPDATE SET finished = finished + excluded.finished,
+                                                     censored = censored + excluded.censored""",
+            [(key, day, finished, censored) for (key, day), (finished, censored) in counts.items()])
+
+    def _backfill_history(self):
+        """Histograms for records archived before the archive kept them"""
+        with self._lock:
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                last = -1
+                while True:
+                    rows = self._conn.execute(
+                        "SELECT id, record, archived_at FROM archived WHERE id > ? ORDER BY id LIMIT ?",
+                        (last, SCAN_BATCH)).fetchall()
+                    if not rows:
+                        break
+                    self._add_history([(snapshot.unpack(blob), archived_at) for _, blob, archived_at in rows], 1)
+                    last = rows[-1][0]
+                self._conn.execute('COMMIT')
+            except BaseException:
+                self._conn.execute('ROLLBACK')
+                raise
+
+    def item_history(self):
+        """Completion-day histograms of every archived employee, for forecast.RiskForecaster:
+        {item key: (days, finished counts, censored counts)}, where censored counts items
+        still open on that day when the employee was archived"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT item, day, finished, censored FROM item_history WHERE finished OR censored ORDER BY item, day"
+            ).fetchall()
+        history = {}
+        for item, day, finished, censored in rows:
+            days, finished_counts, censored_counts = history.setdefault(item, ([], [], []))
+            days.append(day)
+            finished_counts.append(finished)
+            censored_counts.append(censored)
+        return history
+
+    # Queries
+    def get(self, emp_id):
+        """The full archived record, or None"""
+        with self._lock:
+            row = self._conn.execute("SELECT record FROM archived WHERE id = ?", (emp_id,)).fetchone()
+        return snapshot.unpack(row[0]) if row else None
+
+    def by_external_id(self, external_id):
+        """Id of the archived employee linked to this HR system id, or None"""
+        with self._lock:
+            row = self._conn.execute("SELECT id FROM archived WHERE external_id = ?", (external_id,)).fetchone()
+        return row[0] if row else None
+
+    def search(self, text=None, department=None, cohort=None, reason=None, limit=200):
+        """Archived employees matching every given filter, most recently archived first;
+        `text` matches a substring of the name or email"""
+        clauses, params = [], []
+        if text:
+            clauses.append("(name LIKE ? OR email LIKE ?)")
+            params += [f"%{text}%", f"%{text}%"]
+        for column, value in (('department', department), ('cohort', cohort), ('reason', reason)):
+            if value:
+                clauses.append(f"{column} = ?")
+                params.append(value)
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, name, email, department, role, start_date, completion, reason, archived_at, "
+                f"length(record) FROM archived{where} ORDER BY archived_at DESC, id LIMIT ?",
+                (*params, limit)).fetchall()
+        return [{'ID': r[0], 'Name': r[1], 'Email': r[2], 'Department': r[3], 'Role': r[4],
+                 'Start Date': datetime.fromisoformat(r[5]), 'Progress': r[6], 'Reason': r[7],
+                 'Archived': datetime.fromtimestamp(r[8]), 'Stored Bytes': r[9]} for r in rows]
+
+    def options(self, column):
+        """Distinct values of department, cohort or reason, for search filters"""
+        if column not in ('department', 'cohort', 'reason'):
+            raise ValueError(f"Cannot list {column}")
+        with self._lock:
+            return [r[0] for r in self._conn.execute(f"SELECT DISTINCT {column} FROM archived ORDER BY 1")]
+
+    def stats(self):
+        with self._lock:
+            count, stored = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(length(record)), 0) FROM archived").fetchone()
+            reasons = dict(self._conn.execute("SELECT reason, COUNT(*) FROM archived GROUP BY reason").fetchall())
+        return {'employees': count, 'stored_bytes': stored, 'reasons': reasons}
+
+    def scan(self):
+        """(id, record) pairs for every archived employee, read in batches; for exports"""
+        last = -1
+        while True:
+            with self._lock:
+                rows = self._conn.execute("SELECT id, record FROM archived WHERE id > ? ORDER BY id LIMIT ?",
+                                          (last, SCAN_BATCH)).fetchall()
+            if not rows:
+                return
+            for emp_id, blob in rows:
+                yield emp_id, snapshot.unpack(blob)
+            last = rows[-1][0]
+
+
+class ArchiveSweeper:
+    """Background thread running the archive sweep over a store once it is open,
+    then every `interval` seconds so employees who finish or age out later move too
+
+    `on_archive(ids)` is called from the thread with the ids each sweep moved.
+    """
+
+    def __init__(self, archive, employees, on_archive=None, interval=SWEEP_INTERVAL, start=True):
+        self.archive = archive
+        self.employees = employees
+        self.on_archive = on_archive
+        self.interval = interval
+        self.last_sweep = None
+        self.last_moved = 0
+        self.last_error = None
+        if start:
+            threading.Thread(target=self._run, name='archive-sweeper', daemon=True).start()
+
+    def sweep(self, now=None):
+        """Archive everyone the lifecycle policy selects; returns the ids moved"""
+        now = now or datetime.now()
+        moved = self.archive.sweep(self.employees, now)
+        if moved and self.on_archive is not None:
+            self.on_archive(moved)
+        self.last_sweep = now
+        self.last_moved = len(moved)
+        return moved
+
+    def _run(self):
+        while True:
+            try:
+                self.sweep()
+                self.last_error = None
+            except Exception as e:
+                self.last_error = e
+            time.sleep(self.interval)
@@ -0,0 +1,141 @@
+"""Load test for the JSON API
+
+Starts `python -m api --no-persist` on a free port, seeds it through the
+bulk endpoint, then runs concurrent clients on keep-alive connections
+issuing a mix of paginated lists, conditional detail reads and transition
+batches. Reports requests per second and p50/p99 latency per request type.
+
+    python -m benchmarks.api_load --employees 2000 --clients 16 --seconds 20
+"""
+import argparse
+import http.client
+import json
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+
+import numpy as np
+
+ROLES = ['Software Engineer', 'Product Manager', 'Designer', 'Data Analyst']
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+class Client:
+    def __init__(self, port):
+        self.conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+
+    def request(self, method, path, body=None, headers=None):
+        headers = dict(headers or {})
+        if body is not None:
+            body = json.dumps(body)
+            headers['Content-Type'] = 'application/json'
+        self.conn.request(method, path, body=body, headers=headers)
+        response = self.conn.getresponse()
+        data = response.read()
+        return response.status, response.getheader('ETag'), data
+
+
+def wait_until_ready(port, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            Client(port).request('GET', '/api/employees?limit=1')
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError("API server did not start")
+
+
+def seed(port, employees):
+    client = Client(port)
+    ids = []
+    for start in range(0, employees, 500):
+        batch = [{'name': f"Load Test {start + i:05d}", 'email': f"loadtest{start + i}@example.com",
+                  'department': 'Engineering', 'role': ROLES[(start + i) % len(ROLES)],
+                  'start_date': date.today().isoformat()}
+                 for i in range(min(500, employees - start))]
+        _, _, data = client.request('POST', '/api/employees/bulk', {'employees': batch})
+        ids.extend(json.loads(data)['created'])
+    status, _, data = client.request('GET', f"/api/employees/{ids[0]}/items?kind=Task")
+    tasks = [item['item'] for item in json.loads(data)['items']]
+    return ids, tasks
+
+
+def worker(port, ids, tasks, stop, latencies, statuses):
+    client = Client(port)
+    rng = random.Random()
+    etags = {}
+    while not stop.is_set():
+        roll = rng.random()
+        if roll < 0.4:
+            kind = 'list'
+            started = time.perf_counter()
+            status, _, data = client.request('GET', '/api/employees?limit=100&fields=name,completion')
+            cursor = json.loads(data)['next_cursor']
+            if cursor and rng.random() < 0.5:
+                status, _, _ = client.request('GET', f"/api/employees?limit=100&cursor={cursor}")
+        elif roll < 0.85:
+            kind = 'detail'
+            emp_id = rng.choice(ids[:200])
+            headers = {'If-None-Match': etags[emp_id]} if emp_id in etags else None
+            started = time.perf_counter()
+            status, etag, _ = client.request('GET', f"/api/employees/{emp_id}", headers=headers)
+            etags[emp_id] = etag
+        else:
+            kind = 'transition'
+            ops = [{'employee': rng.choice(ids), 'kind': 'Task', 'item': rng.choice(tasks),
+                    'action': rng.choice(['start', 'complete'])} for _ in range(5)]
+            started = time.perf_counter()
+            status, _, _ = client.request('POST', '/api/transitions', {'ops': ops})
+        latencies[kind].append(time.perf_counter() - started)
+        statuses[status] += 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--employees', type=int, default=2000)
+    parser.add_argument('--clients', type=int, default=16)
+    parser.add_argument('--seconds', type=float, default=20)
+    args = parser.parse_args()
+
+    port = free_port()
+    server = subprocess.Popen([sys.executable, '-m', 'api', '--port', str(port), '--no-persist'])
+    try:
+        wait_until_ready(port)
+        started = time.perf_counter()
+        ids, tasks = seed(port, args.employees)
+        print(f"Seeded {len(ids)} employees in {time.perf_counter() - started:.2f}s")
+
+        stop = threading.Event()
+        latencies = defaultdict(list)
+        statuses = defaultdict(int)
+        with ThreadPoolExecutor(args.clients) as pool:
+            for _ in range(args.clients):
+                pool.submit(worker, port, ids, tasks, stop, latencies, statuses)
+            time.sleep(args.seconds)
+            stop.set()
+
+        total = sum(len(v) for v in latencies.values())
+        print(f"{total} requests from {args.clients} clients in {args.seconds:.0f}s: {total / args.seconds:.0f} req/s")
+        for kind, values in sorted(latencies.items()):
+            ms = np.array(values) * 1000
+            print(f"  {kind:<10} {len(values):7d}  p50 {np.percentile(ms, 50):7.1f} ms  p99 {np.percentile(ms, 99):7.1f} ms")
+        print("  status codes: " + ", ".join(f"{code}={count}" for code, count in sorted(statuses.items())))
+    finally:
+        server.terminate()
+        server.wait()
+
+
+if __name__ == '__main__':
+    main()
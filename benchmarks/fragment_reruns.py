@@ -0,0 +1,160 @@
+"""Per-click latency and bytes sent: full-script reruns vs fragment reruns
+
+Starts `streamlit run app.py` headless (or uses --url), seeds employees
+through the Add Employee form, then walks two employees through the same
+Tasks, Equipment and Compliance actions: one with every click forced to a
+full-script rerun (the behaviour before row fragments) and one with clicks
+scoped to the row fragment.
+
+    python -m benchmarks.fragment_reruns --employees 200
+"""
+import argparse
+import asyncio
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+from contextlib import contextmanager
+
+from benchmarks.streamlit_client import AppSession
+
+APP_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'app.py')
+
+
+@contextmanager
+def streamlit_server(app_path=APP_PATH, port=None, env=None):
+    """Run the app in a headless Streamlit server for the duration of the block
+
+    `env` adds environment variables for the server, e.g. ONBOARDING_SNAPSHOT_DIR.
+    """
+    if port is None:
+        with socket.socket() as sock:
+            sock.bind(('127.0.0.1', 0))
+            port = sock.getsockname()[1]
+    proc = subprocess.Popen(
+        [sys.executable, '-m', 'streamlit', 'run', app_path,
+         '--server.headless=true', f'--server.port={port}', '--server.address=127.0.0.1',
+         '--browser.gatherUsageStats=false', '--server.fileWatcherType=none'],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, env={**os.environ, **(env or {})},
+    )
+    try:
+        deadline = time.time() + 60
+        while True:
+            try:
+                urllib.request.urlopen(f'http://127.0.0.1:{port}/_stcore/health', timeout=1)
+                break
+            except OSError:
+                if time.time() > deadline or proc.poll() is not None:
+                    raise RuntimeError("Streamlit server did not start")
+                time.sleep(0.25)
+        yield f'ws://127.0.0.1:{port}/_stcore/stream', proc
+    finally:
+        proc.terminate()
+        try:
+            proc.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+            proc.wait()
+
+
+async def open_page(session, page):
+    return await session.set(session.find(label='Navigation', kind='radio'), page)
+
+
+async def seed_employees(session, count, prefix='Employee'):
+    """Create employees through the Add New Hire form"""
+    await open_page(session, "👥 Employee Management")
+    names = []
+    for i in range(count):
+        name = f"{prefix} {i:05d}"
+        await session.set(session.find(label='Full Name *'), name, rerun=False)
+        await session.set(session.find(label='Email Address *'), f"e{i}@company.com", rerun=False)
+        await session.set(session.find(label='Job Title *'), 'Engineer', rerun=False)
+        result = await session.click(session.find(label='🚀 Create Onboarding Plan'))
+        if result.errors:
+            raise RuntimeError(result.errors[0])
+        names.append(name)
+    return names
+
+
+async def select_employee(session, name):
+    selector = next(w for w in session.find_all(kind='selectbox') if not w.label)
+    await session.set(selector, name)
+
+
+async def walk_employee(session, emp_name, fragment):
+    """Run every row action for one employee, returning per-click results"""
+    results = []
+
+    async def click(key):
+        result = await session.click(session.find(key=key), fragment=fragment)
+        if result.errors:
+            raise RuntimeError(result.errors[0])
+        results.append(result)
+
+    await select_employee(session, emp_name)
+
+    await open_page(session, "✅ Tasks & Workflow")
+    task_keys = [key for key in (w.id.rsplit('-', 1)[-1] for w in session.find_all(kind='button'))
+                 if key.startswith('task_')]
+    for key in task_keys:
+        await click(key)  # Start
+        await click(key)  # Complete
+
+    await open_page(session, "💻 Equipment")
+    for widget in [w for w in session.find_all(kind='button') if w.label == '✓ Assign']:
+        await click(widget.id.rsplit('-', 1)[-1])
+
+    await open_page(session, "📚 Compliance Training")
+    for widget in [w for w in session.find_all(kind='button') if w.label == '▶️ Start']:
+        key = widget.id.rsplit('-', 1)[-1]
+        await click(key)
+        await click(key.replace('start_', 'comp_', 1))
+
+    return results
+
+
+def summarize(label, results):
+    latencies = sorted(r.seconds * 1000 for r in results)
+    sizes = [r.bytes_received for r in results]
+    p95 = latencies[int(len(latencies) * 0.95) - 1] if len(latencies) >= 20 else latencies[-1]
+    print(f"{label:<22} clicks={len(results):<4} "
+          f"p50={statistics.median(latencies):7.1f} ms  p95={p95:7.1f} ms  "
+          f"bytes/click={statistics.mean(sizes):9.0f}  msgs/click={statistics.mean(r.messages for r in results):6.1f}")
+
+
+async def run_benchmark(url, employees):
+    session = AppSession(url)
+    await session.connect()
+    try:
+        started = time.perf_counter()
+        names = await seed_employees(session, employees)
+        print(f"Seeded {len(names)} employees in {time.perf_counter() - started:.1f}s")
+
+        full = await walk_employee(session, names[0], fragment=False)
+        scoped = await walk_employee(session, names[1], fragment=True)
+    finally:
+        await session.close()
+
+    summarize("full-script reruns", full)
+    summarize("fragment reruns", scoped)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--employees', type=int, default=200, help="employees to seed before measuring")
+    parser.add_argument('--url', help="websocket URL of an already running app")
+    args = parser.parse_args()
+
+    if args.url:
+        asyncio.run(run_benchmark(args.url, args.employees))
+    else:
+        with streamlit_server() as (url, _):
+            asyncio.run(run_benchmark(url, args.employees))
+
+
+if __name__ == '__main__':
+    main()
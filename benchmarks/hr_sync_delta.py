@@ -0,0 +1,118 @@
+"""Cost of incremental HR syncs: full exports and a changes endpoint
+
+Writes a full export of `--records` employees and syncs it into an empty
+store, then drops a second export with `--changes` edits, hires and
+terminations and syncs again, and finally replays it. Then serves a further
+set of changes from a local mock endpoint and pages through it. The second sync
+and the endpoint sync should take time proportional to the changes.
+
+    python -m benchmarks.hr_sync_delta --records 100000 --changes 300
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+import threading
+import urllib.parse
+from datetime import date, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from employee_store import EmployeeStore
+from hr_sync import SyncConnector, SyncState
+
+DEPARTMENTS = ['Engineering', 'Product', 'Design', 'Sales', 'Marketing', 'HR', 'Finance']
+
+
+def make_record(i, role='Software Engineer'):
+    return {'external_id': f"HR{i:07d}", 'name': f"Employee {i:07d}", 'email': f"employee{i}@example.com",
+            'department': DEPARTMENTS[i % len(DEPARTMENTS)], 'role': role,
+            'start_date': (date(2026, 1, 5) + timedelta(days=i % 300)).isoformat()}
+
+
+def write_export(path, records):
+    with open(path, 'w') as f:
+        for record in records:
+            f.write(json.dumps(record) + '\n')
+
+
+def mutate(records, changes, rng):
+    """Edit, hire and terminate roughly `changes` employees; returns the changed records"""
+    changed = []
+    for i in rng.sample(range(len(records)), changes // 2):
+        records[i] = dict(records[i], role='Senior Software Engineer')
+        changed.append(records[i])
+    next_id = max(int(r['external_id'][2:]) for r in records) + 1
+    for i in range(next_id, next_id + changes // 4):
+        records.append(make_record(i))
+        changed.append(records[-1])
+    for i in rng.sample(range(len(records) - changes // 4), changes // 4):
+        changed.append({'external_id': records[i]['external_id'], 'status': 'terminated'})
+        records[i] = None
+    return [r for r in records if r is not None], changed
+
+
+def serve_changes(changes):
+    """Mock HR endpoint paging `changes` by offset cursor"""
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            query = urllib.parse.parse_qs(urllib.parse.urlparse(self.path).query)
+            start = int(query.get('since', ['0'])[0])
+            limit = int(query.get('limit', ['500'])[0])
+            page = changes[start:start + limit]
+            body = json.dumps({'changes': page, 'next_cursor': str(start + len(page)),
+                               'has_more': start + len(page) < len(changes)}).encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def describe(label, report):
+    print(f"{label:<28} {report.seconds:7.2f}s  created {len(report.created):6d}  updated {len(report.updated):5d}  "
+          f"removed {len(report.removed):5d}  unchanged {report.unchanged:6d}  conflicts {len(report.conflicts)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--records', type=int, default=100000)
+    parser.add_argument('--changes', type=int, default=300)
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    workdir = tempfile.mkdtemp()
+    drop_dir = os.path.join(workdir, 'drops')
+    os.makedirs(drop_dir)
+    store = EmployeeStore(cache_size=256)
+    connector = SyncConnector(store, SyncState(os.path.join(workdir, 'state.sqlite3')))
+
+    records = [make_record(i) for i in range(args.records)]
+    write_export(os.path.join(drop_dir, 'export-0001.jsonl'), records)
+    describe("Initial full export", connector.sync_directory(drop_dir))
+
+    records, changed = mutate(records, args.changes, rng)
+    path = os.path.join(drop_dir, 'export-0002.jsonl')
+    write_export(path, records)
+    describe(f"Export with {len(changed)} changes", connector.sync_directory(drop_dir))
+    describe("Replay of the same export", connector.sync_file(path))
+
+    _, changed = mutate(records, args.changes, rng)
+    server = serve_changes(changed)
+    endpoint = SyncConnector(store, SyncState(os.path.join(workdir, 'state.sqlite3')), feed='hr-api')
+    url = f"http://127.0.0.1:{server.server_address[1]}/changes"
+    describe(f"Endpoint, {len(changed)} changes", endpoint.sync_endpoint(url))
+    describe("Endpoint, nothing new", endpoint.sync_endpoint(url))
+    server.shutdown()
+    print(f"Store: {len(store)} employees, {store.cache_info()['resident']} records resident")
+
+
+if __name__ == '__main__':
+    main()
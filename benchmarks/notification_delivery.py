@@ -0,0 +1,107 @@
+"""Notification delivery against a local SMTP stand-in
+
+Starts a minimal asyncio SMTP server on localhost that accepts and counts
+messages, queues reminders for many recipients (with duplicates) into a
+throwaway outbox, and runs the delivery worker over SMTP until the queue
+drains or the rate limits hold the rest back. Reports queue depth over
+time, digests delivered per second and how many reminders were coalesced
+or suppressed.
+
+    python -m benchmarks.notification_delivery --recipients 500 --per-recipient 4
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+from notifications import NotificationService, Outbox, SMTPTransport
+
+
+class SMTPStandIn:
+    """Just enough SMTP to accept messages from smtplib"""
+
+    def __init__(self):
+        self.messages = []
+
+    async def handle(self, reader, writer):
+        writer.write(b"220 localhost stand-in\r\n")
+        await writer.drain()
+        while line := await reader.readline():
+            command = line.decode(errors='replace').strip().upper()
+            if command.startswith(('EHLO', 'HELO')):
+                writer.write(b"250 localhost\r\n")
+            elif command == 'DATA':
+                writer.write(b"354 End data with <CR><LF>.<CR><LF>\r\n")
+                await writer.drain()
+                data = await reader.readuntil(b"\r\n.\r\n")
+                self.messages.append(data)
+                writer.write(b"250 OK\r\n")
+            elif command == 'QUIT':
+                writer.write(b"221 Bye\r\n")
+                await writer.drain()
+                break
+            else:
+                writer.write(b"250 OK\r\n")
+            await writer.drain()
+        writer.close()
+
+    async def start(self):
+        server = await asyncio.start_server(self.handle, '127.0.0.1', 0)
+        return server, server.sockets[0].getsockname()[1]
+
+
+async def run_benchmark(recipients, per_recipient, duplicates, global_rate, timeout):
+    smtp = SMTPStandIn()
+    server, port = await smtp.start()
+    outbox_path = os.path.join(tempfile.mkdtemp(), 'outbox.sqlite3')
+    service = NotificationService(
+        Outbox(outbox_path), SMTPTransport('127.0.0.1', port),
+        global_rate=(global_rate, global_rate), coalesce_seconds=0, poll_seconds=0.05,
+    )
+
+    started = time.perf_counter()
+    for r in range(recipients):
+        for i in range(per_recipient):
+            for _ in range(1 + duplicates):
+                service.notify(f"person{r}@example.com", f"Training {i} due soon", "Please complete it.",
+                               dedupe_key=f"training:{r}:{i}")
+    enqueue_seconds = time.perf_counter() - started
+    print(f"Queued {service.stats['enqueued']} reminders in {enqueue_seconds:.2f}s "
+          f"({service.stats['suppressed']} duplicates suppressed)")
+
+    semaphore = asyncio.Semaphore(8)
+    started = time.perf_counter()
+    next_report = 0
+    while time.perf_counter() - started < timeout:
+        elapsed = time.perf_counter() - started
+        if elapsed >= next_report:
+            print(f"  t={elapsed:5.1f}s  queue depth={service.queue_depth():6d}  digests sent={service.stats['digests']}")
+            next_report += 1
+        if not service.queue_depth():
+            break
+        if not await service.deliver_ready(semaphore):
+            await asyncio.sleep(0.05)
+    elapsed = time.perf_counter() - started
+
+    server.close()
+    await server.wait_closed()
+    print(f"Delivered {service.stats['digests']} digests ({service.stats['messages']} reminders) in {elapsed:.2f}s: "
+          f"{service.stats['digests'] / elapsed:.1f} digests/s, SMTP stand-in received {len(smtp.messages)}")
+    print(f"Left pending: {service.queue_depth()}  rate-limited reminders: {service.stats['rate_limited']}  "
+          f"failures: {service.stats['failures']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--recipients', type=int, default=200)
+    parser.add_argument('--per-recipient', type=int, default=4, help="distinct reminders per recipient")
+    parser.add_argument('--duplicates', type=int, default=2, help="extra copies of each reminder")
+    parser.add_argument('--global-rate', type=float, default=100, help="global digests per second")
+    parser.add_argument('--timeout', type=float, default=60)
+    args = parser.parse_args()
+    asyncio.run(run_benchmark(args.recipients, args.per_recipient, args.duplicates, args.global_rate, args.timeout))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,214 @@
+"""Concurrent sessions against one Streamlit server
+
+Seeds a snapshot with `--employees` employees, some with documents waiting
+for verification, then for each concurrency level starts a fresh
+`streamlit run app.py` on it and connects that many simulated sessions.
+Each session replays the same click script in parallel with the others:
+open the Dashboard, select its own employee, verify their uploaded documents,
+start and complete tasks, submit a check-in survey and return to the
+Dashboard.
+
+For each level it reports p50/p95/p99 rerun latency, server CPU, and how far
+the server's RSS grows per open session over a warmed-up baseline. The
+per-step table for the largest level shows bytes per rerun, so
+Plotly-heavy pages stand out from row actions. CPU and RSS are read from
+/proc and are only reported on Linux.
+
+    python -m benchmarks.session_load --employees 500 --sessions 1,10,25,50
+"""
+import argparse
+import asyncio
+import os
+import random
+import shutil
+import tempfile
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+import numpy as np
+
+import snapshot
+from benchmarks.fragment_reruns import open_page, streamlit_server
+from benchmarks.streamlit_client import AppSession
+from employee_store import EmployeeStore
+from onboarding import create_employee
+
+DEPARTMENTS = ['Engineering', 'Product', 'Design', 'Sales', 'Marketing', 'HR', 'Finance']
+UPLOADED_DOCUMENTS = 3
+TASK_CLICKS = 3
+
+
+def seed_snapshot(root, employees):
+    """Write a snapshot of employees whose first documents are uploaded and awaiting verification"""
+    store = EmployeeStore()
+    start = datetime.now() - timedelta(days=7)
+    for i in range(employees):
+        emp = create_employee(f"Load Session {i:05d}", f"session{i}@example.com", DEPARTMENTS[i % len(DEPARTMENTS)],
+                              start + timedelta(days=i % 30), 'Software Engineer')
+        for doc_info in list(emp['documents'].values())[:UPLOADED_DOCUMENTS]:
+            doc_info['status'] = 'Uploaded'
+            doc_info['uploaded'] = start
+        store.add(emp)
+    snapshot.write_snapshot(store, root=root)
+    return [store.label(emp_id) for emp_id in store.keys()]
+
+
+class ProcessSampler:
+    """CPU seconds and resident memory of the server process, from /proc"""
+
+    def __init__(self, pid):
+        self.pid = pid
+        self.available = os.path.exists(f'/proc/{pid}/stat')
+
+    def cpu_seconds(self):
+        if not self.available:
+            return None
+        with open(f'/proc/{self.pid}/stat') as f:
+            fields = f.read().rsplit(')', 1)[1].split()
+        return (int(fields[11]) + int(fields[12])) / os.sysconf('SC_CLK_TCK')
+
+    def rss_mb(self):
+        if not self.available:
+            return None
+        with open(f'/proc/{self.pid}/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024
+        return None
+
+
+def with_key(session, prefix):
+    """Buttons whose user key starts with prefix; keys may themselves contain '-'"""
+    return [w for w in session.find_all(kind='button') if f"-{prefix}" in w.id and not w.disabled]
+
+
+async def click_script(session, label, results, think, rng):
+    """One user's visit; appends each RunResult to results[step]"""
+    async def step(name, run):
+        result = await run
+        if result is None:
+            return
+        if result.errors:
+            raise RuntimeError(f"{name}: {result.errors[0]}")
+        results[name].append(result)
+        if think:
+            await asyncio.sleep(rng.uniform(0, 2 * think))
+
+    await step("open Dashboard", open_page(session, "📊 Dashboard"))
+    selector = next(w for w in session.find_all(kind='selectbox') if not w.label)
+    await step("select employee", session.set(selector, label))
+
+    await step("open Documents", open_page(session, "📄 Documents"))
+    for widget in with_key(session, 'verify_'):
+        await step("verify document", session.click(widget))
+
+    await step("open Tasks", open_page(session, "✅ Tasks & Workflow"))
+    for idx in range(TASK_CLICKS):
+        for _ in ('start', 'complete'):
+            await step("task action", session.click(with_key(session, f"task_{idx}_")[0]))
+
+    await step("open Surveys", open_page(session, "📊 Surveys & Analytics"))
+    await step("submit survey", session.click(session.find(label='📤 Submit Survey')))
+    await step("open Dashboard", open_page(session, "📊 Dashboard"))
+
+
+async def run_level(url, sampler, labels, sessions, think, timeout):
+    """Connect `sessions` sessions, replay the script in all of them at once and measure"""
+    warmup = AppSession(url, timeout=timeout)
+    await warmup.connect()
+    await warmup.close()
+    await asyncio.sleep(1)
+    baseline_rss = sampler.rss_mb()
+
+    clients = [AppSession(url, timeout=timeout) for _ in range(sessions)]
+    results = defaultdict(list)
+    connects = await asyncio.gather(*(client.connect() for client in clients))
+    results["connect"].extend(connects)
+
+    cpu_before = sampler.cpu_seconds()
+    started = time.perf_counter()
+    await asyncio.gather(*(click_script(client, labels[i % len(labels)], results, think, random.Random(i))
+                           for i, client in enumerate(clients)))
+    elapsed = time.perf_counter() - started
+    cpu_after = sampler.cpu_seconds()
+    rss = sampler.rss_mb()
+    for client in clients:
+        await client.close()
+
+    return {
+        'sessions': sessions,
+        'results': results,
+        'elapsed': elapsed,
+        'cpu': None if cpu_before is None else (cpu_after - cpu_before) / elapsed,
+        'baseline_rss': baseline_rss,
+        'rss': rss,
+    }
+
+
+def percentiles(results):
+    ms = np.array([r.seconds for r in results]) * 1000
+    return np.percentile(ms, 50), np.percentile(ms, 95), np.percentile(ms, 99)
+
+
+def report(levels):
+    print(f"{'sessions':>8} {'reruns':>7} {'reruns/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+          f"{'CPU':>6} {'RSS MB':>8} {'MB/session':>11}")
+    for level in levels:
+        reruns = [r for name, results in level['results'].items() if name != "connect" for r in results]
+        p50, p95, p99 = percentiles(reruns)
+        cpu = f"{level['cpu'] * 100:5.0f}%" if level['cpu'] is not None else '    -'
+        if level['rss'] is not None:
+            rss = f"{level['rss']:8.0f}"
+            per_session = f"{(level['rss'] - level['baseline_rss']) / level['sessions']:11.1f}"
+        else:
+            rss, per_session = f"{'-':>8}", f"{'-':>11}"
+        print(f"{level['sessions']:8d} {len(reruns):7d} {len(reruns) / level['elapsed']:9.1f} "
+              f"{p50:8.1f} {p95:8.1f} {p99:8.1f} {cpu} {rss} {per_session}")
+
+    largest = levels[-1]
+    print(f"\nPer step at {largest['sessions']} sessions:")
+    print(f"{'step':<18} {'reruns':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'KB/rerun':>9}")
+    for name, results in largest['results'].items():
+        p50, p95, p99 = percentiles(results)
+        kb = np.mean([r.bytes_received for r in results]) / 1024
+        print(f"{name:<18} {len(results):7d} {p50:8.1f} {p95:8.1f} {p99:8.1f} {kb:9.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--employees', type=int, default=500, help="employees in the seeded snapshot")
+    parser.add_argument('--sessions', default='1,10,25,50', help="comma-separated concurrency levels")
+    parser.add_argument('--think', type=float, default=0.0,
+                        help="mean pause between a session's clicks in seconds (0 = back to back)")
+    parser.add_argument('--timeout', type=float, default=600, help="seconds to wait for any one rerun")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    seed = os.path.join(workdir, 'seed')
+    labels = seed_snapshot(seed, args.employees)
+    print(f"Seeded {len(labels)} employees in {workdir}")
+
+    levels = []
+    for sessions in sorted(int(n) for n in args.sessions.split(',')):
+        # A fresh server and data per level, so neither RSS nor verified documents carry over
+        level_dir = os.path.join(workdir, f"sessions-{sessions}")
+        shutil.copytree(seed, os.path.join(level_dir, 'snapshots'))
+        env = {
+            'ONBOARDING_SNAPSHOT_DIR': os.path.join(level_dir, 'snapshots'),
+            'ONBOARDING_OUTBOX': os.path.join(level_dir, 'outbox.sqlite3'),
+            'ONBOARDING_SYNC_STATE': os.path.join(level_dir, 'hr_sync.sqlite3'),
+            'ONBOARDING_UPLOAD_DIR': os.path.join(level_dir, 'uploads'),
+            'ONBOARDING_EXPORT_DIR': os.path.join(level_dir, 'exports'),
+            'ONBOARDING_ARCHIVE': os.path.join(level_dir, 'archive.sqlite3'),
+            'ONBOARDING_KPI_HISTORY': os.path.join(level_dir, 'kpi_history.npz'),
+        }
+        with streamlit_server(env=env) as (url, proc):
+            levels.append(asyncio.run(run_level(url, ProcessSampler(proc.pid), labels, sessions, args.think, args.timeout)))
+        print(f"  {sessions} session(s) done")
+    print()
+    report(levels)
+
+
+if __name__ == '__main__':
+    main()
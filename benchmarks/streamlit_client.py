@@ -0,0 +1,171 @@
+"""Minimal headless Streamlit session client for benchmarks and load tests
+
+Speaks the browser's websocket protocol (protobuf BackMsg/ForwardMsg) so a
+script can drive a running `streamlit run app.py` like a user would: find
+widgets by label or key, set values, click buttons and time each rerun.
+Requires the `websockets` package (installed alongside recent Streamlit).
+"""
+import asyncio
+import time
+from dataclasses import dataclass, field
+
+import websockets
+from streamlit.proto.BackMsg_pb2 import BackMsg
+from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+
+# Widget element types and the WidgetState field their value is sent in
+VALUE_FIELDS = {
+    'radio': 'string_value',
+    'selectbox': 'string_value',
+    'text_input': 'string_value',
+    'text_area': 'string_value',
+    'multiselect': 'string_array_value',
+    'checkbox': 'bool_value',
+    'number_input': 'double_value',
+    'date_input': 'string_array_value',
+    'time_input': 'string_value',
+    'slider': 'double_array_value',
+}
+
+
+@dataclass
+class Widget:
+    id: str
+    kind: str
+    label: str
+    fragment_id: str = ''
+    form_id: str = ''
+    disabled: bool = False
+
+
+@dataclass
+class RunResult:
+    seconds: float
+    bytes_received: int
+    messages: int
+    status: str
+    errors: list = field(default_factory=list)
+
+
+class AppSession:
+    """One simulated browser tab connected to a Streamlit server"""
+
+    def __init__(self, url='ws://localhost:8501/_stcore/stream', timeout=60):
+        self.url = url
+        self.timeout = timeout
+        self.ws = None
+        self.widgets = {}
+        self.values = {}
+        self.texts = []
+        self.page_script_hash = ''
+
+    async def connect(self):
+        """Open the websocket and perform the initial script run"""
+        # No keepalive pings: a saturated server under load test would drop the connection
+        self.ws = await websockets.connect(self.url, subprotocols=['streamlit'], max_size=None, ping_interval=None)
+        return await self.rerun()
+
+    async def close(self):
+        if self.ws is not None:
+            await self.ws.close()
+
+    def _widget_states(self, trigger=None):
+        back = BackMsg()
+        for widget_id, (value_field, value) in self.values.items():
+            state = back.rerun_script.widget_states.widgets.add()
+            state.id = widget_id
+            _set_value(state, value_field, value)
+        if trigger is not None:
+            state = back.rerun_script.widget_states.widgets.add()
+            state.id = trigger
+            state.trigger_value = True
+        return back
+
+    async def rerun(self, trigger=None, fragment_id=''):
+        """Send a rerun request and consume messages until the script finishes"""
+        back = self._widget_states(trigger)
+        back.rerun_script.page_script_hash = self.page_script_hash
+        back.rerun_script.fragment_id = fragment_id
+
+        started = time.perf_counter()
+        await self.ws.send(back.SerializeToString())
+
+        received = 0
+        count = 0
+        errors = []
+        while True:
+            raw = await asyncio.wait_for(self.ws.recv(), self.timeout)
+            received += len(raw)
+            count += 1
+            msg = ForwardMsg()
+            msg.ParseFromString(raw)
+            kind = msg.WhichOneof('type')
+            if kind == 'new_session':
+                self.page_script_hash = msg.new_session.page_script_hash
+                if not msg.new_session.fragment_ids_this_run:
+                    # A full run (possibly escalated from a fragment) redraws everything
+                    self.widgets = {}
+                    self.texts = []
+            elif kind == 'delta':
+                self._record_delta(msg, errors)
+            elif kind == 'script_finished':
+                status = ForwardMsg.ScriptFinishedStatus.Name(msg.script_finished)
+                if status == 'FINISHED_EARLY_FOR_RERUN':
+                    continue
+                return RunResult(time.perf_counter() - started, received, count, status, errors)
+
+    def _record_delta(self, msg, errors):
+        if msg.delta.WhichOneof('type') != 'new_element':
+            return
+        element = msg.delta.new_element
+        kind = element.WhichOneof('type')
+        if kind == 'exception':
+            errors.append(element.exception.message)
+            return
+        if kind == 'markdown':
+            self.texts.append(element.markdown.body)
+            return
+        proto = getattr(element, kind)
+        if not hasattr(proto, 'id') or not getattr(proto, 'id', ''):
+            return
+        self.widgets[proto.id] = Widget(
+            id=proto.id,
+            kind=kind,
+            label=getattr(proto, 'label', ''),
+            fragment_id=msg.delta.fragment_id,
+            form_id=getattr(proto, 'form_id', ''),
+            disabled=getattr(proto, 'disabled', False),
+        )
+
+    def find(self, label=None, key=None, kind=None):
+        """Return the first widget matching a label, user key suffix and/or type"""
+        for widget in self.widgets.values():
+            if label is not None and widget.label != label:
+                continue
+            if key is not None and not widget.id.endswith(f"-{key}"):
+                continue
+            if kind is not None and widget.kind != kind:
+                continue
+            return widget
+        raise LookupError(f"No widget with label={label!r} key={key!r} kind={kind!r}")
+
+    def find_all(self, label=None, kind=None):
+        return [w for w in self.widgets.values()
+                if (label is None or w.label == label) and (kind is None or w.kind == kind)]
+
+    async def set(self, widget, value, rerun=True):
+        """Set a widget value; widgets inside a form are only sent on submit"""
+        self.values[widget.id] = (VALUE_FIELDS[widget.kind], value)
+        if rerun and not widget.form_id:
+            return await self.rerun(fragment_id=widget.fragment_id)
+
+    async def click(self, widget, fragment=True):
+        """Click a button; inside a fragment only that fragment reruns unless fragment=False"""
+        return await self.rerun(trigger=widget.id, fragment_id=widget.fragment_id if fragment else '')
+
+
+def _set_value(state, value_field, value):
+    if value_field in ('string_array_value', 'double_array_value', 'int_array_value'):
+        getattr(state, value_field).data[:] = list(value)
+    else:
+        setattr(state, value_field, value)
@@ -0,0 +1,138 @@
+"""Reference data shared by every session
+
+Catalogs of the items each new hire works through, the colour and icon
+maps used to render statuses, and the option lists offered in forms. They
+are built once when the module is first imported, so they are not rebuilt
+on every rerun of every session. Everything here is immutable (tuples and
+read-only mappings); create_employee() copies the catalogs into fresh
+per-employee records.
+"""
+from types import MappingProxyType
+
+
+def frozen(mapping):
+    return MappingProxyType(dict(mapping))
+
+
+# (name, priority)
+DOCUMENTS = (
+    ('Government ID', 'High'),
+    ('Tax Forms (W-4/W-9)', 'High'),
+    ('Direct Deposit Form', 'High'),
+    ('Emergency Contact Info', 'High'),
+    ('Signed Offer Letter', 'High'),
+    ('I-9 Employment Eligibility', 'Critical'),
+    ('Background Check Consent', 'Medium'),
+    ('NDA Agreement', 'High'),
+)
+
+# (name, dependency, days after start date it is due, category)
+TASKS = (
+    ('Complete Employee Profile', None, 1, 'Administrative'),
+    ('Review Company Handbook', 'Complete Employee Profile', 2, 'Orientation'),
+    ('Setup Work Email & Accounts', 'Complete Employee Profile', 1, 'IT Setup'),
+    ('Attend Welcome Orientation', 'Setup Work Email & Accounts', 2, 'Orientation'),
+    ('Meet Team Members', 'Attend Welcome Orientation', 3, 'Social'),
+    ('Setup Development Environment', 'Setup Work Email & Accounts', 3, 'IT Setup'),
+    ('Shadow Team Member', 'Meet Team Members', 5, 'Training'),
+    ('Review First Assignment', 'Shadow Team Member', 7, 'Work'),
+    ('30-Day Check-in with Manager', 'Review First Assignment', 30, 'Review'),
+)
+
+EQUIPMENT = (
+    'MacBook Pro / Windows Laptop',
+    'External Monitor(s)',
+    'Keyboard & Mouse',
+    'Access Card/Badge',
+    'Mobile Phone',
+    'Headset',
+    'Desk & Chair',
+)
+
+# (name, days after start date it is due, duration, priority)
+COMPLIANCE = (
+    ('Data Protection & Privacy (GDPR)', 5, '45 min', 'Critical'),
+    ('Information Security Awareness', 7, '30 min', 'Critical'),
+    ('Workplace Health & Safety', 3, '20 min', 'High'),
+    ('Code of Conduct & Ethics', 2, '25 min', 'High'),
+    ('Anti-Harassment Policy', 5, '30 min', 'High'),
+    ('Cybersecurity Best Practices', 10, '40 min', 'Medium'),
+)
+
+DEPARTMENTS = (
+    "Engineering", "Product", "Design", "Sales", "Marketing",
+    "Customer Success", "HR", "Finance", "Operations", "Legal",
+)
+
+MEETING_TYPES = (
+    "HR Orientation",
+    "IT Setup & Security",
+    "Direct Manager 1:1",
+    "Team Introduction",
+    "Finance & Benefits",
+    "Facilities Tour",
+    "Legal & Compliance",
+    "Product Training",
+    "Engineering Team",
+    "Customer Success Team",
+)
+
+MEETING_DURATIONS = ("15 min", "30 min", "45 min", "1 hour", "1.5 hours", "2 hours")
+
+DEFAULT_COLOR = '#6b7280'
+
+STATUS_COLORS = frozen({
+    'Pending': '#fbbf24',
+    'Uploaded': '#60a5fa',
+    'Verified': '#34d399',
+    'Rejected': '#f87171',
+    'Not Started': '#94a3b8',
+    'In Progress': '#60a5fa',
+    'Completed': '#34d399',
+    'Locked': '#cbd5e1',
+    'Assigned': '#34d399',
+    'Scheduled': '#60a5fa',
+    'Overdue': '#ef4444',
+    'Critical': '#dc2626',
+    'High': '#f59e0b',
+    'Medium': '#3b82f6',
+    'Low': '#6b7280',
+})
+
+DOCUMENT_STATUS_ICONS = frozen({
+    'Pending': '⏳',
+    'Uploaded': '📤',
+    'Verified': '✅',
+    'Rejected': '❌',
+})
+
+TASK_STATUS_ICONS = frozen({
+    'Locked': '🔒',
+    'Not Started': '⭕',
+    'In Progress': '🔄',
+    'Completed': '✅',
+})
+
+PRIORITY_ICONS = frozen({
+    'Critical': '🔴',
+    'High': '🟠',
+    'Medium': '🟡',
+    'Low': '⚪',
+})
+
+SENTIMENT_COLORS = frozen({
+    'Positive': '#34d399',
+    'Neutral': '#fbbf24',
+    'Negative': '#f87171',
+})
+
+SENTIMENT_ICONS = frozen({
+    'Positive': '😊',
+    'Neutral': '😐',
+    'Negative': '😟',
+})
+
+
+def status_color(status):
+    """Colour code for a status or priority"""
+    return STATUS_COLORS.get(status, DEFAULT_COLOR)
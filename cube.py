@@ -0,0 +1,314 @@
+"""Precomputed item counts for slicing, roll-ups and funnel analysis
+
+OnboardingCube holds two dense count arrays over every item of every
+employee:
+
+    counts[department, cohort, item class, status]   items currently in each status
+    done[department, cohort, item class, day]        finished items by days since start
+
+An item class is an item kind with its category (tasks) or priority
+(documents, compliance); equipment forms a single class. Days since start
+only exist for finished items, so they get their own array instead of a
+mostly empty axis on the first; items finished MAX_DAY or more days after
+the start date share the last bucket.
+
+The cube is built from a snapshot's columns in one vectorized pass and then
+kept current by update(), which swaps out the cells of changed employees:
+what an employee contributed before is subtracted and what their record
+contributes now is added. Queries only sum over the arrays.
+"""
+import numpy as np
+import pandas as pd
+
+import analytics
+import catalogs
+from onboarding import DONE_STATUS, ITEM_KINDS
+from snapshot import NO_TIME, CodeTable
+
+MAX_DAY = 90
+DAY_MICROS = 86_400_000_000
+
+# Record field that groups each kind's items into classes, and the field
+# holding when an item was finished
+GROUP_FIELDS = {'Document': 'priority', 'Task': 'category', 'Equipment': None, 'Compliance': 'priority'}
+DONE_FIELDS = {'Document': 'verified', 'Task': 'completed', 'Equipment': 'assigned_date', 'Compliance': 'completed'}
+NO_GROUP = 'All'
+
+STATUSES = ('Pending', 'Uploaded', 'Rejected', 'Verified', 'Locked', 'Not Started', 'In Progress',
+            'Completed', 'Assigned')
+DIMENSIONS = ('department', 'cohort', 'kind', 'group', 'status')
+
+_FROM_SOURCE = object()
+
+
+def _item_classes():
+    """Every (kind, group) pair the catalogs produce, in display order"""
+    classes = [('Document', priority) for priority in catalogs.PRIORITY_ICONS]
+    classes += [('Task', category) for category in dict.fromkeys(category for *_, category in catalogs.TASKS)]
+    classes += [('Equipment', NO_GROUP)]
+    classes += [('Compliance', priority) for priority in catalogs.PRIORITY_ICONS]
+    return classes
+
+
+def _encode(table, labels, codes):
+    """Codes of a snapshot column translated to indexes of a cube axis, adding only the labels in use"""
+    codes = np.asarray(codes)
+    used, inverse = np.unique(codes, return_inverse=True)
+    index = np.array([table.encode(labels(code)) for code in used.tolist()], dtype=np.int64)
+    return index[inverse.reshape(codes.shape)] if len(used) else np.zeros(codes.shape, dtype=np.int64)
+
+
+def _matches(labels, wanted):
+    """Indexes of the labels selected by a filter value: None (all), one label or a list of labels"""
+    if wanted is None:
+        return np.arange(len(labels))
+    wanted = {wanted} if isinstance(wanted, str) else set(wanted)
+    return np.array([i for i, label in enumerate(labels) if label in wanted], dtype=np.int64)
+
+
+class OnboardingCube:
+    """Item counts by department × cohort × kind × category/priority × status, and
+    finished items by days since start"""
+
+    def __init__(self):
+        self.departments = CodeTable()
+        self.cohorts = CodeTable()
+        self.classes = CodeTable(_item_classes())
+        self.statuses = CodeTable(STATUSES)
+        self.counts = np.zeros((0, 0, len(self.classes.values), len(self.statuses.values)), dtype=np.int32)
+        self.done = np.zeros((0, 0, len(self.classes.values), MAX_DAY + 1), dtype=np.int32)
+        self.version = 0
+        self._source = None
+        # Cells of employees whose contribution no longer comes from the source snapshot
+        # (None once removed)
+        self._changed = {}
+        self._shared = False
+
+    @classmethod
+    def build(cls, employees):
+        """Cube over every employee of a store, reading unchanged employees from its snapshot columns"""
+        cube = cls()
+        ids = list(employees.keys())
+        clean, rows = employees.source_rows(ids) if hasattr(employees, 'source_rows') else ([], [])
+        if clean:
+            cube._source = employees.source
+            irregular = np.asarray(cube._source.columns['employee.irregular'])[rows].astype(bool)
+            cube._add(cube._snapshot_cells(np.asarray(rows)[~irregular]), 1)
+            clean = [i for i, skip in zip(clean, irregular) if not skip]
+            cube._changed = dict.fromkeys(set(cube._source.ids) - set(ids))
+        read = set(clean)
+        for i, emp_id in enumerate(ids):
+            if i not in read:
+                cells = cube._record_cells(employees.peek(emp_id) if hasattr(employees, 'peek') else employees[emp_id])
+                cube._add(cells, 1)
+                cube._changed[emp_id] = cells
+        return cube
+
+    def copy(self):
+        """A cube sharing this one's arrays until either is updated"""
+        other = OnboardingCube()
+        other.departments = CodeTable(self.departments.values)
+        other.cohorts = CodeTable(self.cohorts.values)
+        other.classes = CodeTable(self.classes.values)
+        other.statuses = CodeTable(self.statuses.values)
+        other.counts, other.done = self.counts, self.done
+        other.version = self.version
+        other._source = self._source
+        other._changed = dict(self._changed)
+        other._shared = self._shared = True
+        return other
+
+    # Maintenance
+    def update(self, employees, ids):
+        """Replace the cells of changed, added or removed employees with their current ones"""
+        for emp_id in ids:
+            old = self._changed.pop(emp_id, _FROM_SOURCE)
+            if old is _FROM_SOURCE:
+                old = self._source_cells(emp_id)
+            if old is not None:
+                self._add(old, -1)
+            cells = None
+            if emp_id in employees:
+                cells = self._record_cells(employees.peek(emp_id) if hasattr(employees, 'peek') else employees[emp_id])
+                self._add(cells, 1)
+            self._changed[emp_id] = cells
+        self.version += 1
+
+    def _add(self, cells, sign):
+        department, cohort, item_class, status, day = cells
+        if self._shared:
+            self.counts, self.done = self.counts.copy(), self.done.copy()
+            self._shared = False
+        self._grow()
+        np.add.at(self.counts, (department, cohort, item_class, status), sign)
+        finished = day >= 0
+        np.add.at(self.done, (department[finished], cohort[finished], item_class[finished], day[finished]), sign)
+
+    def _grow(self):
+        """Extend the arrays to cover labels seen since the last change"""
+        shape = (len(self.departments.values), len(self.cohorts.values), len(self.classes.values))
+        if self.counts.shape[:3] == shape and self.counts.shape[3] == len(self.statuses.values):
+            return
+        counts = np.zeros(shape + (len(self.statuses.values),), dtype=np.int32)
+        counts[tuple(slice(0, n) for n in self.counts.shape)] = self.counts
+        done = np.zeros(shape + (MAX_DAY + 1,), dtype=np.int32)
+        done[tuple(slice(0, n) for n in self.done.shape)] = self.done
+        self.counts, self.done = counts, done
+
+    def _source_cells(self, emp_id):
+        """Cells the source snapshot contributed for an employee, or None if it didn't"""
+        position = self._source.positions.get(emp_id) if self._source is not None else None
+        if position is None:
+            return None
+        if self._source.columns['employee.irregular'][position]:
+            return self._record_cells(self._source.employee(position))
+        return self._snapshot_cells(np.array([position]))
+
+    def _snapshot_cells(self, rows):
+        """(department, cohort, class, status, day) index arrays for every item of regular snapshot rows"""
+        c = self._source.columns
+        m = self._source.manifest
+        start = np.asarray(c['employee.start_date'])[rows]
+        department = _encode(self.departments, m['departments'].__getitem__, np.asarray(c['employee.department'])[rows])
+        months = start.view('datetime64[us]').astype('datetime64[M]').view(np.int64)
+        cohort = _encode(self.cohorts, lambda month: str(np.datetime64(month, 'M')), months)
+
+        cells = []
+        for kind, key in ITEM_KINDS.items():
+            names = m['item_names'][key]
+            codes = np.asarray(c[f'{key}.status'])[rows]
+            if GROUP_FIELDS[kind] == 'category':
+                categories = {name: category for name, _, _, category in catalogs.TASKS}
+                item_class = np.array([self.classes.encode((kind, categories.get(name, NO_GROUP))) for name in names],
+                                      dtype=np.int64)[None, :]
+            elif GROUP_FIELDS[kind] is None:
+                item_class = np.array([[self.classes.encode((kind, NO_GROUP))]], dtype=np.int64)
+            else:
+                item_class = _encode(self.classes, lambda code: (kind, m['codes'][code]),
+                                     np.asarray(c[f'{key}.{GROUP_FIELDS[kind]}'])[rows])
+            finished = np.asarray(c[f'{key}.{DONE_FIELDS[kind]}'])[rows]
+            done = (codes == m['codes'].index(DONE_STATUS[key])) if DONE_STATUS[key] in m['codes'] \
+                else np.zeros(codes.shape, dtype=bool)
+            day = np.where(done & (finished != NO_TIME),
+                           np.clip((finished - start[:, None]) // DAY_MICROS, 0, MAX_DAY), -1)
+            shape = codes.shape
+            cells.append((np.broadcast_to(department[:, None], shape).ravel(),
+                          np.broadcast_to(cohort[:, None], shape).ravel(),
+                          np.broadcast_to(item_class, shape).ravel(),
+                          _encode(self.statuses, m['codes'].__getitem__, codes).ravel(),
+                          day.ravel()))
+        return tuple(np.concatenate(axis) for axis in zip(*cells))
+
+    def _record_cells(self, emp):
+        """(department, cohort, class, status, day) index arrays for every item of one record"""
+        department = self.departments.encode(emp['department'])
+        cohort = self.cohorts.encode(analytics.get_cohort(emp['start_date']))
+        item_class, status, day = [], [], []
+        for kind, key in ITEM_KINDS.items():
+            items = emp[key] if key == 'tasks' else emp[key].values()
+            for item in items:
+                group = item.get(GROUP_FIELDS[kind], NO_GROUP) if GROUP_FIELDS[kind] else NO_GROUP
+                item_class.append(self.classes.encode((kind, group)))
+                status.append(self.statuses.encode(item['status']))
+                finished = item.get(DONE_FIELDS[kind])
+                if item['status'] == DONE_STATUS[key] and finished is not None:
+                    day.append(min(max((finished - emp['start_date']).days, 0), MAX_DAY))
+                else:
+                    day.append(-1)
+        n = len(status)
+        return (np.full(n, department, dtype=np.int64), np.full(n, cohort, dtype=np.int64),
+                np.array(item_class, dtype=np.int64), np.array(status, dtype=np.int64), np.array(day, dtype=np.int64))
+
+    # Queries
+    def labels(self, dimension):
+        """Labels present along a dimension, sorted (cohorts newest first)"""
+        counts = self.counts
+        if dimension == 'department':
+            present = counts.sum(axis=(1, 2, 3)) > 0
+            return sorted(label for label, keep in zip(self.departments.values, present) if keep)
+        if dimension == 'cohort':
+            present = counts.sum(axis=(0, 2, 3)) > 0
+            return sorted((label for label, keep in zip(self.cohorts.values, present) if keep), reverse=True)
+        if dimension == 'status':
+            present = counts.sum(axis=(0, 1, 2)) > 0
+            return [label for label, keep in zip(self.statuses.values, present) if keep]
+        present = counts.sum(axis=(0, 1, 3)) > 0
+        classes = [item_class for item_class, keep in zip(self.classes.values, present) if keep]
+        if dimension == 'kind':
+            return list(dict.fromkeys(kind for kind, _ in classes))
+        return list(dict.fromkeys(group for _, group in classes))
+
+    def _selection(self, department=None, cohort=None, kind=None, group=None):
+        classes = self.classes.values
+        item_index = np.intersect1d(_matches([k for k, _ in classes], kind), _matches([g for _, g in classes], group))
+        return (_matches(self.departments.values[:self.counts.shape[0]], department),
+                _matches(self.cohorts.values[:self.counts.shape[1]], cohort),
+                item_index[item_index < self.counts.shape[2]])
+
+    def _frame(self, index, values, value_names):
+        """Label columns for (department, cohort, class) cells plus their values"""
+        department, cohort, item_class = index
+        frame = pd.DataFrame({
+            'department': np.asarray(self.departments.values, dtype=object)[department],
+            'cohort': np.asarray(self.cohorts.values, dtype=object)[cohort],
+            'kind': [self.classes.values[i][0] for i in item_class],
+            'group': [self.classes.values[i][1] for i in item_class],
+        })
+        for name, column in zip(value_names, values):
+            frame[name] = column
+        return frame
+
+    def rollup(self, by=('kind',), status=None, **filters):
+        """Item counts summed up to the `by` dimensions
+
+        `by` names any of DIMENSIONS; filters take a label or list of labels
+        for department, cohort, kind and group. Returns a DataFrame with the
+        `by` columns and 'items'.
+        """
+        by = list(by)
+        departments, cohorts, items = self._selection(**filters)
+        statuses = _matches(self.statuses.values[:self.counts.shape[3]], status)
+        sub = self.counts[np.ix_(departments, cohorts, items, statuses)]
+        d, c, i, s = np.nonzero(sub)
+        frame = self._frame((departments[d], cohorts[c], items[i]), [
+            np.asarray(self.statuses.values, dtype=object)[statuses[s]], sub[d, c, i, s]], ['status', 'items'])
+        if not by:
+            return pd.DataFrame({'items': [int(frame['items'].sum())]})
+        return frame.groupby(by, sort=True, as_index=False)['items'].sum()
+
+    def pivot(self, by, **filters):
+        """Item counts with one row per `by` value and one column per status"""
+        by = [by] if isinstance(by, str) else list(by)
+        frame = self.rollup(by=by + ['status'], **filters)
+        table = frame.pivot(index=by, columns='status', values='items').fillna(0).astype(int)
+        table.columns.name = None
+        return table[[s for s in self.statuses.values if s in table.columns]]
+
+    def funnel(self, by=('kind',), days=None, **filters):
+        """Share of items finished within each number of days since the start date
+
+        Returns a DataFrame with the `by` columns (any dimensions but status),
+        'day', 'done' (finished by that day), 'items' and 'share'. `days`
+        limits the days reported; MAX_DAY stands for "ever".
+        """
+        by = [by] if isinstance(by, str) else list(by)
+        departments, cohorts, items = self._selection(**filters)
+        cells = np.ix_(departments, cohorts, items)
+        totals = self.counts[cells].sum(axis=3)
+        d, c, i = np.nonzero(totals)
+        frame = self._frame((departments[d], cohorts[c], items[i]), [totals[d, c, i]], ['items'])
+        groups = frame.groupby(by, sort=True)
+        index = groups.ngroup().to_numpy()
+        keys = groups.size().index.to_frame(index=False)
+        cumulative = np.cumsum(self.done[cells][d, c, i], axis=1)
+        done = np.zeros((len(keys), MAX_DAY + 1), dtype=np.int64)
+        np.add.at(done, index, cumulative)
+        item_totals = np.bincount(index, weights=frame['items'], minlength=len(keys)).astype(int)
+
+        days = np.arange(MAX_DAY + 1) if days is None else np.clip(np.asarray(days, dtype=int), 0, MAX_DAY)
+        result = keys.loc[keys.index.repeat(len(days))].reset_index(drop=True)
+        result['day'] = np.tile(days, len(keys))
+        result['done'] = done[:, days].ravel()
+        result['items'] = np.repeat(item_totals, len(days))
+        result['share'] = result['done'] / result['items'].where(result['items'] > 0)
+        return result
@@ -0,0 +1,166 @@
+"""Materialized Dashboard figures, refreshed in the background
+
+The Dashboard renders from an immutable DashboardSnapshot instead of
+recomputing KPIs on every visit. A refresher thread rebuilds the snapshot
+every REFRESH_INTERVAL seconds while there are unrefreshed changes, or as
+soon as REFRESH_AFTER_WRITES changes have been recorded, and swaps it in
+atomically; readers never see a half-built snapshot.
+
+The refresher never reads the store: records are changed in place by script
+threads, so once a refresh is due a script thread copies the summary rows
+between writes and offers the copy, which the refresher builds from.
+Without changes the snapshot's own rows are still current, so once it is
+REFRESH_INTERVAL old the refresher rebuilds from them by itself, keeping
+figures that depend on the time, such as overdue compliance, up to date.
+"""
+import threading
+import weakref
+from collections import Counter
+from dataclasses import dataclass
+from datetime import datetime
+
+REFRESH_INTERVAL = 30
+REFRESH_AFTER_WRITES = 10
+# Employees per page of the per-employee chart and overview cards
+OVERVIEW_PAGE_SIZE = 50
+
+TASK_STATUSES = ['Not Started', 'In Progress', 'Completed', 'Locked']
+
+
+@dataclass(frozen=True)
+class DashboardSnapshot:
+    computed_at: datetime
+    total_employees: int
+    pending_documents: int
+    pending_equipment: int
+    overdue_compliance: int
+    avg_completion: int
+    task_status: tuple        # ((status, count), ...)
+    progress: tuple           # ((employee label, completion %), ...)
+    departments: tuple        # ((department, employees, avg completion %), ...)
+    employees: tuple          # summary rows for the overview cards
+
+    def age(self, now=None):
+        return ((now or datetime.now()) - self.computed_at).total_seconds()
+
+
+def build_snapshot(summaries, now=None):
+    """Compute every Dashboard figure from summarize_employee() rows"""
+    now = now or datetime.now()
+    summaries = [dict(s) for s in summaries]
+    task_status = dict.fromkeys(TASK_STATUSES, 0)
+    departments = {}
+    for s in summaries:
+        for status, count in s['task_status'].items():
+            task_status[status] = task_status.get(status, 0) + count
+        departments.setdefault(s['department'], []).append(s['completion'])
+    total = len(summaries)
+    name_counts = Counter(s['name'] for s in summaries)
+    return DashboardSnapshot(
+        computed_at=now,
+        total_employees=total,
+        pending_documents=sum(s['pending_documents'] for s in summaries),
+        pending_equipment=sum(s['pending_equipment'] for s in summaries),
+        overdue_compliance=sum(1 for s in summaries for due_date in s['open_compliance_due'] if due_date < now),
+        avg_completion=int(sum(s['completion'] for s in summaries) / total) if total else 0,
+        task_status=tuple(task_status.items()),
+        progress=tuple((s['name'] if name_counts[s['name']] == 1 else f"{s['name']} (#{s['id']})", s['completion'])
+                       for s in summaries),
+        departments=tuple((dept, len(values), round(sum(values) / len(values), 1))
+                          for dept, values in sorted(departments.items())),
+        employees=tuple(summaries),
+    )
+
+
+class MaterializedDashboard:
+    """Holds the current DashboardSnapshot and rebuilds it off the script thread"""
+
+    def __init__(self, load_summaries, interval=REFRESH_INTERVAL, after_writes=REFRESH_AFTER_WRITES, initial=None):
+        # Called on script threads only, for the first snapshot and "Refresh now"
+        self.load_summaries = load_summaries
+        self.interval = interval
+        self.after_writes = after_writes
+        self.snapshot = initial
+        self.writes_since = 0
+        self.last_error = None
+        self._cond = threading.Condition()
+        self._refresh_requested = False
+        self._offered = None    # (summary rows, writes they cover) for the refresher
+        # The thread only holds a weak reference, so it ends with the view
+        thread = threading.Thread(target=_refresh_loop, args=(weakref.ref(self), self._cond),
+                                  name='dashboard-refresher', daemon=True)
+        thread.start()
+
+    def refresh(self):
+        """Rebuild the snapshot now, on the calling script thread, and return it"""
+        with self._cond:
+            writes = self.writes_since
+        return self._build(self.load_summaries(), writes)
+
+    def _build(self, summaries, writes):
+        snapshot = build_snapshot(summaries)
+        with self._cond:
+            self.snapshot = snapshot
+            self.writes_since -= writes
+            self._refresh_requested = False
+        return snapshot
+
+    def current(self):
+        """The latest snapshot, building the first one synchronously"""
+        return self.snapshot or self.refresh()
+
+    def record_write(self, count=1):
+        with self._cond:
+            self.writes_since += count
+            if self.writes_since >= self.after_writes:
+                self._refresh_requested = True
+
+    def request_refresh(self):
+        with self._cond:
+            self._refresh_requested = True
+
+    def wants_rows(self):
+        """Whether a refresh is due and waiting for a copy of the summary rows"""
+        with self._cond:
+            return self._offered is None and bool(self._due())
+
+    def offer(self, summaries):
+        """Hand the refresher a copy of the summary rows, taken between writes"""
+        with self._cond:
+            self._offered = (summaries, self.writes_since)
+            self._cond.notify()
+
+    def _due(self):
+        if self._refresh_requested:
+            return True
+        return self.snapshot is not None and self.writes_since and self.snapshot.age() >= self.interval
+
+    def _stale(self):
+        """Seconds until an unchanged snapshot is due for a rebuild from its own rows, or 0 if it is"""
+        if self.snapshot is None or self.writes_since or self._refresh_requested:
+            return None
+        return max(self.interval - self.snapshot.age(), 0)
+
+
+def _refresh_loop(ref, cond):
+    while True:
+        view = ref()
+        if view is None:
+            return
+        with cond:
+            offered, view._offered = view._offered, None
+            if offered is None:
+                wait = view._stale()
+                if wait == 0:
+                    offered = (view.snapshot.employees, 0)
+                else:
+                    wait = view.interval if wait is None else wait
+                    del view
+                    cond.wait(wait)
+                    continue
+        try:
+            view._build(*offered)
+            view.last_error = None
+        except Exception as e:
+            view.last_error = e
+        del view
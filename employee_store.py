@@ -0,0 +1,412 @@
+"""Two-tier employee store: resident summary rows, on-demand detail
+
+List views only need the summarize_employee() row of each employee, which is
+always kept in memory. Full records (documents, tasks, equipment,
+compliance, meetings, surveys, notes) are loaded when an employee is
+accessed and held in a size-bounded LRU cache. Records evicted from the
+cache are dropped if they are unchanged, since they can be read from the
+snapshot again, and kept as compressed blobs only if they were modified,
+so memory tracks changed and active employees rather than headcount or
+everyone ever read. Several stores may be opened on one snapshot: they share its
+columns and summary rows, and each keeps its own changes.
+
+Employees are keyed by an immutable integer id assigned by add(). Email
+and external HR id are unique secondary keys, and names (which may repeat)
+are indexed for lookup; the indexes are maintained from the summary rows
+whenever an employee is stored or touch()ed.
+"""
+import os
+import threading
+from collections import OrderedDict
+from collections.abc import MutableMapping
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+import snapshot
+from onboarding import summarize_employee
+
+DETAIL_CACHE_SIZE = int(os.environ.get('ONBOARDING_DETAIL_CACHE_SIZE', 256))
+
+SUMMARY_COLUMNS = {
+    'id': 'ID',
+    'name': 'Name',
+    'role': 'Role',
+    'department': 'Department',
+    'start_date': 'Start Date',
+    'completion': 'Progress',
+    'email': 'Email',
+}
+
+
+class DuplicateEmployeeError(Exception):
+    """Raised when an email or external HR id already belongs to another employee"""
+
+
+def email_key(email):
+    return (email or '').strip().lower() or None
+
+
+class EmployeeStore(MutableMapping):
+    """Mapping of employee id to record, with detail loaded on demand
+
+    Records returned by store[id] are for reading: an unchanged record may
+    be evicted, or replaced by rebase(), while a caller still holds it, so
+    changes made to it later would be lost. Writers change records inside
+    edit() (or pinned() for several), which re-fetches the live record and
+    keeps it resident until it has been touch()ed.
+    """
+
+    def __init__(self, source=None, cache_size=DETAIL_CACHE_SIZE, allocate_id=None):
+        self.cache_size = cache_size
+        # Optional callable(floor) handing out ids unique across processes, e.g. snapshot.IdAllocator
+        self.allocate_id = allocate_id
+        self._source = source
+        self._summaries = {}
+        self._resident = OrderedDict()
+        self._spilled = {}
+        # Ids whose record no longer matches the source snapshot
+        self._modified = set()
+        # Id -> version when last changed, for changes not yet in a snapshot
+        self._unsaved = {}
+        self._lock = threading.RLock()
+        # Id -> number of pinned() blocks holding the record resident
+        self._pins = {}
+        self._versions = {}
+        self._by_email = {}
+        self._by_external_id = {}
+        self._by_name = {}
+        self._indexed = {}
+        self.next_id = 1
+        self.version = 0
+        self.hits = 0
+        self.misses = 0
+        if source is not None:
+            self._summaries = {row['id']: row for row in source.summaries()}
+            self.next_id = max(source.next_id, max(self._summaries, default=0) + 1)
+            for emp_id, row in self._summaries.items():
+                self._index(emp_id, row)
+
+    @property
+    def source(self):
+        """The snapshot this store was opened on, or None"""
+        return self._source
+
+    # Secondary indexes
+    def _index(self, emp_id, row):
+        self._unindex(emp_id)
+        keys = (row['name'], email_key(row['email']), row.get('external_id'))
+        self._by_name.setdefault(keys[0], set()).add(emp_id)
+        if keys[1]:
+            self._by_email[keys[1]] = emp_id
+        if keys[2]:
+            self._by_external_id[keys[2]] = emp_id
+        self._indexed[emp_id] = keys
+
+    def _unindex(self, emp_id):
+        keys = self._indexed.pop(emp_id, None)
+        if keys is None:
+            return
+        name, email, external_id = keys
+        ids = self._by_name.get(name)
+        if ids is not None:
+            ids.discard(emp_id)
+            if not ids:
+                del self._by_name[name]
+        if self._by_email.get(email) == emp_id:
+            del self._by_email[email]
+        if self._by_external_id.get(external_id) == emp_id:
+            del self._by_external_id[external_id]
+
+    def check_unique(self, emp, emp_id=None):
+        """Raise DuplicateEmployeeError if emp's email or external id belongs to another employee"""
+        other = self._by_email.get(email_key(emp['email']))
+        if other is not None and other != emp_id:
+            raise DuplicateEmployeeError(f"Email '{emp['email']}' is already used by employee #{other}")
+        other = self._by_external_id.get(emp.get('external_id')) if emp.get('external_id') else None
+        if other is not None and other != emp_id:
+            raise DuplicateEmployeeError(f"External id '{emp['external_id']}' is already used by employee #{other}")
+
+    def by_email(self, email):
+        """Id of the employee with this email (case-insensitive), or None"""
+        return self._by_email.get(email_key(email))
+
+    def by_external_id(self, external_id):
+        """Id of the employee linked to this HR system id, or None"""
+        return self._by_external_id.get(external_id)
+
+    def by_name(self, name):
+        """Ids of every employee with this exact name, oldest first"""
+        return sorted(self._by_name.get(name, ()))
+
+    def label(self, emp_id):
+        """Display name, with the email added when another employee shares the name"""
+        row = self._summaries[emp_id]
+        if len(self._by_name.get(row['name'], ())) > 1:
+            return f"{row['name']} ({row['email']})"
+        return row['name']
+
+    # Detail tier
+    def _load(self, emp_id):
+        blob = self._spilled.pop(emp_id, None)
+        if blob is not None:
+            return snapshot.unpack(blob)
+        return self._source.employee(self._source.positions[emp_id])
+
+    def _evict(self):
+        held = []
+        while self._resident and len(self._resident) + len(held) > self.cache_size:
+            emp_id, emp = self._resident.popitem(last=False)
+            if emp_id in self._pins:
+                held.append((emp_id, emp))
+                continue
+            if self.is_modified(emp_id):
+                self._summaries[emp_id] = summarize_employee(emp)
+                self._spilled[emp_id] = snapshot.pack(emp)
+        for emp_id, emp in reversed(held):
+            self._resident[emp_id] = emp
+            self._resident.move_to_end(emp_id, last=False)
+
+    @contextmanager
+    def pinned(self, *ids):
+        """Hold the store's lock and keep the records of `ids` resident for the block
+
+        Records read with store[id] inside the block are the live ones until
+        it ends: none is evicted, and no rebase() can replace them. Writers
+        touch() what they changed before leaving the block.
+        """
+        with self._lock:
+            for emp_id in ids:
+                self._pins[emp_id] = self._pins.get(emp_id, 0) + 1
+            try:
+                yield
+            finally:
+                for emp_id in ids:
+                    self._pins[emp_id] -= 1
+                    if not self._pins[emp_id]:
+                        del self._pins[emp_id]
+                self._evict()
+
+    @contextmanager
+    def edit(self, emp_id):
+        """The live record of an employee, to change in place; touch()ed when the block ends
+
+        Raises KeyError if the employee no longer exists.
+        """
+        with self.pinned(emp_id):
+            emp = self[emp_id]
+            try:
+                yield emp
+            finally:
+                self.touch(emp_id)
+
+    def is_modified(self, emp_id):
+        """Whether a record differs from the source snapshot, or isn't in it"""
+        return emp_id in self._modified or self._source is None or emp_id not in self._source.positions
+
+    def __getitem__(self, emp_id):
+        with self._lock:
+            if emp_id not in self._summaries:
+                raise KeyError(emp_id)
+            emp = self._resident.get(emp_id)
+            if emp is not None:
+                self.hits += 1
+                self._resident.move_to_end(emp_id)
+                return emp
+            self.misses += 1
+            emp = self._resident[emp_id] = self._load(emp_id)
+            self._evict()
+            return emp
+
+    def add(self, emp):
+        """Store a new employee under the next id and return the id"""
+        with self._lock:
+            self.check_unique(emp)
+            emp_id = self.allocate_id(self.next_id) if self.allocate_id else self.next_id
+            self.next_id = emp_id + 1
+            emp['id'] = emp_id
+            self[emp_id] = emp
+            return emp_id
+
+    def __setitem__(self, emp_id, emp):
+        """Replace a record; use add() for new employees so ids are never reused"""
+        with self._lock:
+            self.check_unique(emp, emp_id)
+            emp['id'] = emp_id
+            self.next_id = max(self.next_id, emp_id + 1)
+            self._spilled.pop(emp_id, None)
+            self._summaries[emp_id] = summarize_employee(emp)
+            self._resident[emp_id] = emp
+            self._resident.move_to_end(emp_id)
+            self.touch(emp_id)
+            self._evict()
+
+    def __delitem__(self, emp_id):
+        with self._lock:
+            del self._summaries[emp_id]
+            self.touch(emp_id)
+            self._resident.pop(emp_id, None)
+            self._spilled.pop(emp_id, None)
+            self._modified.discard(emp_id)
+
+    def __contains__(self, emp_id):
+        return emp_id in self._summaries
+
+    def __iter__(self):
+        with self._lock:
+            return iter(list(self._summaries))
+
+    def __len__(self):
+        return len(self._summaries)
+
+    def touch(self, *ids):
+        """Record that employees changed and re-index them; records are mutated in place, so writers call this"""
+        with self._lock:
+            self.version += 1
+            for emp_id in ids:
+                version = self._versions[emp_id] = self._versions.get(emp_id, 0) + 1
+                self._unsaved[emp_id] = version
+                if emp_id in self._summaries:
+                    self._modified.add(emp_id)
+                    self._index(emp_id, self.summary(emp_id))
+                else:
+                    self._unindex(emp_id)
+
+    def employee_version(self, emp_id):
+        """Change counter for one employee, for ETags and cache keys"""
+        return self._versions.get(emp_id, 0)
+
+    # Persistence
+    def unsaved(self):
+        """{id: version} of employees changed or removed since they were last saved"""
+        with self._lock:
+            return dict(self._unsaved)
+
+    def rebase(self, source, changed=None, saved=None):
+        """Switch to a newer snapshot of the same employees and return the ids whose data changed
+
+        `saved` maps ids to the versions this store wrote into `source`;
+        those not touched since are no longer unsaved. `changed` holds the
+        ids other writers changed since the current source, or None if
+        unknown, in which case every employee is reloaded. Employees with
+        unsaved changes here keep them; the rest take the snapshot's data.
+        """
+        with self._lock:
+            for emp_id, version in (saved or {}).items():
+                if self._unsaved.get(emp_id) == version:
+                    del self._unsaved[emp_id]
+                    self._modified.discard(emp_id)
+                    self._spilled.pop(emp_id, None)
+            if changed is None:
+                changed = set(source.ids) | set(self._summaries)
+            changed = [emp_id for emp_id in changed if emp_id not in self._unsaved]
+            if len(changed) > len(source) // 10:
+                rows = {row['id']: row for row in source.summaries()}
+            else:
+                rows = {emp_id: summarize_employee(source.employee(source.positions[emp_id]))
+                        for emp_id in changed if emp_id in source.positions}
+            for emp_id in changed:
+                self._resident.pop(emp_id, None)
+                self._spilled.pop(emp_id, None)
+                self._modified.discard(emp_id)
+                self._versions[emp_id] = self._versions.get(emp_id, 0) + 1
+                if emp_id in rows:
+                    self._summaries[emp_id] = rows[emp_id]
+                    self._index(emp_id, rows[emp_id])
+                else:
+                    self._summaries.pop(emp_id, None)
+                    self._unindex(emp_id)
+            self._source = source
+            self.next_id = max(self.next_id, source.next_id)
+            if changed:
+                self.version += 1
+            return set(changed)
+
+    def peek(self, emp_id):
+        """Read a record without caching it; changes to the result are not kept"""
+        with self._lock:
+            emp = self._resident.get(emp_id)
+            if emp is not None:
+                return emp
+            blob = self._spilled.get(emp_id)
+            if blob is not None:
+                return snapshot.unpack(blob)
+            return self._source.employee(self._source.positions[emp_id])
+
+    def scan(self, ids=None):
+        """(id, record) pairs of every employee, or of `ids`, for read-only passes that bypass the cache"""
+        for emp_id in list(self) if ids is None else ids:
+            try:
+                yield emp_id, self.peek(emp_id)
+            except KeyError:
+                continue    # removed since the pass started
+
+    def snapshot_values(self):
+        return (emp for _, emp in self.scan())
+
+    def source_rows(self, ids):
+        """(indexes into ids, snapshot rows) of the employees still exactly as the
+        source snapshot has them, whose data can be read from its columns"""
+        with self._lock:
+            if self._source is None:
+                return [], []
+            positions = self._source.positions
+            clean = [i for i, emp_id in enumerate(ids) if emp_id in positions and emp_id in self._summaries
+                     and emp_id not in self._modified]
+            return clean, [positions[ids[i]] for i in clean]
+
+    def item_statuses(self, kind, names, ids):
+        """Statuses of the named items of a record kind ('tasks', 'documents', ...)
+        for each id, as an object array (len(ids), len(names))
+
+        Employees untouched since the snapshot are read from its status
+        columns in bulk instead of being loaded; the rest come from their
+        records. Missing items are None.
+        """
+        with self._lock:
+            result = np.full((len(ids), len(names)), None, dtype=object)
+            pending = range(len(ids))
+            clean, rows = self.source_rows(ids)
+            if clean:
+                values, irregular = self._source.item_statuses(kind, rows, names)
+                result[clean] = values
+                read = {i for i, skip in zip(clean, irregular) if not skip}
+                pending = [i for i in pending if i not in read]
+            for i in pending:
+                items = self.peek(ids[i])[kind]
+                if isinstance(items, list):
+                    items = {item['name']: item for item in items}
+                result[i] = [items[name]['status'] if name in items else None for name in names]
+            return result
+
+    # Summary tier
+    def summary(self, emp_id):
+        """Summary row, recomputed if the record is resident and may have changed"""
+        with self._lock:
+            emp = self._resident.get(emp_id)
+            if emp is not None:
+                self._summaries[emp_id] = summarize_employee(emp)
+            return self._summaries[emp_id]
+
+    def summaries(self):
+        """Summary rows for every employee"""
+        with self._lock:
+            return [self.summary(emp_id) for emp_id in list(self._summaries)]
+
+    def summary_frame(self):
+        """Summary rows as a DataFrame for list views"""
+        frame = pd.DataFrame(self.summaries(), columns=list(SUMMARY_COLUMNS))
+        return frame.rename(columns=SUMMARY_COLUMNS)
+
+    def cache_info(self):
+        return {
+            'unsaved': len(self._unsaved),
+            'employees': len(self._summaries),
+            'resident': len(self._resident),
+            'modified': len(self._modified),
+            'compressed': len(self._spilled),
+            'compressed_bytes': sum(len(blob) for blob in self._spilled.values()),
+            'hits': self.hits,
+            'misses': self.misses,
+        }
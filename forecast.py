@@ -0,0 +1,388 @@
+"""At-risk forecasting for active onboardings
+
+For every employee, RiskForecaster projects when each open task and
+compliance training will be finished and how likely each training is to
+miss its due date, so managers can step in before anything is overdue.
+
+Forecasts come from completion history. For every item, a Kaplan-Meier
+survival curve over whole days since start is fitted to the days at which
+employees finished it. The observations are the live employees plus the
+per-item histograms the cold archive keeps for everyone it has moved out
+(archive.EmployeeArchive.item_history), so finished onboardings still count
+after the sweep removes them. Items still open, live or archived, are
+censored at the day they had reached: they say the item took at least that
+long, not that it was done. An open item is projected to finish at the
+median of the curve conditional on still being open at the employee's
+current day. A task also can't finish before its prerequisite, plus the
+usual gap between the two. A training's miss probability is the
+conditional chance of still being open at the due date. It is smoothed
+toward the training's overall late rate, the unconditional chance of
+being open at the planned due day, weighted by how many employees were
+still at risk at that day, so thin histories don't swing it. Items with
+too few completions fall back to the plan, their due dates. Recent survey
+scores below neutral stretch the projected remaining time and raise the
+miss probabilities.
+
+The inputs are a handful of per-employee arrays, read from the snapshot
+columns for employees unchanged since it was written and from records for
+the rest. Forecasts are computed for the whole population at once, item by
+item with NumPy. update() re-reads and re-forecasts only the changed
+employees against the fitted history. refresh() refits the history and
+re-forecasts everyone; it needs no store access, so it is cheap enough to
+run whenever the day changes.
+"""
+import math
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+import catalogs
+from onboarding import DONE_STATUS
+from snapshot import NO_TIME, to_micros
+
+DAY_MICROS = 86_400_000_000
+
+# Completions of an item needed before its own history replaces the plan
+HISTORY_MIN = 5
+# Pseudo-observations of an item's overall late rate blended into each miss probability
+PRIOR_WEIGHT = 3
+# Late rate assumed for a training nobody has finished or missed yet
+DEFAULT_PRIOR = 0.1
+# Projected time for an item past its due date or beyond all history
+STEP_DAYS = 1.0
+# Latest surveys averaged, the avg_score at which they stop mattering, and how much
+# a score of 0 stretches the remaining time (1 = doubles it)
+SURVEY_WINDOW = 3
+SURVEY_NEUTRAL = 7.0
+SURVEY_WEIGHT = 1.0
+# An employee is at risk above this miss probability or this many days behind plan
+RISK_THRESHOLD = 0.5
+LATE_DAYS_THRESHOLD = 1
+
+# Forecast items: tasks in template (topological) order, then trainings
+ITEMS = ([('tasks', name) for name, _, _, _ in catalogs.TASKS] +
+         [('compliance', name) for name, _, _, _ in catalogs.COMPLIANCE])
+_TASK_INDEX = {name: j for j, (_, name) in enumerate(ITEMS[:len(catalogs.TASKS)])}
+PARENTS = np.array([_TASK_INDEX.get(dependency, -1) for _, dependency, _, _ in catalogs.TASKS] +
+                   [-1] * len(catalogs.COMPLIANCE))
+PLAN_DAYS = np.array([due_in for _, _, due_in, _ in catalogs.TASKS] +
+                     [due_in for _, due_in, _, _ in catalogs.COMPLIANCE], dtype=float)
+TRAININGS = np.array([kind == 'compliance' for kind, _ in ITEMS])
+# Keys of ITEMS in archive.EmployeeArchive.item_history()
+ITEM_KEYS = [f'{kind}/{name}' for kind, name in ITEMS]
+
+
+def survey_score(surveys):
+    """Mean avg_score of the latest SURVEY_WINDOW surveys, or NaN without any"""
+    if not surveys:
+        return math.nan
+    latest = sorted(surveys, key=lambda survey: survey['date'])[-SURVEY_WINDOW:]
+    return float(np.mean([survey['avg_score'] for survey in latest]))
+
+
+def _days(micros, start):
+    """Days from start to each time, NaN where there is none"""
+    micros = np.asarray(micros)
+    return np.where(micros == NO_TIME, np.nan, (micros - start[:, None]) / DAY_MICROS)
+
+
+def _snapshot_inputs(source, rows):
+    """Input arrays for regular snapshot rows, read from the columns"""
+    c = source.columns
+    m = source.manifest
+    start = np.asarray(c['employee.start_date'])[rows]
+    n = len(rows)
+    done = np.ones((n, len(ITEMS)), dtype=bool)
+    done_day = np.full((n, len(ITEMS)), np.nan)
+    due_day = np.full((n, len(ITEMS)), np.nan)
+    for key in ('tasks', 'compliance'):
+        columns = {name: j for j, name in enumerate(m['item_names'][key])}
+        status = np.asarray(c[f'{key}.status'])[rows]
+        finished = _days(np.asarray(c[f'{key}.completed'])[rows], start)
+        due = _days(np.asarray(c[f'{key}.due_date'])[rows], start)
+        done_code = m['codes'].index(DONE_STATUS[key]) if DONE_STATUS[key] in m['codes'] else -1
+        for j, (kind, name) in enumerate(ITEMS):
+            if kind != key or name not in columns:
+                continue
+            col = columns[name]
+            done[:, j] = status[:, col] == done_code
+            done_day[:, j] = np.where(done[:, j], finished[:, col], np.nan)
+            due_day[:, j] = due[:, col]
+    survey = np.array([survey_score(source.detail(row).get('surveys')) for row in rows], dtype=float)
+    return start, done, done_day, due_day, survey
+
+
+def _record_inputs(emp):
+    """Input values for one employee record"""
+    start = to_micros(emp['start_date'])
+    items = {'tasks': {task['name']: task for task in emp['tasks']}, 'compliance': emp['compliance']}
+    done = np.ones(len(ITEMS), dtype=bool)
+    done_day = np.full(len(ITEMS), np.nan)
+    due_day = np.full(len(ITEMS), np.nan)
+    for j, (key, name) in enumerate(ITEMS):
+        item = items[key].get(name)
+        if item is None:
+            continue
+        done[j] = item['status'] == DONE_STATUS[key]
+        if done[j] and item.get('completed') is not None:
+            done_day[j] = (to_micros(item['completed']) - start) / DAY_MICROS
+        if item.get('due_date') is not None:
+            due_day[j] = (to_micros(item['due_date']) - start) / DAY_MICROS
+    return start, done, done_day, due_day, survey_score(emp.get('surveys'))
+
+
+def item_observations(emp, at):
+    """(item key, whole days since start, finished) per forecast item of a record: the
+    day an item was finished, or for one still open at `at`, the day it had reached"""
+    start = to_micros(emp['start_date'])
+    reached = max(0, int((to_micros(at) - start) // DAY_MICROS))
+    items = {'tasks': {task['name']: task for task in emp['tasks']}, 'compliance': emp['compliance']}
+    for key, (kind, name) in zip(ITEM_KEYS, ITEMS):
+        item = items[kind].get(name)
+        if item is None:
+            continue
+        if item['status'] != DONE_STATUS[kind]:
+            yield key, reached, False
+        elif item.get('completed') is not None:
+            yield key, max(0, int((to_micros(item['completed']) - start) // DAY_MICROS)), True
+
+
+def survival(finished, censored):
+    """Kaplan-Meier curve from per-day counts of finished and censored observations
+
+    Returns (S, at_risk): S[t] is the chance an item is still open after day t,
+    at_risk[t] the observations still open at the start of day t. Censoring on a
+    day counts after that day's completions.
+    """
+    at_risk = (finished + censored)[::-1].cumsum()[::-1]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        hazard = np.where(at_risk > 0, finished / at_risk, 0.0)
+    return np.cumprod(1 - hazard), at_risk
+
+
+def rank_at_risk(frame, threshold=RISK_THRESHOLD, late_days=LATE_DAYS_THRESHOLD):
+    """Forecast rows likelier than `threshold` to miss a compliance deadline or projected
+    at least `late_days` behind plan, most at risk first"""
+    frame = frame[(frame['miss_probability'] >= threshold) | (frame['days_late'] >= late_days)]
+    return frame.sort_values(['miss_probability', 'days_late', 'overdue'], ascending=False, ignore_index=True)
+
+
+class RiskForecaster:
+    """Projected completion and compliance miss probabilities for every employee of a store"""
+
+    def __init__(self, archived=None):
+        # Callable returning archive.EmployeeArchive.item_history(), read on every refit
+        self.archived = archived
+        self.ids = []
+        self.positions = {}
+        self.start = np.zeros(0, dtype=np.int64)
+        self.done = np.zeros((0, len(ITEMS)), dtype=bool)
+        self.done_day = np.zeros((0, len(ITEMS)))
+        self.due_day = np.zeros((0, len(ITEMS)))
+        self.survey = np.zeros(0)
+        self.active = np.zeros(0, dtype=bool)
+        # Fitted history: per-item survival curves, observations still open at each day, completions
+        self.survival = [np.ones(1)] * len(ITEMS)
+        self.open_counts = [np.zeros(1)] * len(ITEMS)
+        self.completions = np.zeros(len(ITEMS), dtype=np.int64)
+        self.gaps = np.zeros(len(ITEMS))
+        self.priors = np.full(len(ITEMS), DEFAULT_PRIOR)
+        # Forecasts, one row per employee
+        self.projected_day = np.zeros(0)
+        self.miss = np.zeros((0, len(ITEMS)))
+        self.computed_at = None
+
+    @classmethod
+    def build(cls, employees, now=None, archived=None):
+        """Forecasts for every employee of a store, reading unchanged employees from its snapshot
+        columns; `archived` supplies the archive's item histories"""
+        forecaster = cls(archived)
+        ids = list(employees.keys())
+        clean, rows = employees.source_rows(ids)
+        if clean:
+            irregular = np.asarray(employees.source.columns['employee.irregular'])[rows].astype(bool)
+            regular = [i for i, skip in zip(clean, irregular) if not skip]
+            forecaster._append([ids[i] for i in regular],
+                               _snapshot_inputs(employees.source, np.asarray(rows)[~irregular]))
+            clean = regular
+        read = set(clean)
+        dirty = [emp_id for i, emp_id in enumerate(ids) if i not in read]
+        forecaster._append(dirty, [employees.peek(emp_id) for emp_id in dirty])
+        forecaster.refresh(now)
+        return forecaster
+
+    def copy(self):
+        """An independent forecaster with the same inputs, history and forecasts"""
+        other = RiskForecaster()
+        other.__dict__.update({name: value.copy() if isinstance(value, (np.ndarray, list, dict)) else value
+                               for name, value in self.__dict__.items()})
+        return other
+
+    def _append(self, ids, inputs):
+        """Add rows for new ids, from a tuple of snapshot input arrays or a list of records"""
+        if not ids:
+            return
+        if isinstance(inputs, list):
+            inputs = tuple(np.array(values) for values in zip(*(_record_inputs(emp) for emp in inputs)))
+        start, done, done_day, due_day, survey = inputs
+        first = len(self.ids)
+        self.ids.extend(ids)
+        self.positions.update((emp_id, first + i) for i, emp_id in enumerate(ids))
+        self.start = np.concatenate([self.start, start])
+        self.done = np.concatenate([self.done, done])
+        self.done_day = np.concatenate([self.done_day, done_day])
+        self.due_day = np.concatenate([self.due_day, due_day])
+        self.survey = np.concatenate([self.survey, survey])
+        self.active = np.concatenate([self.active, np.ones(len(ids), dtype=bool)])
+        self.projected_day = np.concatenate([self.projected_day, np.full(len(ids), np.nan)])
+        self.miss = np.concatenate([self.miss, np.zeros((len(ids), len(ITEMS)))])
+
+    # Maintenance
+    def update(self, employees, ids, now=None):
+        """Re-read changed, added or removed employees and re-forecast just them"""
+        new = [emp_id for emp_id in dict.fromkeys(ids) if emp_id not in self.positions and emp_id in employees]
+        self._append(new, [employees.peek(emp_id) for emp_id in new])
+        rows = []
+        for emp_id in ids:
+            row = self.positions.get(emp_id)
+            if row is None:
+                continue
+            if emp_id not in employees:
+                self.active[row] = False
+                continue
+            if emp_id not in new:
+                (self.start[row], self.done[row], self.done_day[row],
+                 self.due_day[row], self.survey[row]) = _record_inputs(employees.peek(emp_id))
+            rows.append(row)
+        if rows:
+            self._forecast(np.array(rows), now)
+
+    def refresh(self, now=None):
+        """Refit the history from every active and archived employee and re-forecast them all"""
+        now = now or datetime.now()
+        self._fit(now)
+        self._forecast(np.flatnonzero(self.active), now)
+        self.computed_at = now
+
+    def _elapsed(self, rows, now):
+        return (to_micros(now) - self.start[rows]) / DAY_MICROS
+
+    def _fit(self, now):
+        active = self.active
+        reached = np.floor(np.maximum(self._elapsed(active, now), 0))
+        archived = self.archived() if self.archived is not None else {}
+        medians = np.full(len(ITEMS), np.nan)
+        for j, key in enumerate(ITEM_KEYS):
+            done = self.done[active, j]
+            done_day = self.done_day[active, j]
+            finished_days = np.floor(np.maximum(done_day[done & ~np.isnan(done_day)], 0))
+            days, finished, censored = (np.asarray(values, dtype=np.int64) for values in archived.get(key, ((), (), ())))
+            length = int(max(finished_days.max(initial=0), reached.max(initial=0), days.max(initial=0))) + 1
+            finished_counts = np.bincount(finished_days.astype(np.int64), minlength=length).astype(float)
+            censored_counts = np.bincount(reached[~done].astype(np.int64), minlength=length).astype(float)
+            np.add.at(finished_counts, days, finished)
+            np.add.at(censored_counts, days, censored)
+            curve, open_counts = survival(finished_counts, censored_counts)
+            self.survival[j], self.open_counts[j] = curve, open_counts
+            self.completions[j] = int(finished_counts.sum())
+            median = np.searchsorted(-curve, -0.5)
+            if self.completions[j] >= HISTORY_MIN and median < length:
+                medians[j] = median + 0.5
+            if TRAININGS[j]:
+                # Known only once someone has been observed up to the planned due day
+                covered = length > PLAN_DAYS[j] and open_counts[int(PLAN_DAYS[j])] > 0
+                self.priors[j] = self._survival_from(j, PLAN_DAYS[j:j + 1])[0] if covered else DEFAULT_PRIOR
+        parents = np.maximum(PARENTS, 0)
+        gaps = np.where(np.isnan(medians) | np.isnan(medians[parents]),
+                        PLAN_DAYS - PLAN_DAYS[parents], medians - medians[parents])
+        self.gaps = np.where(PARENTS >= 0, np.maximum(gaps, 0), 0)
+
+    def _survival_from(self, j, days):
+        """Chance of item j still being open at the start of each (fractional) day"""
+        curve = np.concatenate([[1.0], self.survival[j]])
+        return curve[np.clip(np.floor(days).astype(np.int64), 0, len(curve) - 1)]
+
+    def _forecast(self, rows, now=None):
+        """Projected finish day of every open item and miss probability of every open
+        training, for the given rows"""
+        now = now or datetime.now()
+        elapsed = self._elapsed(rows, now)
+        stretch = 1 + SURVEY_WEIGHT * np.clip((SURVEY_NEUTRAL - np.nan_to_num(self.survey[rows], nan=SURVEY_NEUTRAL))
+                                              / SURVEY_NEUTRAL, 0, 1)
+        projected = np.zeros((len(rows), len(ITEMS)))
+        miss = np.zeros((len(rows), len(ITEMS)))
+        for j in range(len(ITEMS)):
+            curve = self.survival[j]
+            open_ = ~self.done[rows, j]
+            due = self.due_day[rows, j]
+            due = np.where(np.isnan(due), PLAN_DAYS[j], due)
+            # Survival so far, conditioned on: open at the start of the current day
+            so_far = self._survival_from(j, elapsed)
+            if self.completions[j] >= HISTORY_MIN:
+                median = np.searchsorted(-curve, -0.5 * so_far)
+                known = (so_far > 0) & (median < len(curve))
+                expected = np.where(known, np.maximum(median + 0.5, elapsed), elapsed + STEP_DAYS)
+            else:
+                expected = np.where(due > elapsed, due, elapsed + STEP_DAYS)
+            finish = elapsed + (expected - elapsed) * stretch
+            parent = PARENTS[j]
+            if parent >= 0:
+                finish = np.maximum(finish, projected[:, parent] + self.gaps[j])
+            projected[:, j] = np.where(open_, finish, np.nan_to_num(self.done_day[rows, j], nan=0.0))
+
+            if TRAININGS[j]:
+                # Employees still open at this day in the history, the weight of its own estimate
+                at_risk = self.open_counts[j][np.clip(np.floor(elapsed).astype(np.int64), 0, len(curve) - 1)]
+                with np.errstate(divide='ignore', invalid='ignore'):
+                    late = np.where(so_far > 0, self._survival_from(j, due) / so_far, 1.0)
+                p = (late * at_risk + PRIOR_WEIGHT * self.priors[j]) / (at_risk + PRIOR_WEIGHT)
+                p = 1 - (1 - np.clip(p, 0, 1)) ** stretch
+                miss[:, j] = np.where(~open_, 0.0, np.where(elapsed > due, 1.0, p))
+
+        open_items = ~self.done[rows]
+        self.projected_day[rows] = np.where(open_items.any(axis=1),
+                                            np.where(open_items, projected, -np.inf).max(axis=1), np.nan)
+        self.miss[rows] = miss
+
+    # Queries
+    def frame(self, now=None):
+        """One row per active employee with open items: id, projected completion,
+        days behind plan, miss probability, expected misses, overdue items and the
+        training most at risk that isn't overdue yet"""
+        now = now or datetime.now()
+        rows = np.flatnonzero(self.active & ~self.done.all(axis=1))
+        elapsed = self._elapsed(rows, now)
+        miss = self.miss[rows]
+        due = self.due_day[rows]
+        open_ = ~self.done[rows]
+        overdue = open_ & (elapsed[:, None] > due)
+        upcoming = np.where(TRAININGS & open_ & ~overdue, miss, -1)
+        riskiest = upcoming.argmax(axis=1) if len(rows) else np.zeros(0, dtype=int)
+        has_riskiest = upcoming.max(axis=1, initial=-1) >= 0
+        plan = np.nanmax(np.where(np.isnan(due), PLAN_DAYS, due), axis=1, initial=0)
+        start = self.start[rows].view('datetime64[us]')
+        projected = start + (self.projected_day[rows] * DAY_MICROS).astype(np.int64).view('timedelta64[us]')
+        riskiest_due = start + (np.nan_to_num(due[np.arange(len(rows)), riskiest]) * DAY_MICROS).astype(np.int64) \
+            .view('timedelta64[us]')
+        return pd.DataFrame({
+            'id': [self.ids[row] for row in rows],
+            'projected_completion': projected.astype('datetime64[D]').astype('datetime64[ns]'),
+            'days_late': np.ceil(self.projected_day[rows] - plan).astype(int),
+            'miss_probability': 1 - np.prod(1 - miss, axis=1),
+            'expected_misses': miss.sum(axis=1),
+            'overdue': overdue.sum(axis=1),
+            'next_at_risk': [ITEMS[j][1] if ok else None for j, ok in zip(riskiest, has_riskiest)],
+            'next_at_risk_due': np.where(has_riskiest, riskiest_due, np.datetime64('NaT'))
+                .astype('datetime64[D]').astype('datetime64[ns]'),
+            'next_at_risk_probability': np.where(has_riskiest, upcoming.max(axis=1, initial=0), np.nan),
+            'survey_score': self.survey[rows],
+        })
+
+    def at_risk(self, now=None, threshold=RISK_THRESHOLD, late_days=LATE_DAYS_THRESHOLD):
+        """The ranked at-risk rows of frame()"""
+        return rank_at_risk(self.frame(now), threshold, late_days)
+
+    def history_size(self):
+        """Completions the fitted history was drawn from, live and archived"""
+        return int(self.completions.sum())
@@ -0,0 +1,238 @@
+"""iCalendar (.ics) feeds of onboarding meetings and deadlines
+
+One feed per employee and one per department, for calendar apps to
+subscribe to. A feed holds the employee's scheduled meetings plus an
+all-day event on the due date of every task and compliance training not
+yet completed.
+
+serialize() streams a feed one component at a time: lines are escaped,
+folded at 75 octets and CRLF-terminated as RFC 5545 requires, and nothing
+but the current event is held in memory. A FeedCache keeps the serialized
+bytes of recently requested feeds, tagged with the version counters they
+were built from: an employee feed is current while that employee's
+version is, a department feed while its membership and each member's
+version are. Subscribers polling every few minutes are then answered from
+the cache, or with 304 Not Modified, until something changes.
+"""
+import hashlib
+import os
+import re
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+
+PRODID = '-//Onboarding Assistant//Onboarding Calendar//EN'
+UID_DOMAIN = os.environ.get('ONBOARDING_CALENDAR_DOMAIN', 'onboarding.local')
+FEED_CACHE_SIZE = int(os.environ.get('ONBOARDING_FEED_CACHE_SIZE', 1024))
+MAX_LINE_OCTETS = 75
+
+
+def escape(text):
+    """TEXT value escaping: backslash, semicolon, comma and newlines"""
+    return (str(text).replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,')
+            .replace('\r\n', '\\n').replace('\n', '\\n'))
+
+
+def fold(line):
+    """A content line as CRLF-terminated bytes, folded so no line exceeds 75 octets
+    and no UTF-8 character is split"""
+    data = line.encode()
+    if len(data) <= MAX_LINE_OCTETS:
+        return data + b'\r\n'
+    parts = []
+    limit = MAX_LINE_OCTETS
+    while len(data) > limit:
+        cut = limit
+        while cut and (data[cut] & 0xC0) == 0x80:
+            cut -= 1
+        parts.append(data[:cut])
+        data = data[cut:]
+        limit = MAX_LINE_OCTETS - 1   # continuation lines start with a space
+    parts.append(data)
+    return b'\r\n '.join(parts) + b'\r\n'
+
+
+def format_datetime(value):
+    """Floating local time; the app stores naive datetimes in the office's time zone"""
+    return value.strftime('%Y%m%dT%H%M%S')
+
+
+def format_date(value):
+    return value.strftime('%Y%m%d')
+
+
+def duration_minutes(duration):
+    """Minutes in a catalogs.MEETING_DURATIONS label such as '45 min' or '1.5 hours'"""
+    match = re.match(r'\s*([\d.]+)\s*(min|hour)', duration or '')
+    if not match:
+        return 60
+    amount = float(match.group(1))
+    return int(amount * 60) if match.group(2) == 'hour' else int(amount)
+
+
+def _slug(text):
+    return re.sub(r'[^a-z0-9]+', '-', text.lower()).strip('-')
+
+
+def employee_events(emp_id, emp):
+    """Event dicts for one employee record: meetings, then open task and training deadlines"""
+    name = emp['name']
+    for meeting in emp['meetings']:
+        start = meeting['datetime']
+        created = meeting.get('created_at') or start
+        yield {
+            'uid': f"{emp_id}-meeting-{created.strftime('%Y%m%dT%H%M%S%f')}@{UID_DOMAIN}",
+            'summary': f"{meeting['department']} · {name}",
+            'start': format_datetime(start),
+            'end': format_datetime(start + timedelta(minutes=duration_minutes(meeting['duration']))),
+            'location': meeting.get('location'),
+            'description': meeting.get('notes'),
+            'attendees': [a.strip() for a in (meeting.get('attendees') or '').split(',') if a.strip()],
+            'categories': 'Meeting',
+            'status': 'CONFIRMED',
+        }
+    for task in emp['tasks']:
+        if task['status'] != 'Completed':
+            yield _deadline(emp_id, 'task', task['name'], f"Task due: {task['name']} · {name}",
+                            task['due_date'], task['category'], f"Status: {task['status']}")
+    for training_name, training in emp['compliance'].items():
+        if training['status'] != 'Completed':
+            yield _deadline(emp_id, 'training', training_name, f"Training due: {training_name} · {name}",
+                            training['due_date'], 'Compliance',
+                            f"Status: {training['status']}\nDuration: {training['duration']}\n"
+                            f"Priority: {training['priority']}")
+
+
+def _deadline(emp_id, kind, item_name, summary, due_date, category, description):
+    return {
+        'uid': f"{emp_id}-{kind}-{_slug(item_name)}@{UID_DOMAIN}",
+        'summary': summary,
+        'date': format_date(due_date),
+        'end_date': format_date(due_date + timedelta(days=1)),
+        'description': description,
+        'categories': category,
+        'transparent': True,
+    }
+
+
+def serialize(name, events, stamp=None):
+    """Bytes of an iCalendar feed, one chunk per component"""
+    stamp = (stamp or datetime.now(timezone.utc)).strftime('%Y%m%dT%H%M%SZ')
+    yield b''.join(fold(line) for line in (
+        'BEGIN:VCALENDAR', 'VERSION:2.0', f'PRODID:{PRODID}', 'CALSCALE:GREGORIAN', 'METHOD:PUBLISH',
+        f'X-WR-CALNAME:{escape(name)}', 'REFRESH-INTERVAL;VALUE=DURATION:PT15M',
+    ))
+    for event in events:
+        yield b''.join(fold(line) for line in _event_lines(event, stamp))
+    yield fold('END:VCALENDAR')
+
+
+def _event_lines(event, stamp):
+    yield 'BEGIN:VEVENT'
+    yield f"UID:{event['uid']}"
+    yield f'DTSTAMP:{stamp}'
+    if 'date' in event:
+        yield f"DTSTART;VALUE=DATE:{event['date']}"
+        yield f"DTEND;VALUE=DATE:{event['end_date']}"
+    else:
+        yield f"DTSTART:{event['start']}"
+        yield f"DTEND:{event['end']}"
+    yield f"SUMMARY:{escape(event['summary'])}"
+    if event.get('location'):
+        yield f"LOCATION:{escape(event['location'])}"
+    if event.get('description'):
+        yield f"DESCRIPTION:{escape(event['description'])}"
+    if event.get('categories'):
+        yield f"CATEGORIES:{escape(event['categories'])}"
+    if event.get('status'):
+        yield f"STATUS:{event['status']}"
+    for attendee in event.get('attendees', ()):
+        yield f'ATTENDEE;ROLE=REQ-PARTICIPANT:mailto:{attendee}'
+    if event.get('transparent'):
+        yield 'TRANSP:TRANSPARENT'
+    yield 'END:VEVENT'
+
+
+class FeedCache:
+    """Serialized calendar feeds of one EmployeeStore, reused while their version tag holds
+
+    Feeds are returned as (tag, chunks). On a miss the chunks are a
+    generator that serializes as it is consumed and caches the whole feed
+    once it has been read to the end.
+    """
+
+    def __init__(self, store, size=FEED_CACHE_SIZE):
+        self.store = store
+        self.size = size
+        self.hits = 0
+        self.misses = 0
+        self._feeds = OrderedDict()
+        self._departments = (None, {})
+        self._lock = threading.Lock()
+
+    # Version tags
+    def employee_tag(self, emp_id):
+        return f"e{emp_id}-{self.store.employee_version(emp_id)}"
+
+    def department_members(self, department):
+        """Ids in a department, regrouped only after the store changes"""
+        version, members = self._departments
+        if version != self.store.version:
+            members = {}
+            for summary in self.store.summaries():
+                members.setdefault(summary['department'], []).append(summary['id'])
+            self._departments = (self.store.version, members)
+        return members.get(department, [])
+
+    def department_tag(self, department):
+        versions = [(emp_id, self.store.employee_version(emp_id)) for emp_id in self.department_members(department)]
+        return f"d{hashlib.blake2b(repr(versions).encode(), digest_size=8).hexdigest()}"
+
+    # Feeds
+    def employee_feed(self, emp_id):
+        """(tag, chunks) of one employee's feed; raises KeyError for unknown ids"""
+        if emp_id not in self.store:
+            raise KeyError(emp_id)
+        tag = self.employee_tag(emp_id)
+
+        def build():
+            emp = self.store.peek(emp_id)
+            return f"Onboarding · {emp['name']}", employee_events(emp_id, emp)
+        return tag, self._feed(('employee', emp_id), tag, build)
+
+    def department_feed(self, department):
+        """(tag, chunks) of the feed covering everyone in a department"""
+        tag = self.department_tag(department)
+
+        def build():
+            ids = list(self.department_members(department))
+            events = (event for emp_id in ids if emp_id in self.store
+                      for event in employee_events(emp_id, self.store.peek(emp_id)))
+            return f"Onboarding · {department}", events
+        return tag, self._feed(('department', department), tag, build)
+
+    def _feed(self, key, tag, build):
+        with self._lock:
+            cached = self._feeds.get(key)
+            if cached is not None and cached[0] == tag:
+                self._feeds.move_to_end(key)
+                self.hits += 1
+                return [cached[1]]
+            self.misses += 1
+        return self._stream(key, tag, build)
+
+    def _stream(self, key, tag, build):
+        parts = []
+        for chunk in serialize(*build()):
+            parts.append(chunk)
+            yield chunk
+        with self._lock:
+            self._feeds[key] = (tag, b''.join(parts))
+            self._feeds.move_to_end(key)
+            while len(self._feeds) > self.size:
+                self._feeds.popitem(last=False)
+
+    def cache_info(self):
+        with self._lock:
+            return {'feeds': len(self._feeds), 'bytes': sum(len(body) for _, body in self._feeds.values()),
+                    'hits': self.hits, 'misses': self.misses}
@@ -0,0 +1,242 @@
+"""Background jobs for heavy org-wide reports
+
+CPU-bound reports run as map/reduce jobs: a coordinator thread describes
+the input as chunks, each chunk is mapped in a process pool and the
+partial results are reduced in the coordinator, which also tracks progress
+and cancellation. I/O
+jobs (exports) run in a thread pool and report progress through a callback.
+
+Finished results are cached by a fingerprint of the job name and its
+inputs, so rerunning a report over unchanged data returns immediately, and
+identical jobs already in flight are shared. Each owner may only have a
+limited number of jobs queued or running at once.
+"""
+import hashlib
+import itertools
+import multiprocessing
+import pickle
+import threading
+from collections import OrderedDict
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from datetime import datetime
+
+PROCESS_WORKERS = 2
+THREAD_WORKERS = 4
+PER_OWNER_LIMIT = 2
+RESULT_CACHE_SIZE = 32
+HISTORY_SIZE = 50
+CHUNK_SIZE = 500
+
+ACTIVE_STATUSES = ('Queued', 'Running')
+
+
+class JobLimitExceeded(Exception):
+    """Raised when an owner already has the maximum number of active jobs"""
+
+
+class JobCancelled(Exception):
+    """Raised inside an I/O job's progress callback once the job is cancelled"""
+
+
+def fingerprint(name, inputs):
+    """Stable hash of a job name and its (picklable) inputs"""
+    digest = hashlib.sha256(name.encode())
+    digest.update(pickle.dumps(inputs, protocol=pickle.HIGHEST_PROTOCOL))
+    return digest.hexdigest()
+
+
+def chunked(items, size=CHUNK_SIZE):
+    iterator = iter(items)
+    while chunk := list(itertools.islice(iterator, size)):
+        yield chunk
+
+
+class Job:
+    """State of one submitted job, polled by the UI"""
+
+    _ids = itertools.count(1)
+
+    def __init__(self, owner, name):
+        self.id = next(self._ids)
+        self.owner = owner
+        self.name = name
+        self.status = 'Queued'
+        self.progress = 0.0
+        self.result = None
+        self.error = None
+        self.fingerprint = None
+        self.cached = False
+        self.submitted_at = datetime.now()
+        self.finished_at = None
+        self._cancel = threading.Event()
+
+    @property
+    def active(self):
+        return self.status in ACTIVE_STATUSES
+
+    @property
+    def cancel_requested(self):
+        return self._cancel.is_set()
+
+    def _finish(self, status, result=None, error=None):
+        self.status = status
+        self.result = result
+        self.error = error
+        if status == 'Done':
+            self.progress = 1.0
+        self.finished_at = datetime.now()
+
+
+class JobManager:
+    """Process pool for CPU work, thread pool for I/O, with caching and per-owner limits"""
+
+    def __init__(self, process_workers=PROCESS_WORKERS, thread_workers=THREAD_WORKERS,
+                 per_owner_limit=PER_OWNER_LIMIT):
+        self.per_owner_limit = per_owner_limit
+        # spawn: forking a multithreaded server process is unsafe
+        self._processes = ProcessPoolExecutor(process_workers, mp_context=multiprocessing.get_context('spawn'))
+        self._threads = ThreadPoolExecutor(thread_workers, thread_name_prefix='job-io')
+        self._coordinators = ThreadPoolExecutor(thread_workers, thread_name_prefix='job-coordinator')
+        self._jobs = OrderedDict()         # id -> Job
+        self._results = OrderedDict()      # fingerprint -> finished Job
+        self._in_flight = {}               # fingerprint -> active Job
+        self._lock = threading.Lock()
+
+    def _register(self, owner, name):
+        with self._lock:
+            active = sum(1 for job in self._jobs.values() if job.owner == owner and job.active)
+            if active >= self.per_owner_limit:
+                raise JobLimitExceeded(
+                    f"{owner} already has {active} report(s) running; wait or cancel one first")
+            job = Job(owner, name)
+            self._jobs[job.id] = job
+            while len(self._jobs) > HISTORY_SIZE:
+                oldest = next(iter(self._jobs.values()))
+                if oldest.active:
+                    break
+                self._jobs.popitem(last=False)
+            return job
+
+    def _claim_fingerprint(self, job, key):
+        """Finish `job` from the cache or attach it to an identical running job; True if handled"""
+        with self._lock:
+            job.fingerprint = key
+            cached = self._results.get(key)
+            if cached is not None:
+                self._results.move_to_end(key)
+                job.cached = True
+                job._finish('Done', cached.result)
+                return True
+            if key in self._in_flight:
+                twin = self._in_flight[key]
+                job.status = 'Running'
+                self._coordinators.submit(self._follow, job, twin)
+                return True
+            self._in_flight[key] = job
+            return False
+
+    def _store(self, job):
+        with self._lock:
+            # Jobs answered from the cache or by a twin don't own their fingerprint
+            if job.fingerprint is None or self._in_flight.get(job.fingerprint) is not job:
+                return
+            del self._in_flight[job.fingerprint]
+            if job.status == 'Done':
+                self._results[job.fingerprint] = job
+                while len(self._results) > RESULT_CACHE_SIZE:
+                    self._results.popitem(last=False)
+
+    def _follow(self, job, twin):
+        """Mirror another job computing the same fingerprint"""
+        while twin.active and not job.cancel_requested:
+            job.progress = twin.progress
+            twin._cancel.wait(0.2)
+        if job.cancel_requested:
+            job._finish('Cancelled')
+        else:
+            job.cached = True
+            job._finish(twin.status, twin.result, twin.error)
+
+    def submit_map_reduce(self, owner, name, load_chunks, map_func, reduce_func, release=None):
+        """Run map_func over each chunk of load_chunks() in the process pool and reduce the partials
+
+        load_chunks runs in a coordinator thread, off the script thread, and
+        returns picklable chunk descriptions, which also key the result cache;
+        keep them small and let map_func read the data they point to. map_func
+        and reduce_func must be module-level functions so they can be pickled.
+        release(chunks), if given, is called once the job has ended however it
+        ended, e.g. to let go of what the chunks point to.
+        """
+        job = self._register(owner, name)
+        self._coordinators.submit(self._run_map_reduce, job, load_chunks, map_func, reduce_func, release)
+        return job
+
+    def _run_map_reduce(self, job, load_chunks, map_func, reduce_func, release=None):
+        chunks = None
+        try:
+            chunks = list(load_chunks())
+            if self._claim_fingerprint(job, fingerprint(job.name, chunks)):
+                return
+            job.status = 'Running'
+            pending = {self._processes.submit(map_func, chunk) for chunk in chunks}
+            partials = []
+            while pending:
+                if job.cancel_requested:
+                    for future in pending:
+                        future.cancel()
+                    job._finish('Cancelled')
+                    return
+                done, pending = wait(pending, timeout=0.2, return_when=FIRST_COMPLETED)
+                partials.extend(future.result() for future in done)
+                job.progress = len(partials) / len(chunks)
+            job._finish('Done', reduce_func(partials))
+        except Exception as e:
+            job._finish('Failed', error=f"{type(e).__name__}: {e}")
+        finally:
+            if release is not None and chunks is not None:
+                release(chunks)
+            self._store(job)
+
+    def submit_io(self, owner, name, func, *args, key=None):
+        """Run func(report, *args) in the thread pool
+
+        report(fraction) updates the job's progress and raises JobCancelled
+        once cancellation is requested. Pass `key` to cache the result.
+        """
+        job = self._register(owner, name)
+        if key is not None and self._claim_fingerprint(job, fingerprint(name, key)):
+            return job
+        self._threads.submit(self._run_io, job, func, args)
+        return job
+
+    def _run_io(self, job, func, args):
+        def report(fraction):
+            if job.cancel_requested:
+                raise JobCancelled()
+            job.progress = fraction
+
+        job.status = 'Running'
+        try:
+            job._finish('Done', func(report, *args))
+        except JobCancelled:
+            job._finish('Cancelled')
+        except Exception as e:
+            job._finish('Failed', error=f"{type(e).__name__}: {e}")
+        finally:
+            self._store(job)
+
+    def cancel(self, job_id):
+        job = self._jobs.get(job_id)
+        if job is not None and job.active:
+            job._cancel.set()
+
+    def jobs(self, owner=None):
+        """Known jobs, newest first"""
+        with self._lock:
+            jobs = list(self._jobs.values())
+        return [job for job in reversed(jobs) if owner is None or job.owner == owner]
+
+    def shutdown(self):
+        self._coordinators.shutdown(wait=False, cancel_futures=True)
+        self._threads.shutdown(wait=False, cancel_futures=True)
+        self._processes.shutdown(wait=False, cancel_futures=True)
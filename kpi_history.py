@@ -0,0 +1,183 @@
+"""History of the Dashboard's headline KPIs
+
+A KpiRecorder samples the latest materialized DashboardSnapshot every
+SAMPLE_INTERVAL seconds, if it was rebuilt since the last sample, into three fixed-size ring buffers: one value per
+minute for a day, per hour for a month and per day for two years. Each
+tier keeps the last sample of every bucket, so a buffer is just an int64
+array of sample times and a float32 array of values, and the whole
+history stays under a megabyte however long the app runs. It is saved
+to an .npz file after every sample and reloaded on startup.
+
+Deltas against yesterday or last week and Dashboard sparklines are read
+from these arrays; nothing is recomputed from employee data.
+"""
+import os
+import threading
+import time
+
+import numpy as np
+
+KPI_HISTORY_PATH = os.environ.get(
+    'ONBOARDING_KPI_HISTORY',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'kpi_history.npz')
+)
+SAMPLE_INTERVAL = 60
+SPARKLINE_POINTS = 200
+
+# DashboardSnapshot fields recorded, in column order
+KPIS = ('total_employees', 'pending_documents', 'pending_equipment', 'overdue_compliance', 'avg_completion')
+
+# (name, bucket seconds, buckets kept)
+TIERS = (
+    ('minute', 60, 24 * 60),
+    ('hour', 3600, 31 * 24),
+    ('day', 86400, 2 * 366),
+)
+
+
+class RingBuffer:
+    """Last value per time bucket for the most recent `capacity` buckets"""
+
+    def __init__(self, step, capacity, width=len(KPIS)):
+        self.step = step
+        self.capacity = capacity
+        self.times = np.zeros(capacity, dtype=np.int64)
+        self.values = np.zeros((capacity, width), dtype=np.float32)
+        self.count = 0
+        self.head = 0   # slot of the next new bucket
+
+    def add(self, t, values):
+        """Record values at epoch second t, replacing the sample already in t's bucket"""
+        t = int(t)
+        last = (self.head - 1) % self.capacity
+        if self.count and t < self.times[last]:
+            return
+        if self.count and self.times[last] // self.step == t // self.step:
+            self.times[last] = t
+            self.values[last] = values
+            return
+        self.times[self.head] = t
+        self.values[self.head] = values
+        self.head = (self.head + 1) % self.capacity
+        self.count = min(self.count + 1, self.capacity)
+
+    def ordered(self):
+        """(times, values) oldest first"""
+        if self.count < self.capacity:
+            return self.times[:self.count], self.values[:self.count]
+        order = np.r_[self.head:self.capacity, 0:self.head]
+        return self.times[order], self.values[order]
+
+    def covers(self, t):
+        return self.count > 0 and self.ordered()[0][0] <= t
+
+    def at(self, t):
+        """Values of the last sample taken at or before t, or None"""
+        times, values = self.ordered()
+        i = np.searchsorted(times, t, side='right') - 1
+        return values[i] if i >= 0 else None
+
+    def state(self):
+        return {'times': self.times, 'values': self.values, 'meta': np.array([self.count, self.head])}
+
+    def load(self, times, values, meta):
+        if times.shape != self.times.shape or values.shape != self.values.shape:
+            return
+        self.times[:], self.values[:] = times, values
+        self.count, self.head = (int(v) for v in meta)
+
+
+class KpiRecorder:
+    """Samples the process's shared Dashboard into the tiers"""
+
+    def __init__(self, path=KPI_HISTORY_PATH, interval=SAMPLE_INTERVAL, start=True):
+        self.path = path
+        self.interval = interval
+        self.tiers = {name: RingBuffer(step, capacity) for name, step, capacity in TIERS}
+        self.last_error = None
+        self._lock = threading.Lock()
+        self.view = None
+        self.last_sampled = None    # computed_at of the last snapshot recorded
+        self._load()
+        if start:
+            threading.Thread(target=self._run, name='kpi-recorder', daemon=True).start()
+
+    def watch(self, view):
+        """Sample this MaterializedDashboard, the one every session shares"""
+        self.view = view
+
+    def _latest(self):
+        return self.view.snapshot if self.view is not None else None
+
+    def record(self, snapshot, now=None):
+        """Add one sample of a DashboardSnapshot to every tier"""
+        now = time.time() if now is None else now
+        values = np.array([getattr(snapshot, kpi) for kpi in KPIS], dtype=np.float32)
+        with self._lock:
+            for tier in self.tiers.values():
+                tier.add(now, values)
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            snapshot = self._latest()
+            # A snapshot only stands for the time it was computed at; don't repeat it
+            if snapshot is None or snapshot.computed_at == self.last_sampled:
+                continue
+            self.last_sampled = snapshot.computed_at
+            try:
+                self.record(snapshot, snapshot.computed_at.timestamp())
+                self.save()
+                self.last_error = None
+            except OSError as e:
+                self.last_error = e
+
+    # Persistence
+    def save(self):
+        arrays = {}
+        with self._lock:
+            for name, tier in self.tiers.items():
+                arrays.update({f'{name}.{key}': value.copy() for key, value in tier.state().items()})
+        tmp = f"{self.path}.tmp.npz"
+        np.savez(tmp, **arrays)
+        os.replace(tmp, self.path)
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with np.load(self.path) as saved:
+                for name, tier in self.tiers.items():
+                    tier.load(saved[f'{name}.times'], saved[f'{name}.values'], saved[f'{name}.meta'])
+        except (OSError, ValueError, KeyError) as e:
+            self.last_error = e
+
+    # Queries
+    def value_at(self, kpi, t):
+        """A KPI's value at epoch second t from the finest tier reaching back that far, or None"""
+        column = KPIS.index(kpi)
+        with self._lock:
+            for tier in self.tiers.values():
+                if tier.covers(t):
+                    values = tier.at(t)
+                    return None if values is None else float(values[column])
+        return None
+
+    def delta(self, kpi, current, seconds_ago, now=None):
+        """current minus the KPI's value `seconds_ago` seconds back, or None without history"""
+        now = time.time() if now is None else now
+        past = self.value_at(kpi, now - seconds_ago)
+        return None if past is None else current - past
+
+    def series(self, kpi, seconds, now=None, max_points=None):
+        """The KPI over the last `seconds`, oldest first, from the finest tier that
+        covers them in at most `max_points` samples"""
+        now = time.time() if now is None else now
+        column = KPIS.index(kpi)
+        with self._lock:
+            for name, step, capacity in TIERS:
+                if step * capacity >= seconds and (max_points is None or seconds / step <= max_points):
+                    break
+            times, values = self.tiers[name].ordered()
+            keep = times >= now - seconds
+            return times[keep].copy(), values[keep, column].copy()
@@ -0,0 +1,401 @@
+"""Outbound notifications: durable outbox, digests, dedupe and rate limits
+
+Messages are written to a SQLite outbox and delivered by an asyncio worker
+running in its own thread. The worker waits COALESCE_SECONDS after a
+recipient's oldest pending message so reminders arriving together go out
+as one digest, re-enqueueing the same dedupe key within DEDUPE_WINDOW is a
+no-op, and per-recipient and global token buckets cap the send rate;
+messages held back by a limit simply stay pending. A recipient's bucket is
+dropped once it has refilled, since a new one would be the same. Delivery is at least
+once: a crash between sending and marking a digest sent resends it.
+
+A ReminderScanner queues every employee's due compliance reminders every
+REMINDER_SCAN_SECONDS from a thread of its own, so reminders go out whether
+or not anyone opens the Compliance page; the dedupe keys keep repeats out.
+"""
+import asyncio
+import os
+import smtplib
+import sqlite3
+import threading
+import time
+from collections import deque
+from datetime import datetime, timedelta
+from email.message import EmailMessage
+
+import numpy as np
+
+import snapshot
+from onboarding import DONE_STATUS, get_compliance_reminders
+
+OUTBOX_PATH = os.environ.get(
+    'ONBOARDING_OUTBOX',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'outbox.sqlite3')
+)
+DEDUPE_WINDOW = timedelta(hours=24)
+COALESCE_SECONDS = 10
+POLL_SECONDS = 1.0
+MAX_ATTEMPTS = 5
+RETRY_BACKOFF_SECONDS = 30
+DELIVERY_CONCURRENCY = 8
+REMINDER_SCAN_SECONDS = float(os.environ.get('ONBOARDING_REMINDER_SCAN', 3600))
+REMINDER_DAYS_AHEAD = 7
+
+# Token buckets: (messages per second, burst)
+RECIPIENT_RATE = (3 / 3600, 3)
+GLOBAL_RATE = (10, 20)
+
+
+class TokenBucket:
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def available(self, now=None):
+        """Refill, then report whether a token is available without taking it"""
+        now = time.monotonic() if now is None else now
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        return self.tokens >= 1
+
+    def try_acquire(self, now=None):
+        if self.available(now):
+            self.tokens -= 1
+            return True
+        return False
+
+    def idle(self, now=None):
+        """Whether the bucket has refilled completely, so a new one would behave the same"""
+        self.available(now)
+        return self.tokens >= self.burst
+
+
+class Outbox:
+    """SQLite-backed queue of outbound messages"""
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS outbox (
+            id INTEGER PRIMARY KEY,
+            recipient TEXT NOT NULL,
+            subject TEXT NOT NULL,
+            body TEXT NOT NULL,
+            dedupe_key TEXT,
+            created_at REAL NOT NULL,
+            status TEXT NOT NULL DEFAULT 'Pending',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            next_attempt_at REAL NOT NULL DEFAULT 0,
+            sent_at REAL,
+            error TEXT
+        );
+        CREATE INDEX IF NOT EXISTS outbox_pending ON outbox (status, recipient);
+        CREATE INDEX IF NOT EXISTS outbox_dedupe ON outbox (recipient, dedupe_key, created_at);
+    """
+
+    def __init__(self, path=OUTBOX_PATH):
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.executescript(self.SCHEMA)
+        self._lock = threading.Lock()
+
+    def enqueue(self, recipient, subject, body, dedupe_key=None, window=DEDUPE_WINDOW, now=None):
+        """Queue a message; returns its id, or None if a duplicate was queued within the window"""
+        now = now or time.time()
+        with self._lock:
+            if dedupe_key is not None:
+                duplicate = self._conn.execute(
+                    "SELECT 1 FROM outbox WHERE recipient = ? AND dedupe_key = ? AND created_at > ? LIMIT 1",
+                    (recipient, dedupe_key, now - window.total_seconds())).fetchone()
+                if duplicate:
+                    return None
+            cursor = self._conn.execute(
+                "INSERT INTO outbox (recipient, subject, body, dedupe_key, created_at) VALUES (?, ?, ?, ?, ?)",
+                (recipient, subject, body, dedupe_key, now))
+            return cursor.lastrowid
+
+    def ready_batches(self, coalesce_seconds=COALESCE_SECONDS, now=None):
+        """Pending messages grouped by recipient, for recipients whose oldest message has waited long enough"""
+        now = now or time.time()
+        with self._lock:
+            rows = self._conn.execute(
+                """SELECT id, recipient, subject, body, created_at FROM outbox
+                   WHERE status = 'Pending' AND next_attempt_at <= ?
+                     AND recipient IN (SELECT recipient FROM outbox WHERE status = 'Pending'
+                                       GROUP BY recipient HAVING MIN(created_at) <= ?)
+                   ORDER BY created_at, id""",
+                (now, now - coalesce_seconds)).fetchall()
+        batches = {}
+        for row in rows:
+            batches.setdefault(row[1], []).append(row)
+        return batches
+
+    def mark_sent(self, ids, now=None):
+        now = now or time.time()
+        with self._lock:
+            self._conn.executemany("UPDATE outbox SET status = 'Sent', sent_at = ?, error = NULL WHERE id = ?",
+                                   [(now, i) for i in ids])
+
+    def mark_failed(self, ids, error, now=None):
+        """Back off and retry; give up after MAX_ATTEMPTS"""
+        now = now or time.time()
+        with self._lock:
+            for i in ids:
+                self._conn.execute(
+                    """UPDATE outbox SET attempts = attempts + 1, error = ?,
+                           next_attempt_at = ? + ? * (1 << attempts),
+                           status = CASE WHEN attempts + 1 >= ? THEN 'Failed' ELSE 'Pending' END
+                       WHERE id = ?""",
+                    (error, now, RETRY_BACKOFF_SECONDS, MAX_ATTEMPTS, i))
+
+    def counts(self):
+        with self._lock:
+            return dict(self._conn.execute("SELECT status, COUNT(*) FROM outbox GROUP BY status").fetchall())
+
+    def recent(self, limit=50):
+        with self._lock:
+            rows = self._conn.execute(
+                """SELECT recipient, subject, status, attempts, created_at, sent_at, error
+                   FROM outbox ORDER BY id DESC LIMIT ?""", (limit,)).fetchall()
+        return [
+            {'Recipient': r[0], 'Subject': r[1], 'Status': r[2], 'Attempts': r[3],
+             'Queued': datetime.fromtimestamp(r[4]), 'Sent': datetime.fromtimestamp(r[5]) if r[5] else None,
+             'Error': r[6]}
+            for r in rows
+        ]
+
+
+def build_digest(rows):
+    """(subject, body) for one or more pending messages to the same recipient"""
+    if len(rows) == 1:
+        return rows[0][2], rows[0][3]
+    lines = [f"You have {len(rows)} onboarding reminders:", ""]
+    for _, _, subject, body, _ in rows:
+        lines.append(f"• {subject}")
+        lines.extend(f"  {line}" for line in body.splitlines() if line.strip())
+    return f"Onboarding reminders ({len(rows)})", "\n".join(lines)
+
+
+# Transports: anything with `async send(recipient, subject, body)`
+class LogTransport:
+    """Keeps delivered messages in memory; used when no SMTP server is configured"""
+
+    def __init__(self, keep=200):
+        self.sent = deque(maxlen=keep)
+
+    async def send(self, recipient, subject, body):
+        self.sent.append((datetime.now(), recipient, subject, body))
+
+
+class SMTPTransport:
+    def __init__(self, host, port=25, sender='onboarding@localhost', timeout=10):
+        self.host = host
+        self.port = port
+        self.sender = sender
+        self.timeout = timeout
+
+    def _send(self, recipient, subject, body):
+        message = EmailMessage()
+        message['From'] = self.sender
+        message['To'] = recipient
+        message['Subject'] = subject
+        message.set_content(body)
+        with smtplib.SMTP(self.host, self.port, timeout=self.timeout) as smtp:
+            smtp.send_message(message)
+
+    async def send(self, recipient, subject, body):
+        await asyncio.to_thread(self._send, recipient, subject, body)
+
+
+def transport_from_env():
+    host = os.environ.get('ONBOARDING_SMTP_HOST')
+    if not host:
+        return LogTransport()
+    return SMTPTransport(host, int(os.environ.get('ONBOARDING_SMTP_PORT', 25)),
+                         os.environ.get('ONBOARDING_SMTP_FROM', 'onboarding@localhost'))
+
+
+class NotificationService:
+    """Asyncio delivery worker for an Outbox, running on a background thread"""
+
+    def __init__(self, outbox=None, transport=None, recipient_rate=RECIPIENT_RATE, global_rate=GLOBAL_RATE,
+                 coalesce_seconds=COALESCE_SECONDS, poll_seconds=POLL_SECONDS):
+        self.outbox = outbox or Outbox()
+        self.transport = transport or transport_from_env()
+        self.recipient_rate = recipient_rate
+        self.global_limit = TokenBucket(*global_rate)
+        self.coalesce_seconds = coalesce_seconds
+        self.poll_seconds = poll_seconds
+        self._recipient_limits = {}
+        self._held = set()      # outbox ids held back by a rate limit at the last pass
+        self._sent_times = deque(maxlen=10000)
+        self.stats = {'enqueued': 0, 'suppressed': 0, 'digests': 0, 'messages': 0,
+                      'rate_limited': 0, 'failures': 0, 'last_error': None}
+        self._stop = threading.Event()
+        self._thread = None
+
+    def notify(self, recipient, subject, body, dedupe_key=None):
+        """Queue a message for delivery; True if queued, False if suppressed as a duplicate"""
+        if self.outbox.enqueue(recipient, subject, body, dedupe_key) is None:
+            self.stats['suppressed'] += 1
+            return False
+        self.stats['enqueued'] += 1
+        return True
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=lambda: asyncio.run(self._run()),
+                                            name='notification-delivery', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    async def _run(self):
+        semaphore = asyncio.Semaphore(DELIVERY_CONCURRENCY)
+        while not self._stop.is_set():
+            delivered = await self.deliver_ready(semaphore)
+            if not delivered:
+                await asyncio.sleep(self.poll_seconds)
+
+    async def deliver_ready(self, semaphore=None):
+        """Send one digest per ready recipient that the rate limits allow; returns digests sent"""
+        semaphore = semaphore or asyncio.Semaphore(DELIVERY_CONCURRENCY)
+        batches = await asyncio.to_thread(self.outbox.ready_batches, self.coalesce_seconds)
+        deliveries = []
+        held = set()
+        exhausted = False
+        for recipient, rows in batches.items():
+            limit = self._recipient_limits.setdefault(recipient, TokenBucket(*self.recipient_rate))
+            if not exhausted and limit.available():
+                if self.global_limit.try_acquire():
+                    limit.try_acquire()
+                    deliveries.append(self._deliver(semaphore, recipient, rows))
+                    continue
+                exhausted = True
+            held.update(row[0] for row in rows)
+        # Each held message counts once, however many passes it waits
+        self.stats['rate_limited'] += len(held - self._held)
+        self._held = held
+        for recipient, limit in list(self._recipient_limits.items()):
+            if recipient not in batches and limit.idle():
+                del self._recipient_limits[recipient]
+        results = await asyncio.gather(*deliveries)
+        return sum(results)
+
+    async def _deliver(self, semaphore, recipient, rows):
+        subject, body = build_digest(rows)
+        ids = [row[0] for row in rows]
+        async with semaphore:
+            try:
+                await self.transport.send(recipient, subject, body)
+            except Exception as e:
+                self.stats['failures'] += 1
+                self.stats['last_error'] = f"{type(e).__name__}: {e}"
+                await asyncio.to_thread(self.outbox.mark_failed, ids, self.stats['last_error'])
+                return 0
+        await asyncio.to_thread(self.outbox.mark_sent, ids)
+        self.stats['digests'] += 1
+        self.stats['messages'] += len(ids)
+        self._sent_times.append(time.monotonic())
+        return 1
+
+    def throughput(self, seconds=60):
+        """Digests delivered per minute over the last `seconds`"""
+        cutoff = time.monotonic() - seconds
+        return sum(1 for t in self._sent_times if t >= cutoff) * 60 / seconds
+
+    def queue_depth(self):
+        return self.outbox.counts().get('Pending', 0)
+
+
+# Compliance reminders
+def compliance_reminder(emp_data, training_name, training_info, days_left):
+    """(subject, body, dedupe key) of one compliance reminder"""
+    severity = 'overdue' if days_left < 0 else 'urgent' if days_left <= 3 else 'upcoming'
+    if days_left < 0:
+        subject = f"Overdue: {training_name}"
+        body = f"{training_name} was due {abs(days_left)} day(s) ago. Please complete it as soon as possible."
+    else:
+        subject = f"Reminder: {training_name} due in {days_left} day(s)"
+        body = f"{training_name} ({training_info['duration']}) is due on {training_info['due_date'].strftime('%B %d, %Y')}."
+    # One reminder per training and severity a day; escalating severity sends again
+    return subject, body, f"compliance:{emp_data['id']}:{training_name}:{severity}"
+
+
+def queue_compliance_reminders(service, emp_data, reminders):
+    """Queue get_compliance_reminders() results for an employee; returns the trainings newly queued,
+    leaving out those suppressed as duplicates"""
+    queued = []
+    for training_name, training_info, days_left in reminders:
+        subject, body, key = compliance_reminder(emp_data, training_name, training_info, days_left)
+        if service.notify(emp_data['email'], subject, body, dedupe_key=key):
+            queued.append(training_name)
+    return queued
+
+
+class ReminderScanner:
+    """Background thread queueing every employee's due compliance reminders
+
+    Records are read from the latest snapshot, never the live store, so a
+    scan doesn't race the sessions changing records; changes reach the
+    snapshot a few seconds after they are made. Only employees whose
+    compliance columns show an unfinished training due soon are decoded.
+    """
+
+    def __init__(self, service, root=snapshot.SNAPSHOT_DIR, interval=REMINDER_SCAN_SECONDS,
+                 days_ahead=REMINDER_DAYS_AHEAD, start=True):
+        self.service = service
+        self.root = root
+        self.interval = interval
+        self.days_ahead = days_ahead
+        self.last_scan = None
+        self.last_queued = 0
+        self.last_error = None
+        self._lock = threading.Lock()
+        if start:
+            threading.Thread(target=self._run, name='reminder-scanner', daemon=True).start()
+
+    def scan(self, now=None):
+        """Queue due reminders for everyone in the latest snapshot; returns how many were new"""
+        now = now or datetime.now()
+        path = snapshot.latest_snapshot(self.root)
+        if path is None:
+            return 0
+        with self._lock:
+            source = snapshot.Snapshot(path)
+            queued = 0
+            for row in self._candidates(source, now):
+                emp = source.employee(row)
+                reminders = get_compliance_reminders(emp, now, self.days_ahead)
+                queued += len(queue_compliance_reminders(self.service, emp, reminders))
+            self.last_scan = now
+            self.last_queued = queued
+            return queued
+
+    def _candidates(self, source, now):
+        """Snapshot rows that may have a reminder due: an unfinished training due within the window,
+        or an irregular record whose items aren't in the columns"""
+        c = source.columns
+        codes = source.manifest['codes']
+        status = np.asarray(c['compliance.status'])
+        due = np.asarray(c['compliance.due_date'])
+        open_items = status != codes.index(DONE_STATUS['compliance']) if DONE_STATUS['compliance'] in codes \
+            else np.ones(status.shape, dtype=bool)
+        # (due - now).days <= days_ahead whenever due is less than days_ahead + 1 days away
+        horizon = snapshot.to_micros(now + timedelta(days=self.days_ahead + 1))
+        soon = open_items & (due != snapshot.NO_TIME) & (due < horizon)
+        return np.flatnonzero(soon.any(axis=1) | np.asarray(c['employee.irregular'], dtype=bool)).tolist()
+
+    def _run(self):
+        while True:
+            try:
+                self.scan()
+                self.last_error = None
+            except Exception as e:
+                self.last_error = e
+            time.sleep(self.interval)
@@ -0,0 +1,312 @@
+from contextlib import nullcontext
+from datetime import datetime, timedelta
+
+import catalogs
+
+# New employee record built from the shared catalogs; the store assigns 'id' when it is added
+def create_employee(name, email, department, start_date, role, external_id=None):
+    return {
+        'id': None,
+        'external_id': external_id,
+        'name': name,
+        'email': email,
+        'department': department,
+        'role': role,
+        'start_date': start_date,
+        'created_at': datetime.now(),
+        'documents': {
+            doc_name: {'status': 'Pending', 'uploaded': None, 'verified': None, 'verified_by': None, 'file': None, 'priority': priority}
+            for doc_name, priority in catalogs.DOCUMENTS
+        },
+        'tasks': [
+            {'name': task_name, 'status': 'Not Started' if dependency is None else 'Locked', 'dependency': dependency, 'due_date': start_date + timedelta(days=due_in), 'category': category, 'progress': 0, 'started': None, 'completed': None}
+            for task_name, dependency, due_in, category in catalogs.TASKS
+        ],
+        'meetings': [],
+        'equipment': {
+            eq_name: {'status': 'Pending', 'assigned_date': None, 'serial_number': '', 'assigned_by': None}
+            for eq_name in catalogs.EQUIPMENT
+        },
+        'compliance': {
+            training_name: {'status': 'Not Started', 'started': None, 'due_date': start_date + timedelta(days=due_in), 'completed': None, 'duration': duration, 'priority': priority}
+            for training_name, due_in, duration, priority in catalogs.COMPLIANCE
+        },
+        'surveys': [],
+        'notes': []
+    }
+
+def get_completion_percentage(emp_data):
+    """Calculate overall onboarding completion percentage"""
+    total_items = 0
+    completed_items = 0
+    
+    # Documents
+    total_items += len(emp_data['documents'])
+    completed_items += sum(1 for d in emp_data['documents'].values() if d['status'] == 'Verified')
+    
+    # Tasks
+    total_items += len(emp_data['tasks'])
+    completed_items += sum(1 for t in emp_data['tasks'] if t['status'] == 'Completed')
+    
+    # Equipment
+    total_items += len(emp_data['equipment'])
+    completed_items += sum(1 for e in emp_data['equipment'].values() if e['status'] == 'Assigned')
+    
+    # Compliance
+    total_items += len(emp_data['compliance'])
+    completed_items += sum(1 for c in emp_data['compliance'].values() if c['status'] == 'Completed')
+    
+    return int((completed_items / total_items * 100)) if total_items > 0 else 0
+
+
+# Status that marks an item as done, per record key
+DONE_STATUS = {
+    'documents': 'Verified',
+    'tasks': 'Completed',
+    'equipment': 'Assigned',
+    'compliance': 'Completed',
+}
+
+
+def summarize_employee(emp_data):
+    """Compact row for list views: identity, completion and per-kind counts"""
+    summary = {
+        'id': emp_data.get('id'),
+        'external_id': emp_data.get('external_id'),
+        'name': emp_data['name'],
+        'email': emp_data['email'],
+        'role': emp_data['role'],
+        'department': emp_data['department'],
+        'start_date': emp_data['start_date'],
+    }
+    done = 0
+    total = 0
+    for key, done_status in DONE_STATUS.items():
+        items = emp_data[key] if key == 'tasks' else list(emp_data[key].values())
+        summary[f'{key}_done'] = sum(1 for item in items if item['status'] == done_status)
+        summary[f'{key}_total'] = len(items)
+        done += summary[f'{key}_done']
+        total += len(items)
+    summary['completion'] = int((done / total * 100)) if total > 0 else 0
+    summary['pending_documents'] = sum(1 for d in emp_data['documents'].values() if d['status'] in ['Pending', 'Uploaded'])
+    summary['pending_equipment'] = sum(1 for e in emp_data['equipment'].values() if e['status'] == 'Pending')
+    summary['task_status'] = {}
+    for task in emp_data['tasks']:
+        summary['task_status'][task['status']] = summary['task_status'].get(task['status'], 0) + 1
+    summary['open_compliance_due'] = tuple(c['due_date'] for c in emp_data['compliance'].values()
+                                           if c['status'] != 'Completed')
+    return summary
+
+
+def get_compliance_reminders(emp_data, now=None, days_ahead=7):
+    """(training, info, days until due) for unfinished trainings due within `days_ahead` days"""
+    now = now or datetime.now()
+    reminders = []
+    for training_name, training_info in emp_data['compliance'].items():
+        if training_info['status'] != 'Completed':
+            days_until_due = (training_info['due_date'] - now).days
+            if days_until_due <= days_ahead:
+                reminders.append((training_name, training_info, days_until_due))
+    return sorted(reminders, key=lambda x: x[2])
+
+
+def iter_employees(employees):
+    """(id, record) pairs for a read-only pass over every employee
+
+    Stores that load detail on demand provide scan(), which reads records
+    without pulling them into their cache.
+    """
+    scan = getattr(employees, 'scan', None)
+    return scan() if scan is not None else employees.items()
+
+
+# Item kinds and where each lives on an employee record
+ITEM_KINDS = {
+    'Document': 'documents',
+    'Task': 'tasks',
+    'Equipment': 'equipment',
+    'Compliance': 'compliance',
+}
+
+# Allowed transitions: action -> (statuses it may start from, resulting status)
+TRANSITIONS = {
+    'Document': {
+        'verify': ({'Uploaded'}, 'Verified'),
+        'reject': ({'Uploaded'}, 'Rejected'),
+    },
+    'Task': {
+        'start': ({'Not Started'}, 'In Progress'),
+        'complete': ({'Not Started', 'In Progress'}, 'Completed'),
+    },
+    'Equipment': {
+        'assign': ({'Pending'}, 'Assigned'),
+    },
+    'Compliance': {
+        'start': ({'Not Started'}, 'In Progress'),
+        'complete': ({'Not Started', 'In Progress'}, 'Completed'),
+    },
+}
+
+
+class BatchError(Exception):
+    """Raised when a strict batch contains operations that cannot be applied"""
+
+    def __init__(self, errors):
+        super().__init__(f"{len(errors)} operation(s) cannot be applied")
+        self.errors = errors
+
+
+def get_item(emp_data, kind, item_name):
+    """Look up a document, task, equipment item or training by name"""
+    items = emp_data[ITEM_KINDS[kind]]
+    if kind == 'Task':
+        return next((t for t in items if t['name'] == item_name), None)
+    return items.get(item_name)
+
+
+def get_item_names(emp_data, kind):
+    """Names of every item of a kind, in template order"""
+    items = emp_data[ITEM_KINDS[kind]]
+    if kind == 'Task':
+        return [t['name'] for t in items]
+    return list(items.keys())
+
+
+# Extra op fields the transitions understand
+OP_FIELDS = frozenset({'serial_number'})
+
+
+def make_op(employee, kind, item, action, **fields):
+    """Build a transition request for an employee id; extra fields (e.g. serial_number) are applied on assign"""
+    return {'employee': employee, 'kind': kind, 'item': item, 'action': action, 'fields': fields}
+
+
+def plan_batch(employees, ops):
+    """Validate a batch of operations against dependency and lock rules
+
+    Operations are checked in order against a shadow copy of the affected
+    statuses, so a batch may start then complete a task, or complete a task
+    together with the tasks it unlocks. Nothing is modified.
+    Returns (changes, errors) where changes are (op, from_status, to_status)
+    and errors are (op, reason).
+    """
+    shadow = {}
+    changes = []
+    errors = []
+
+    def status_of(emp_id, kind, item_name, item):
+        return shadow.get((emp_id, kind, item_name), item['status'])
+
+    for op in ops:
+        emp_data = employees.get(op['employee'])
+        if emp_data is None:
+            errors.append((op, "Unknown employee"))
+            continue
+        if op['action'] not in TRANSITIONS.get(op['kind'], {}):
+            errors.append((op, f"Cannot {op['action']} a {op['kind'].lower()}"))
+            continue
+        item = get_item(emp_data, op['kind'], op['item'])
+        if item is None:
+            errors.append((op, f"Unknown {op['kind'].lower()}"))
+            continue
+
+        allowed_from, to_status = TRANSITIONS[op['kind']][op['action']]
+        current = status_of(op['employee'], op['kind'], op['item'], item)
+        if current == 'Locked':
+            errors.append((op, f"Locked until '{item['dependency']}' is completed"))
+            continue
+        if current not in allowed_from:
+            errors.append((op, f"Already {current}" if current == to_status else f"Cannot {op['action']} from {current}"))
+            continue
+
+        shadow[(op['employee'], op['kind'], op['item'])] = to_status
+        changes.append((op, current, to_status))
+
+        if op['kind'] == 'Task' and to_status == 'Completed':
+            for task in emp_data['tasks']:
+                key = (op['employee'], 'Task', task['name'])
+                if task['dependency'] == op['item'] and shadow.get(key, task['status']) == 'Locked':
+                    shadow[key] = 'Not Started'
+
+    return changes, errors
+
+
+def apply_batch(employees, changes, actor='Admin', now=None):
+    """Apply planned changes in a single pass
+
+    Each item's status is checked again before it changes: a change whose
+    item is gone, or no longer has the status it was planned from, was
+    overtaken by another writer and is skipped. Every change gets the same
+    timestamp. Task completions unlock their dependents, which are reported
+    as 'unlock' events. On an EmployeeStore the records are changed while
+    pinned, and touched before they can be evicted.
+    Returns (events, errors) where errors are (op, reason).
+    """
+    now = now or datetime.now()
+    if not hasattr(employees, 'pinned'):
+        return _apply_changes(employees, changes, actor, now)
+    with employees.pinned(*{op['employee'] for op, _, _ in changes}):
+        events, errors = _apply_changes(employees, changes, actor, now)
+        if events:
+            employees.touch(*{event['employee'] for event in events})
+    return events, errors
+
+
+def _apply_changes(employees, changes, actor, now):
+    events = []
+    errors = []
+    for op, from_status, to_status in changes:
+        emp_data = employees.get(op['employee'])
+        item = get_item(emp_data, op['kind'], op['item']) if emp_data is not None else None
+        if item is None:
+            errors.append((op, f"{op['kind']} no longer exists"))
+            continue
+        if item['status'] != from_status:
+            errors.append((op, f"Changed to {item['status']} since it was planned"))
+            continue
+        item['status'] = to_status
+
+        if op['kind'] == 'Document':
+            if to_status == 'Verified':
+                item['verified'] = now
+                item['verified_by'] = actor
+        elif op['kind'] == 'Equipment':
+            item['assigned_date'] = now
+            item['assigned_by'] = actor
+            if op['fields'].get('serial_number'):
+                item['serial_number'] = op['fields']['serial_number']
+        elif to_status == 'In Progress':
+            item['started'] = now
+        elif to_status == 'Completed':
+            # Completed straight from 'Not Started': there is no real start time to record
+            item['completed'] = now
+            if op['kind'] == 'Task':
+                item['progress'] = 100
+
+        events.append({'employee': op['employee'], 'kind': op['kind'], 'item': op['item'],
+                       'action': op['action'], 'from': from_status, 'to': to_status, 'at': now})
+
+        if op['kind'] == 'Task' and to_status == 'Completed':
+            for task in emp_data['tasks']:
+                if task['dependency'] == op['item'] and task['status'] == 'Locked':
+                    task['status'] = 'Not Started'
+                    events.append({'employee': op['employee'], 'kind': 'Task', 'item': task['name'],
+                                   'action': 'unlock', 'from': 'Locked', 'to': 'Not Started', 'at': now})
+    return events, errors
+
+
+def run_batch(employees, ops, actor='Admin', strict=False, now=None):
+    """Validate and apply a batch of operations as one transaction
+
+    On an EmployeeStore the store is locked from planning through applying,
+    so no other writer can change the records in between. With strict=True
+    the batch is all-or-nothing and raises BatchError if any operation is
+    invalid; otherwise invalid operations are skipped.
+    Returns (events, errors).
+    """
+    with employees.pinned(*{op['employee'] for op in ops}) if hasattr(employees, 'pinned') else nullcontext():
+        changes, errors = plan_batch(employees, ops)
+        if strict and errors:
+            raise BatchError(errors)
+        events, stale = apply_batch(employees, changes, actor, now)
+    return events, errors + stale
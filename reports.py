@@ -0,0 +1,219 @@
+"""Org-wide reports run by the background job manager
+
+Each map-reduce report has a project step (it slims a full record down to
+what the report needs), a map step run on a chunk of projected records,
+and a reduce step that merges the partial results. Worker processes read
+their own records: report_chunks() hands them ranges of rows of the
+store's source snapshot, and only employees changed since that snapshot
+are projected in the coordinator and sent along. Everything here must stay
+importable without Streamlit, since worker processes import this module on
+their own.
+"""
+import csv
+import os
+import re
+from collections import Counter
+from datetime import datetime
+from functools import lru_cache
+
+from analytics import get_cohort
+from jobs import CHUNK_SIZE, chunked
+from onboarding import DONE_STATUS
+from snapshot import Snapshot, pin_snapshot, unpin_snapshot
+
+EXPORT_DIR = os.environ.get(
+    'ONBOARDING_EXPORT_DIR',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'exports')
+)
+
+SURVEY_TEXT_FIELDS = ['challenges', 'wins', 'suggestions', 'needs']
+STOPWORDS = set("""
+a about all also am an and any are as at be been but by can could did do does for from get got
+had has have how i if in into is it its just like me more most my no not of on or our so some
+such than that the their them then there these they this to too up us very was we were what
+when which who will with would you your
+""".split())
+TOP_TERMS = 30
+
+EXPORT_COLUMNS = ['employee_id', 'employee', 'department', 'start_date', 'kind', 'item', 'status',
+                  'started', 'completed', 'due_date']
+
+
+# Cohort rollup: item completion and overdue counts per department, cohort and kind
+def project_cohort(emp_data):
+    now = datetime.now()
+    row = {'department': emp_data['department'], 'cohort': get_cohort(emp_data['start_date']), 'kinds': {}}
+    for key, done_status in DONE_STATUS.items():
+        items = emp_data[key] if key == 'tasks' else list(emp_data[key].values())
+        row['kinds'][key] = (
+            len(items),
+            sum(1 for item in items if item['status'] == done_status),
+            sum(1 for item in items if item['status'] != done_status
+                and item.get('due_date') is not None and item['due_date'] < now),
+        )
+    return row
+
+
+def map_cohort(rows):
+    totals = {}
+    for row in rows:
+        for key, (items, done, overdue) in row['kinds'].items():
+            group = totals.setdefault((row['department'], row['cohort'], key), [0, 0, 0, 0])
+            group[0] += 1
+            group[1] += items
+            group[2] += done
+            group[3] += overdue
+    return totals
+
+
+def reduce_cohort(partials):
+    totals = {}
+    for partial in partials:
+        for group, counts in partial.items():
+            merged = totals.setdefault(group, [0, 0, 0, 0])
+            for i, value in enumerate(counts):
+                merged[i] += value
+    return [
+        {'Department': department, 'Cohort': cohort, 'Area': key.capitalize(),
+         'Employees': employees, 'Items': items, 'Done': done, 'Overdue': overdue,
+         'Completion %': round(done / items * 100, 1) if items else 0.0}
+        for (department, cohort, key), (employees, items, done, overdue) in sorted(totals.items())
+    ]
+
+
+# Survey themes: most frequent terms in free-text survey answers, by sentiment
+def project_surveys(emp_data):
+    return [(survey.get('sentiment', 'Neutral'), ' '.join(survey.get(f) or '' for f in SURVEY_TEXT_FIELDS))
+            for survey in emp_data['surveys']]
+
+
+def map_surveys(rows):
+    terms = Counter()
+    by_sentiment = {}
+    responses = 0
+    for surveys in rows:
+        for sentiment, text in surveys:
+            responses += 1
+            words = [w for w in re.findall(r"[a-z][a-z'-]+", text.lower()) if w not in STOPWORDS]
+            terms.update(words)
+            by_sentiment.setdefault(sentiment, Counter()).update(words)
+    return terms, by_sentiment, responses
+
+
+def reduce_surveys(partials):
+    terms = Counter()
+    by_sentiment = {}
+    responses = 0
+    for partial_terms, partial_sentiment, partial_responses in partials:
+        terms.update(partial_terms)
+        for sentiment, counter in partial_sentiment.items():
+            by_sentiment.setdefault(sentiment, Counter()).update(counter)
+        responses += partial_responses
+    return {
+        'responses': responses,
+        'terms': [
+            {'Term': term, 'Mentions': count,
+             **{sentiment: by_sentiment[sentiment][term] for sentiment in sorted(by_sentiment)}}
+            for term, count in terms.most_common(TOP_TERMS)
+        ],
+    }
+
+
+MAP_REDUCE_REPORTS = {
+    'Cohort Rollup': (project_cohort, map_cohort, reduce_cohort),
+    'Survey Themes': (project_surveys, map_surveys, reduce_surveys),
+}
+
+
+def report_chunks(name, store, chunk_size=CHUNK_SIZE):
+    """Chunks of a map-reduce report over every employee in the store
+
+    A chunk is (report name, snapshot rows, projected records). Snapshot rows
+    are (path, start, stop, skipped rows) for employees still exactly as the
+    store's source snapshot has them; the rest are projected here. The
+    snapshot is pinned so workers can still open it however long the job
+    waits; pass the chunks to release_chunks() once the job has ended.
+    """
+    project = MAP_REDUCE_REPORTS[name][0]
+    ids = list(store)
+    while True:
+        source = store.source
+        clean, rows = store.source_rows(ids)
+        if store.source is source:     # not rebased meanwhile
+            break
+    chunks = []
+    if rows:
+        path, kept = source.path, set(rows)
+        pin_snapshot(path)
+        first, last = min(rows), max(rows) + 1
+        for start in range(first, last, chunk_size):
+            stop = min(start + chunk_size, last)
+            skipped = tuple(i for i in range(start, stop) if i not in kept)
+            chunks.append((name, (path, start, stop, skipped), []))
+    try:
+        clean = set(clean)
+        changed = [emp_id for i, emp_id in enumerate(ids) if i not in clean]
+        for records in chunked((project(emp) for _, emp in store.scan(changed)), chunk_size):
+            chunks.append((name, None, records))
+    except BaseException:
+        release_chunks(chunks)
+        raise
+    return chunks
+
+
+def release_chunks(chunks):
+    """Unpin the snapshot report_chunks() pinned for these chunks"""
+    for path in {rows[0] for _, rows, _ in chunks if rows is not None}:
+        unpin_snapshot(path)
+
+
+@lru_cache(maxsize=2)
+def _open_snapshot(path):
+    return Snapshot(path)
+
+
+def map_report(chunk):
+    """Map step of report_chunks() chunks, run in a worker process"""
+    name, rows, records = chunk
+    project, map_func, _ = MAP_REDUCE_REPORTS[name]
+    if rows is not None:
+        path, start, stop, skipped = rows
+        skipped = set(skipped)
+        records = [project(emp) for i, emp in _open_snapshot(path).employees(start, stop) if i not in skipped]
+    return map_func(records)
+
+
+# Full export: one CSV row per onboarding item, written from a thread
+def export_items(report, records, total, export_dir=EXPORT_DIR):
+    """Write every item of every employee to a CSV file and return its path and row count"""
+    os.makedirs(export_dir, exist_ok=True)
+    path = os.path.join(export_dir, f"onboarding-items-{datetime.now():%Y%m%d-%H%M%S}.csv")
+    rows = 0
+    try:
+        with open(path, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=EXPORT_COLUMNS)
+            writer.writeheader()
+            for i, (emp_id, emp_data) in enumerate(records):
+                for key in DONE_STATUS:
+                    items = ((t['name'], t) for t in emp_data[key]) if key == 'tasks' else emp_data[key].items()
+                    for item_name, item in items:
+                        writer.writerow({
+                            'employee_id': emp_id,
+                            'employee': emp_data['name'],
+                            'department': emp_data['department'],
+                            'start_date': emp_data['start_date'],
+                            'kind': key,
+                            'item': item_name,
+                            'status': item['status'],
+                            'started': item.get('started') or item.get('uploaded') or '',
+                            'completed': item.get('completed') or item.get('verified') or item.get('assigned_date') or '',
+                            'due_date': item.get('due_date') or '',
+                        })
+                        rows += 1
+                if i % 100 == 0:
+                    report(i / max(total, 1))
+    except BaseException:
+        # Cancelled or failed: don't leave a truncated export behind
+        os.remove(path)
+        raise
+    return {'path': path, 'rows': rows}
@@ -0,0 +1,916 @@
+"""Columnar binary snapshots of the employee store
+
+A snapshot is a directory of uncompressed .npy columns (memory-mapped on
+load), small zlib-compressed JSON string tables and a zlib-compressed
+per-employee detail blob addressed through an offsets array:
+
+    manifest.json            schema version, counts, next employee id, code tables, item names,
+                             and the base snapshot and employee ids a write merged into
+    strings.json.z           names, emails and external HR ids
+    employee.<field>.npy     one value per employee (ids, dates, dictionary codes)
+    <kind>.<field>.npy       one row per employee, one column per template item
+    detail.bin               zlib(JSON) per employee: meetings, surveys, notes and
+                             any item fields that differ from the template
+    detail_offsets.npy       byte offsets of each employee's detail record
+
+Item fields that every employee shares (dependency, category, duration) are
+taken from the create_employee() template and not stored at all.
+
+Writes are merges: a process writes only the employees it changed, on top
+of the newest snapshot in the directory, under a lock file. Several
+processes can therefore share one snapshot directory, each rebasing its
+store onto the snapshots the others write. A snapshot that a long read,
+such as a report job, still points to is pinned with pin_snapshot() and
+kept out of pruning until it is unpinned.
+"""
+import atexit
+import contextlib
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+import zlib
+from datetime import date, datetime, timedelta
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:     # Windows: single-process deployments only
+    fcntl = None
+
+from onboarding import DONE_STATUS, create_employee, summarize_employee
+
+SCHEMA_VERSION = 2
+SNAPSHOT_DIR = os.environ.get(
+    'ONBOARDING_SNAPSHOT_DIR',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'snapshots')
+)
+KEEP_SNAPSHOTS = 3
+# Pins older than this are ignored, so a crashed process can't keep a snapshot forever
+PIN_MAX_AGE = 6 * 3600
+# Seconds between checks for snapshots written by other processes
+POLL_INTERVAL = float(os.environ.get('ONBOARDING_SNAPSHOT_POLL', 5.0))
+# Employee ids reserved at a time by an IdAllocator
+ID_BLOCK = 64
+
+EPOCH = datetime(1970, 1, 1)
+NO_TIME = np.iinfo(np.int64).min
+
+# Item fields stored as columns: 'code' fields are dictionary encoded, 'time'
+# fields are microseconds since the epoch
+ITEM_COLUMNS = {
+    'documents': {'status': 'code', 'priority': 'code', 'uploaded': 'time', 'verified': 'time'},
+    'tasks': {'status': 'code', 'progress': 'uint8', 'due_date': 'time', 'started': 'time', 'completed': 'time'},
+    'equipment': {'status': 'code', 'assigned_date': 'time'},
+    'compliance': {'status': 'code', 'priority': 'code', 'due_date': 'time', 'started': 'time', 'completed': 'time'},
+}
+FIELD_DTYPES = {'code': np.uint8, 'uint8': np.uint8, 'time': np.int64}
+EMPLOYEE_COLUMNS = ('id', 'external_id', 'name', 'email', 'department', 'role', 'start_date', 'created_at')
+EMPLOYEE_DTYPES = {
+    'id': np.uint32,
+    'start_date': np.int64,
+    'created_at': np.int64,
+    'department': np.uint16,
+    'role': np.uint32,
+    'irregular': np.uint8,
+}
+
+_MISSING = object()
+
+
+class SnapshotVersionError(Exception):
+    """Raised when a snapshot was written by a newer schema than this code understands"""
+
+
+# Migrations upgrade a loaded snapshot's (manifest, columns) in memory from
+# one schema version to the next; register one whenever SCHEMA_VERSION is bumped
+MIGRATIONS = {}
+
+
+def migration(from_version):
+    """Register a migration from `from_version` to `from_version + 1`"""
+    def register(func):
+        MIGRATIONS[from_version] = func
+        return func
+    return register
+
+
+@migration(1)
+def _add_employee_ids(manifest, columns):
+    """v2: integer employee ids and external HR ids
+
+    Ids are assigned in snapshot order. External ids written by v1 live in
+    the detail records, which override the empty column when materialized,
+    and move into the column on the next write.
+    """
+    n = manifest['count']
+    columns['employee.id'] = np.arange(1, n + 1, dtype=np.uint32)
+    columns['employee.external_id'] = [None] * n
+    return dict(manifest, schema_version=2, next_id=n + 1), columns
+
+
+def to_micros(value):
+    if value is None:
+        return NO_TIME
+    return (value - EPOCH) // timedelta(microseconds=1)
+
+
+def as_datetimes(array):
+    """Python datetimes (None for NO_TIME) from an int64 microsecond column, converted in bulk"""
+    return np.asarray(array).view('datetime64[us]').tolist()
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return {'$dt': value.isoformat()}
+    if isinstance(value, date):
+        return {'$date': value.isoformat()}
+    if isinstance(value, (set, tuple)):
+        return list(value)
+    raise TypeError(f"Cannot snapshot {type(value).__name__}")
+
+
+def _json_hook(obj):
+    if '$dt' in obj and len(obj) == 1:
+        return datetime.fromisoformat(obj['$dt'])
+    if '$date' in obj and len(obj) == 1:
+        return date.fromisoformat(obj['$date'])
+    return obj
+
+
+def pack(obj):
+    """zlib-compressed JSON, with datetimes tagged so they round-trip"""
+    return zlib.compress(json.dumps(obj, default=_json_default, separators=(',', ':')).encode(), 6)
+
+
+def unpack(data):
+    return json.loads(zlib.decompress(data), object_hook=_json_hook)
+
+
+def _items(emp_data, kind):
+    """(name, item) pairs for a kind in template order"""
+    if kind == 'tasks':
+        return [(t['name'], t) for t in emp_data['tasks']]
+    return list(emp_data[kind].items())
+
+
+def get_template():
+    """Per-kind item names and the non-column fields every new employee starts with"""
+    blank = create_employee('', '', '', EPOCH, '')
+    template = {}
+    for kind, columns in ITEM_COLUMNS.items():
+        template[kind] = [(name, {k: v for k, v in item.items() if k not in columns})
+                          for name, item in _items(blank, kind)]
+    return template
+
+
+class CodeTable:
+    """Dictionary encoder for repeated strings"""
+
+    def __init__(self, values=()):
+        self.values = list(values)
+        self.codes = {v: i for i, v in enumerate(self.values)}
+
+    def encode(self, value):
+        code = self.codes.get(value)
+        if code is None:
+            code = self.codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+
+class _Encoder:
+    """Encodes employee records into snapshot columns, one row per add()"""
+
+    def __init__(self, template, codes=(), departments=(), roles=()):
+        self.template = template
+        self.widths = {kind: len(items) for kind, items in template.items()}
+        self.codes = CodeTable(codes)
+        self.departments = CodeTable(departments)
+        self.roles = CodeTable(roles)
+        self.columns = {name: [] for name in EMPLOYEE_DTYPES}
+        self.item_rows = {(kind, field): [] for kind, fields in ITEM_COLUMNS.items() for field in fields}
+        self.names = []
+        self.emails = []
+        self.external_ids = []
+        self.details = []
+
+    def add(self, emp):
+        template = self.template
+        columns = self.columns
+        columns['id'].append(emp['id'])
+        self.names.append(emp['name'])
+        self.emails.append(emp['email'])
+        self.external_ids.append(emp.get('external_id'))
+        columns['start_date'].append(to_micros(emp['start_date']))
+        columns['created_at'].append(to_micros(emp.get('created_at')))
+        columns['department'].append(self.departments.encode(emp['department']))
+        columns['role'].append(self.roles.encode(emp['role']))
+
+        rows = {}
+        extras = {}
+        regular = True
+        for kind, fields in ITEM_COLUMNS.items():
+            items = _items(emp, kind)
+            if [name for name, _ in items] != [name for name, _ in template[kind]]:
+                regular = False
+                break
+            for field, field_type in fields.items():
+                values = [item.get(field) for _, item in items]
+                if field_type == 'time':
+                    rows[kind, field] = [to_micros(v) for v in values]
+                elif field_type == 'code':
+                    rows[kind, field] = [self.codes.encode(v) for v in values]
+                else:
+                    rows[kind, field] = [v or 0 for v in values]
+            for (name, item), (_, defaults) in zip(items, template[kind]):
+                changed = {k: v for k, v in item.items()
+                           if k not in fields and defaults.get(k, _MISSING) != v}
+                if changed:
+                    extras.setdefault(kind, {})[name] = changed
+
+        columns['irregular'].append(0 if regular else 1)
+        if regular:
+            detail = {k: v for k, v in emp.items() if k not in EMPLOYEE_COLUMNS and k not in ITEM_COLUMNS}
+            if extras:
+                detail['_extras'] = extras
+        else:
+            # Item lists that don't match the template are kept whole in the detail blob
+            detail = {k: v for k, v in emp.items() if k not in EMPLOYEE_COLUMNS}
+            for kind, fields in ITEM_COLUMNS.items():
+                for field, field_type in fields.items():
+                    rows[kind, field] = [NO_TIME if field_type == 'time' else 0] * self.widths[kind]
+        for key, row in rows.items():
+            self.item_rows[key].append(row)
+        self.details.append(pack(detail))
+
+    def array(self, key):
+        """The encoded rows of an employee field name or (kind, field) column"""
+        if key in EMPLOYEE_DTYPES:
+            return np.array(self.columns[key], dtype=EMPLOYEE_DTYPES[key])
+        kind, field = key
+        rows = self.item_rows[key]
+        return np.array(rows, dtype=FIELD_DTYPES[ITEM_COLUMNS[kind][field]]).reshape(len(rows), self.widths[kind])
+
+    def manifest(self):
+        if len(self.codes.values) > 255:
+            raise ValueError("Too many distinct item statuses for the snapshot format")
+        return {
+            'codes': self.codes.values,
+            'departments': self.departments.values,
+            'roles': self.roles.values,
+            'item_names': {kind: [name for name, _ in self.template[kind]] for kind in ITEM_COLUMNS},
+            'item_columns': ITEM_COLUMNS,
+        }
+
+
+@contextlib.contextmanager
+def _locked(root):
+    """Serialize snapshot writes and id reservations between processes sharing `root`"""
+    os.makedirs(root, exist_ok=True)
+    with open(os.path.join(root, '.lock'), 'a') as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def write_snapshot(employees, root=SNAPSHOT_DIR, on_prune=None, changes=None):
+    """Write a snapshot atomically and return its directory
+
+    `changes` holds the ids of the employees changed or removed since they
+    were last saved, by default the store's unsaved() ids. They are merged
+    into the latest snapshot under `root`: every other employee's columns
+    and detail bytes are copied from it as they are, so only the changed
+    records are encoded and changes other processes wrote there are kept.
+    Without a compatible base snapshot, or without change tracking (a plain
+    dict), every employee is written. The manifest names the base snapshot
+    and the merged ids so readers can follow what changed.
+
+    Older snapshots beyond the newest KEEP_SNAPSHOTS are deleted, calling
+    `on_prune(path)` for each so caches holding them can let go.
+    """
+    if changes is None and hasattr(employees, 'unsaved'):
+        changes = employees.unsaved()
+    changes = None if changes is None else set(changes)
+    template = get_template()
+    with _locked(root):
+        base_path = latest_snapshot(root)
+        base = Snapshot(base_path) if base_path else None
+        if base is not None and changes is not None and _compatible(base, template):
+            final = _write_delta(employees, base, changes, template, root)
+        else:
+            final = _write_full(employees, base, changes, template, root)
+        _prune(root, on_prune=on_prune)
+    return final
+
+
+def _compatible(base, template):
+    """Whether a base snapshot's rows can be copied into a snapshot of the current template"""
+    names = {kind: [name for name, _ in template[kind]] for kind in ITEM_COLUMNS}
+    return (base.manifest.get('item_names') == names and base.manifest.get('item_columns') == ITEM_COLUMNS
+            and all(f'employee.{name}' in base.columns for name in EMPLOYEE_DTYPES))
+
+
+def _write_full(employees, base, changes, template, root):
+    if changes is None or base is None:
+        records = employees.snapshot_values() if hasattr(employees, 'snapshot_values') else list(employees.values())
+    else:
+        # The base can't be copied from, so its rows are re-encoded with the changes applied
+        kept = [(emp_id, position) for position, emp_id in enumerate(base.ids) if emp_id not in changes]
+        records = [base.employee(position) for _, position in kept]
+        records += [employees.peek(emp_id) if hasattr(employees, 'peek') else employees[emp_id]
+                    for emp_id in sorted(changes) if emp_id in employees]
+    encoder = _Encoder(template)
+    for emp in records:
+        encoder.add(emp)
+    ids = encoder.columns['id']
+    next_id = getattr(employees, 'next_id', max(ids, default=0) + 1)
+    if base is not None:
+        next_id = max(next_id, base.next_id)
+    arrays = {key: encoder.array(key) for key in [*EMPLOYEE_DTYPES, *encoder.item_rows]}
+    strings = {'name': encoder.names, 'email': encoder.emails, 'external_id': encoder.external_ids}
+    return _save(root, base, arrays, strings, [(None, blob) for blob in encoder.details],
+                 dict(encoder.manifest(), count=len(ids), next_id=next_id,
+                      changed=None if changes is None else sorted(changes)))
+
+
+def _write_delta(employees, base, changes, template, root):
+    m = base.manifest
+    present = [emp_id for emp_id in sorted(changes) if emp_id in employees]
+    encoder = _Encoder(template, m['codes'], m['departments'], m['roles'])
+    for emp_id in present:
+        encoder.add(employees.peek(emp_id) if hasattr(employees, 'peek') else employees[emp_id])
+    encoded = {emp_id: k for k, emp_id in enumerate(present)}
+
+    # Base rows stay in place, replaced where changed; removed ones are dropped
+    # and new employees appended
+    ids = np.asarray(base.columns['employee.id'], dtype=np.int64)
+    rows = np.flatnonzero(~np.isin(ids, [emp_id for emp_id in changes if emp_id not in encoded]))
+    kept_ids = ids[rows].tolist()
+    replaced = [j for j, emp_id in enumerate(kept_ids) if emp_id in encoded]
+    replaced_from = [encoded[kept_ids[j]] for j in replaced]
+    appended = [k for k, emp_id in enumerate(present) if emp_id not in base.positions]
+
+    arrays = {}
+    for key in [*EMPLOYEE_DTYPES, *encoder.item_rows]:
+        column = base.columns[f'employee.{key}' if key in EMPLOYEE_DTYPES else '.'.join(key)]
+        new = encoder.array(key)
+        merged = np.asarray(column)[rows].astype(new.dtype)
+        merged[replaced] = new[replaced_from]
+        arrays[key] = np.concatenate([merged, new[appended]])
+
+    strings = {}
+    for field, values in (('name', encoder.names), ('email', encoder.emails), ('external_id', encoder.external_ids)):
+        column = base.columns[f'employee.{field}']
+        merged = [column[p] for p in rows.tolist()]
+        for j, k in zip(replaced, replaced_from):
+            merged[j] = values[k]
+        strings[field] = merged + [values[k] for k in appended]
+
+    replacements = dict(zip(replaced, replaced_from))
+    details = [(None, encoder.details[replacements[j]]) if j in replacements else (p, None)
+               for j, p in enumerate(rows.tolist())]
+    details += [(None, encoder.details[k]) for k in appended]
+    return _save(root, base, arrays, strings, details,
+                 dict(encoder.manifest(), count=len(details), next_id=max(base.next_id, getattr(employees, 'next_id', 0)),
+                      changed=sorted(changes)))
+
+
+def _save(root, base, arrays, strings, details, manifest):
+    """Write a snapshot directory and move it into place
+
+    `details` holds one (base position, None) or (None, blob) pair per
+    employee; runs of consecutive base positions are copied in one piece.
+    """
+    tmp = os.path.join(root, f'.tmp-{uuid.uuid4().hex}')
+    os.makedirs(tmp)
+    try:
+        for key, array in arrays.items():
+            name = f'employee.{key}' if key in EMPLOYEE_DTYPES else '.'.join(key)
+            np.save(os.path.join(tmp, f'{name}.npy'), array)
+
+        offsets = np.zeros(len(details) + 1, dtype=np.int64)
+        with open(os.path.join(tmp, 'detail.bin'), 'wb') as f:
+            run = None
+            base_offsets = base.columns['detail_offsets'] if base is not None else None
+            for i, (position, blob) in enumerate(details):
+                if position is None:
+                    size = len(blob)
+                else:
+                    size = int(base_offsets[position + 1] - base_offsets[position])
+                    if run is not None and run[1] == position:
+                        run[1] = position + 1
+                    else:
+                        _copy_run(f, base, run)
+                        run = [position, position + 1]
+                offsets[i + 1] = offsets[i] + size
+                if blob is not None:
+                    _copy_run(f, base, run)
+                    run = None
+                    f.write(blob)
+            _copy_run(f, base, run)
+            f.flush()
+            os.fsync(f.fileno())
+        np.save(os.path.join(tmp, 'detail_offsets.npy'), offsets)
+
+        with open(os.path.join(tmp, 'strings.json.z'), 'wb') as f:
+            f.write(pack(strings))
+
+        parent = os.path.basename(base.path) if base is not None else None
+        manifest = dict(manifest, schema_version=SCHEMA_VERSION, created_at=datetime.now().isoformat(), parent=parent)
+        with open(os.path.join(tmp, 'manifest.json'), 'w') as f:
+            json.dump(manifest, f)
+            f.flush()
+            os.fsync(f.fileno())
+
+        # Names order snapshots, so a new one must sort after its base even if the clock hasn't moved
+        stamp = time.time_ns()
+        if parent is not None:
+            stamp = max(stamp, int(parent.split('-', 1)[1]) + 1)
+        final = os.path.join(root, f"snapshot-{stamp}")
+        os.rename(tmp, final)
+    except BaseException:
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise
+    return final
+
+
+def _copy_run(f, base, run):
+    """Copy the detail bytes of base rows [start, stop)"""
+    if run is not None:
+        offsets = base.columns['detail_offsets']
+        f.write(base._detail[offsets[run[0]]:offsets[run[1]]])
+
+
+def changes_between(root, path, ancestor):
+    """Ids changed by the snapshots after `ancestor` up to and including `path`,
+    following their manifests' parents; None if the chain can't be followed"""
+    if ancestor is None:
+        return None
+    changed = set()
+    name = os.path.basename(path)
+    stop = os.path.basename(ancestor)
+    while name != stop:
+        try:
+            with open(os.path.join(root, name, 'manifest.json')) as f:
+                manifest = json.load(f)
+        except OSError:
+            return None
+        if manifest.get('changed') is None or not manifest.get('parent'):
+            return None
+        changed.update(manifest['changed'])
+        name = manifest['parent']
+    return changed
+
+
+class IdAllocator:
+    """Employee ids unique across every process sharing a snapshot directory
+
+    Ids are reserved from a counter file under `root` in blocks, so
+    processes adding employees concurrently never hand out the same id.
+    Pass an instance as an EmployeeStore's allocate_id.
+    """
+
+    def __init__(self, root=SNAPSHOT_DIR, block=ID_BLOCK):
+        self.root = root
+        self.block = block
+        self._next = 0
+        self._end = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, floor=1):
+        with self._lock:
+            if self._next < floor or self._next >= self._end:
+                self._reserve(floor)
+            emp_id = self._next
+            self._next += 1
+            return emp_id
+
+    def _reserve(self, floor):
+        path = os.path.join(self.root, 'next_id')
+        with _locked(self.root):
+            try:
+                with open(path) as f:
+                    start = int(f.read().strip() or 1)
+            except (OSError, ValueError):
+                start = 1
+            start = max(start, floor)
+            with open(path, 'w') as f:
+                f.write(str(start + self.block))
+        self._next, self._end = start, start + self.block
+
+
+def list_snapshots(root=SNAPSHOT_DIR):
+    """Completed snapshot directories, oldest first"""
+    if not os.path.isdir(root):
+        return []
+    return sorted(os.path.join(root, d) for d in os.listdir(root) if d.startswith('snapshot-'))
+
+
+def latest_snapshot(root=SNAPSHOT_DIR):
+    snapshots = list_snapshots(root)
+    return snapshots[-1] if snapshots else None
+
+
+_pins = {}     # snapshot path -> pin_snapshot() calls not yet unpinned in this process
+_pins_lock = threading.Lock()
+
+
+def _pin_file(path):
+    return os.path.join(path, f'pin-{os.getpid()}')
+
+
+def pin_snapshot(path):
+    """Keep a snapshot from being pruned until unpin_snapshot(path)
+
+    Pins are counted per process and held as a pin file in the snapshot's
+    directory, so they hold against every process writing to it. Raises
+    FileNotFoundError if the snapshot was already pruned.
+    """
+    with _pins_lock:
+        if not _pins.get(path):
+            # Under the writers' lock so a prune can't be halfway through it
+            with _locked(os.path.dirname(path)), open(_pin_file(path), 'w'):
+                pass
+        _pins[path] = _pins.get(path, 0) + 1
+
+
+def unpin_snapshot(path):
+    with _pins_lock:
+        count = _pins.pop(path, 0) - 1
+        if count > 0:
+            _pins[path] = count
+            return
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(_pin_file(path))
+
+
+def is_pinned(path, now=None):
+    """Whether any process holds a pin on a snapshot younger than PIN_MAX_AGE"""
+    now = now or time.time()
+    for name in os.listdir(path):
+        if name.startswith('pin-'):
+            with contextlib.suppress(FileNotFoundError):
+                if now - os.path.getmtime(os.path.join(path, name)) < PIN_MAX_AGE:
+                    return True
+    return False
+
+
+def _prune(root, keep=KEEP_SNAPSHOTS, on_prune=None):
+    for path in list_snapshots(root)[:-keep]:
+        if is_pinned(path):
+            continue
+        shutil.rmtree(path, ignore_errors=True)
+        if on_prune is not None:
+            on_prune(path)
+
+
+class Snapshot:
+    """A loaded snapshot: columns are memory-mapped, detail is decoded per employee"""
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, 'manifest.json')) as f:
+            manifest = json.load(f)
+        if manifest['schema_version'] > SCHEMA_VERSION:
+            raise SnapshotVersionError(
+                f"Snapshot schema v{manifest['schema_version']} is newer than supported v{SCHEMA_VERSION}")
+
+        columns = {}
+        for filename in os.listdir(path):
+            if filename.endswith('.npy'):
+                columns[filename[:-4]] = np.load(os.path.join(path, filename), mmap_mode='r')
+        with open(os.path.join(path, 'strings.json.z'), 'rb') as f:
+            strings = unpack(f.read())
+        columns['employee.name'] = strings['name']
+        columns['employee.email'] = strings['email']
+        if 'external_id' in strings:
+            columns['employee.external_id'] = strings['external_id']
+
+        while manifest['schema_version'] < SCHEMA_VERSION:
+            manifest, columns = MIGRATIONS[manifest['schema_version']](manifest, columns)
+
+        self.manifest = manifest
+        self.columns = columns
+        self.names = columns['employee.name']
+        self.ids = columns['employee.id'].tolist()
+        self.positions = {emp_id: i for i, emp_id in enumerate(self.ids)}
+        self.next_id = manifest['next_id']
+        self._detail = np.memmap(os.path.join(path, 'detail.bin'), dtype=np.uint8, mode='r') \
+            if os.path.getsize(os.path.join(path, 'detail.bin')) else np.zeros(0, dtype=np.uint8)
+        self._template = get_template()
+        self._summary_rows = None
+
+    def __len__(self):
+        return self.manifest['count']
+
+    def detail(self, i):
+        """Decode one employee's variable-length detail record"""
+        offsets = self.columns['detail_offsets']
+        return unpack(self._detail[offsets[i]:offsets[i + 1]].tobytes())
+
+    def _row(self, i):
+        c = self.columns
+        row = {name: self._convert(c[f'employee.{name}'][i:i + 1], EMPLOYEE_DTYPES[name])[0]
+               for name in EMPLOYEE_DTYPES}
+        for kind, fields in self.manifest['item_columns'].items():
+            for field, field_type in fields.items():
+                row[kind, field] = self._convert(c[f'{kind}.{field}'][i], FIELD_DTYPES[field_type])
+        return row
+
+    @staticmethod
+    def _convert(array, dtype):
+        return as_datetimes(array) if dtype is np.int64 else np.asarray(array).tolist()
+
+    def _rows(self, start=0, stop=None):
+        """Employees' columns from row `start` to `stop`, converted to Python values in bulk"""
+        c = self.columns
+        rows = slice(start, len(self) if stop is None else stop)
+        employee = {name: self._convert(c[f'employee.{name}'][rows], dtype) for name, dtype in EMPLOYEE_DTYPES.items()}
+        items = {(kind, field): self._convert(c[f'{kind}.{field}'][rows], FIELD_DTYPES[field_type])
+                 for kind, fields in self.manifest['item_columns'].items() for field, field_type in fields.items()}
+        for i in range(rows.stop - rows.start):
+            row = {name: values[i] for name, values in employee.items()}
+            row.update({key: values[i] for key, values in items.items()})
+            yield row
+
+    def _materialize(self, i, row):
+        m = self.manifest
+        emp = {
+            'id': row['id'],
+            'external_id': self.columns['employee.external_id'][i],
+            'name': self.names[i],
+            'email': self.columns['employee.email'][i],
+            'department': m['departments'][row['department']],
+            'role': m['roles'][row['role']],
+            'start_date': row['start_date'],
+            'created_at': row['created_at'],
+        }
+        detail = self.detail(i)
+        if row['irregular']:
+            emp.update(detail)
+            return emp
+
+        extras = detail.pop('_extras', {})
+        codes = m['codes']
+        for kind, fields in m['item_columns'].items():
+            kind_extras = extras.get(kind, {})
+            items = []
+            for col, (name, defaults) in enumerate(self._template[kind]):
+                item = dict(defaults)
+                for field, field_type in fields.items():
+                    value = row[kind, field][col]
+                    if field_type == 'code':
+                        item[field] = codes[value]
+                    else:
+                        item[field] = value
+                if name in kind_extras:
+                    item.update(kind_extras[name])
+                items.append((name, item))
+            emp[kind] = [item for _, item in items] if kind == 'tasks' else dict(items)
+        emp.update(detail)
+        return emp
+
+    def employee(self, i):
+        """Materialize one employee record in the create_employee() shape"""
+        return self._materialize(i, self._row(i))
+
+    def item_statuses(self, kind, rows, names):
+        """Statuses of the named items of a record kind for the given snapshot rows
+
+        Returns an object array (len(rows), len(names)) read straight from the
+        status column, and a mask of irregular rows, whose items don't follow
+        the template and are left as None for the caller to load.
+        """
+        column = {name: j for j, (name, _) in enumerate(self._template[kind])}
+        rows = np.asarray(rows, dtype=np.int64)
+        codes = np.asarray(self.manifest['codes'], dtype=object)
+        status = np.asarray(self.columns[f'{kind}.status'][rows])
+        result = np.full((len(rows), len(names)), None, dtype=object)
+        for j, name in enumerate(names):
+            if name in column:
+                result[:, j] = codes[status[:, column[name]]]
+        irregular = np.asarray(self.columns['employee.irregular'][rows], dtype=bool)
+        result[irregular] = None
+        return result, irregular
+
+    def uploaded_documents(self, rows):
+        """Documents with status 'Uploaded' in the given snapshot rows, read from the columns
+
+        Returns (row, document, priority, start date, uploaded at) tuples and a
+        mask of irregular rows, which are skipped for the caller to load.
+        """
+        rows = np.asarray(rows, dtype=np.int64)
+        codes = self.manifest['codes']
+        irregular = np.asarray(self.columns['employee.irregular'][rows], dtype=bool)
+        if 'Uploaded' not in codes or not len(rows):
+            return [], irregular
+        status = np.asarray(self.columns['documents.status'][rows])
+        found, col = np.nonzero((status == codes.index('Uploaded')) & ~irregular[:, None])
+        names = [name for name, _ in self._template['documents']]
+        priorities = np.asarray(self.columns['documents.priority'][rows])[found, col].tolist()
+        uploaded = as_datetimes(np.asarray(self.columns['documents.uploaded'][rows])[found, col])
+        start_dates = as_datetimes(np.asarray(self.columns['employee.start_date'][rows])[found])
+        return [(int(rows[i]), names[j], codes[priority], start, at)
+                for i, j, priority, start, at in zip(found.tolist(), col.tolist(), priorities, start_dates, uploaded)], irregular
+
+    def summaries(self):
+        """summarize_employee() rows for every employee, computed once from the columns
+
+        The rows are shared by every store opened on this snapshot, so they
+        must not be mutated; stores replace a row when an employee changes.
+        """
+        if self._summary_rows is None:
+            self._summary_rows = self._summaries()
+        return self._summary_rows
+
+    def _summaries(self):
+        c = self.columns
+        m = self.manifest
+        codes = {status: code for code, status in enumerate(m['codes'])}
+
+        def has_status(kind, *statuses):
+            status = np.asarray(c[f'{kind}.status'])
+            mask = np.zeros(status.shape, dtype=bool)
+            for value in statuses:
+                if value in codes:
+                    mask |= status == codes[value]
+            return mask
+
+        counts = {}
+        for kind, done_status in DONE_STATUS.items():
+            counts[f'{kind}_done'] = has_status(kind, done_status).sum(axis=1)
+            counts[f'{kind}_total'] = np.full(len(self), c[f'{kind}.status'].shape[1])
+        counts['pending_documents'] = has_status('documents', 'Pending', 'Uploaded').sum(axis=1)
+        counts['pending_equipment'] = has_status('equipment', 'Pending').sum(axis=1)
+        done = sum(counts[f'{kind}_done'] for kind in DONE_STATUS)
+        total = sum(counts[f'{kind}_total'] for kind in DONE_STATUS)
+        completion = np.where(total > 0, done / np.maximum(total, 1) * 100, 0).astype(np.int64).tolist()
+        count_fields = list(counts)
+        count_rows = np.stack(list(counts.values()), axis=1).tolist()
+        task_status = np.asarray(c['tasks.status'])
+        task_codes = [(status, code) for status, code in codes.items() if (task_status == code).any()]
+        task_rows = np.stack([(task_status == code).sum(axis=1) for _, code in task_codes] or
+                             [np.zeros(len(self), dtype=np.int64)], axis=1)
+        # Few distinct mixes of task statuses occur, so rows share one dict per mix
+        mixes, task_rows = np.unique(task_rows, axis=0, return_inverse=True)
+        task_statuses = [status for status, _ in task_codes]
+        mixes = [{status: count for status, count in zip(task_statuses, mix) if count} for mix in mixes.tolist()]
+        task_rows = task_rows.reshape(-1).tolist()
+        open_due = as_datetimes(np.where(has_status('compliance', 'Completed'), NO_TIME, c['compliance.due_date']))
+
+        departments = [m['departments'][code] for code in c['employee.department'].tolist()]
+        roles = [m['roles'][code] for code in c['employee.role'].tolist()]
+        start_dates = as_datetimes(c['employee.start_date'])
+        irregular = c['employee.irregular'].tolist()
+        external_ids = c['employee.external_id']
+        emails = c['employee.email']
+        rows = []
+        # Plain per-row loop: this runs once per snapshot for every employee, before the first page renders
+        for i, (emp_id, name, role, department, start_date, row_counts, row_tasks, row_due) in enumerate(
+                zip(self.ids, self.names, roles, departments, start_dates, count_rows, task_rows, open_due)):
+            if irregular[i]:
+                rows.append(summarize_employee(self.employee(i)))
+                continue
+            row = {
+                'id': emp_id,
+                'external_id': external_ids[i],
+                'name': name,
+                'email': emails[i],
+                'role': role,
+                'department': department,
+                'start_date': start_date,
+            }
+            row.update(zip(count_fields, row_counts))
+            row['completion'] = completion[i]
+            row['task_status'] = mixes[row_tasks]
+            # Open due dates are datetimes, which are always true; completed ones are None
+            row['open_compliance_due'] = tuple(filter(None, row_due))
+            rows.append(row)
+        return rows
+
+    def employees(self, start=0, stop=None):
+        """(row, record) pairs for rows `start` to `stop`, materialized in bulk"""
+        for i, row in enumerate(self._rows(start, stop), start):
+            yield i, self._materialize(i, row)
+
+    def to_employees(self):
+        """Materialize every employee, keyed by id"""
+        return {self.ids[i]: emp for i, emp in self.employees()}
+
+
+def load_snapshot(path=None, root=SNAPSHOT_DIR):
+    """Open the given snapshot, or the latest one under `root`; None if there is none"""
+    path = path or latest_snapshot(root)
+    return Snapshot(path) if path else None
+
+
+class SnapshotWriter:
+    """Background thread that saves one store's changes and keeps the store current
+
+    schedule() asks for the store's unsaved changes to be written; requests
+    within `delay` seconds are coalesced. Each write merges just those
+    employees into the latest snapshot (see write_snapshot), so processes
+    sharing the directory, such as the app, the API and HR sync, never
+    overwrite each other's changes. Between writes the thread checks every
+    `poll` seconds for snapshots written by other processes and rebases
+    the store onto them, calling `on_change(ids)` with the employees that
+    changed. Pending changes are written at interpreter exit.
+    """
+
+    def __init__(self, employees, root=SNAPSHOT_DIR, delay=2.0, poll=POLL_INTERVAL, on_prune=None, on_change=None):
+        self.employees = employees
+        self.root = root
+        self.delay = delay
+        self.poll = poll
+        self.on_prune = on_prune
+        self.on_change = on_change
+        self.last_path = None
+        self.last_error = None
+        self._pending = False
+        self._cond = threading.Condition()
+        self._io = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name='snapshot-writer', daemon=True)
+        self._thread.start()
+        atexit.register(self.flush)
+
+    def schedule(self):
+        """Request a write of the store's changes; requests within `delay` are coalesced"""
+        with self._cond:
+            self._pending = True
+            self._cond.notify()
+
+    def flush(self):
+        """Write any scheduled changes now"""
+        with self._cond:
+            pending, self._pending = self._pending, False
+        if pending:
+            self._write()
+
+    def sync(self):
+        """Rebase the store onto a snapshot another process wrote, if there is a newer one"""
+        with self._io:
+            latest = latest_snapshot(self.root)
+            source = self.employees.source
+            if latest is None or (source is not None and os.path.basename(latest) == os.path.basename(source.path)):
+                return
+            changed = self.employees.rebase(
+                Snapshot(latest), changes_between(self.root, latest, source.path if source else None))
+        self._changed(changed)
+
+    def _write(self):
+        with self._io:
+            for attempt in range(3):
+                saved = self.employees.unsaved()
+                if not saved:
+                    return
+                try:
+                    path = write_snapshot(self.employees, self.root, on_prune=self.on_prune, changes=saved)
+                except RuntimeError as e:
+                    # The store changed size mid-write; try again with the newer state
+                    self.last_error = e
+                    continue
+                except (OSError, ValueError) as e:
+                    self.last_error = e
+                    return
+                self.last_path = path
+                self.last_error = None
+                break
+            else:
+                return
+            written = Snapshot(path)
+            source = self.employees.source
+            parent = written.manifest['parent']
+            if parent == (os.path.basename(source.path) if source else None):
+                foreign = set()
+            else:
+                # Other processes wrote in between; take in what they changed
+                foreign = changes_between(self.root, os.path.join(self.root, parent), source.path if source else None)
+            changed = self.employees.rebase(written, foreign, saved)
+        self._changed(changed)
+
+    def _changed(self, ids):
+        if ids and self.on_change is not None:
+            self.on_change(ids)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                if not self._pending:
+                    self._cond.wait(self.poll)
+                pending = self._pending
+            try:
+                if pending:
+                    time.sleep(self.delay)
+                    self.flush()
+                else:
+                    self.sync()
+            except Exception as e:
+                self.last_error = e
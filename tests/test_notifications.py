@@ -0,0 +1,130 @@
+"""Delivery worker against the local SMTP stand-in: digests, dedupe and rate limits"""
+import asyncio
+import email
+
+import pytest
+
+from benchmarks.notification_delivery import SMTPStandIn
+from notifications import NotificationService, Outbox, SMTPTransport
+
+
+def delivered(smtp):
+    """(recipient, subject, body) of every message the stand-in accepted"""
+    messages = [email.message_from_bytes(data[:-len(b".\r\n")]) for data in smtp.messages]
+    return [(m['To'], m['Subject'], m.get_payload(decode=True).decode()) for m in messages]
+
+
+@pytest.fixture
+def deliver(tmp_path):
+    """Run `steps(service)` with a service delivering to a fresh SMTP stand-in; returns the stand-in"""
+    def run(steps, **options):
+        async def main():
+            smtp = SMTPStandIn()
+            server, port = await smtp.start()
+            options.setdefault('coalesce_seconds', 0)
+            service = NotificationService(Outbox(str(tmp_path / 'outbox.sqlite3')),
+                                          SMTPTransport('127.0.0.1', port), **options)
+            try:
+                await steps(service)
+            finally:
+                server.close()
+                await server.wait_closed()
+            return smtp, service
+        return asyncio.run(main())
+    return run
+
+
+def test_pending_messages_coalesce_into_one_digest(deliver):
+    async def steps(service):
+        for i in range(3):
+            service.notify('ana@example.com', f"Training {i} due soon", f"Please complete training {i}.")
+        service.notify('ben@example.com', "Training 0 due soon", "Please complete training 0.")
+        assert await service.deliver_ready() == 2
+        assert await service.deliver_ready() == 0
+
+    smtp, service = deliver(steps)
+    sent = {recipient: (subject, body) for recipient, subject, body in delivered(smtp)}
+    assert sorted(sent) == ['ana@example.com', 'ben@example.com']
+    subject, body = sent['ana@example.com']
+    assert subject == "Onboarding reminders (3)"
+    assert all(f"• Training {i} due soon" in body for i in range(3))
+    assert sent['ben@example.com'][0] == "Training 0 due soon"
+    assert service.stats['digests'] == 2 and service.stats['messages'] == 4
+    assert service.outbox.counts() == {'Sent': 4}
+
+
+def test_digest_waits_for_the_coalescing_window(deliver):
+    async def steps(service):
+        service.notify('ana@example.com', "Training due soon", "Please complete it.")
+        assert await service.deliver_ready() == 0
+
+    smtp, service = deliver(steps, coalesce_seconds=60)
+    assert smtp.messages == []
+    assert service.queue_depth() == 1
+
+
+def test_duplicate_keys_are_suppressed(deliver):
+    async def steps(service):
+        assert service.notify('ana@example.com', "Overdue: Security", "Due yesterday.", dedupe_key='security')
+        assert not service.notify('ana@example.com', "Overdue: Security", "Due yesterday.", dedupe_key='security')
+        # The key is per recipient, and other keys still go through
+        assert service.notify('ben@example.com', "Overdue: Security", "Due yesterday.", dedupe_key='security')
+        assert service.notify('ana@example.com', "Overdue: Privacy", "Due yesterday.", dedupe_key='privacy')
+        await service.deliver_ready()
+        # Still suppressed once the first copy was sent
+        assert not service.notify('ana@example.com', "Overdue: Security", "Due yesterday.", dedupe_key='security')
+
+    smtp, service = deliver(steps)
+    assert service.stats['enqueued'] == 3 and service.stats['suppressed'] == 2
+    sent = delivered(smtp)
+    assert sorted(recipient for recipient, _, _ in sent) == ['ana@example.com', 'ben@example.com']
+    assert sum(body.count("Overdue: Security") for recipient, _, body in sent if recipient == 'ana@example.com') == 1
+
+
+def test_recipient_rate_limit_holds_messages_and_counts_them_once(deliver):
+    async def steps(service):
+        for i in range(3):
+            service.notify('ana@example.com', f"Reminder {i}", "Body.")
+            service.notify('ben@example.com', f"Reminder {i}", "Body.")
+            await service.deliver_ready()
+        # Both have used their burst of two; the third reminder waits
+        assert service.queue_depth() == 2
+        assert service.stats['rate_limited'] == 2
+        for _ in range(3):
+            assert await service.deliver_ready() == 0
+        assert service.stats['rate_limited'] == 2
+        # Another recipient isn't held back by their limits
+        service.notify('cy@example.com', "Reminder 0", "Body.")
+        assert await service.deliver_ready() == 1
+
+    smtp, service = deliver(steps, recipient_rate=(1 / 3600, 2))
+    sent = delivered(smtp)
+    assert sorted(recipient for recipient, _, _ in sent) == ['ana@example.com'] * 2 + ['ben@example.com'] * 2 + \
+        ['cy@example.com']
+    assert service.queue_depth() == 2
+
+
+def test_global_rate_limit_holds_remaining_recipients(deliver):
+    async def steps(service):
+        for r in range(5):
+            service.notify(f"person{r}@example.com", "Reminder", "Body.")
+        assert await service.deliver_ready() == 2
+        assert await service.deliver_ready() == 0
+
+    smtp, service = deliver(steps, global_rate=(1 / 3600, 2))
+    assert len(smtp.messages) == 2
+    assert service.stats['rate_limited'] == 3
+
+
+def test_refilled_recipient_buckets_are_dropped(deliver):
+    async def steps(service):
+        for r in range(20):
+            service.notify(f"person{r}@example.com", "Reminder", "Body.")
+        await service.deliver_ready()
+        assert len(service._recipient_limits) == 20
+        await asyncio.sleep(0.1)
+        await service.deliver_ready()
+        assert service._recipient_limits == {}
+
+    smtp, service = deliver(steps, recipient_rate=(100, 3))
+    assert len(smtp.messages) == 20
@@ -0,0 +1,167 @@
+"""Cohort-wide task timeline (Gantt)
+
+Every employee's tasks come from the same template DAG and are due a fixed
+number of days after their start date, so bar positions are computed once
+per template (task_layout) and shifted by each employee's start date with
+NumPy broadcasting rather than laid out task by task. A bar runs from the
+prerequisite's due date to the task's own.
+
+Bars are drawn as WebGL line segments, one Scattergl trace per status plus
+one for overdue tasks, so thousands of bars stay responsive. Only a window
+of employees is turned into traces and sent to the browser at a time;
+cohort-wide counts come from the status arrays alone.
+"""
+import functools
+from dataclasses import dataclass
+from datetime import datetime
+
+import numpy as np
+import plotly.graph_objects as go
+
+import analytics
+import catalogs
+
+WINDOW_SIZES = [50, 100, 250, 500, 1000]
+# Row labels are only drawn when they are still legible
+MAX_LABELED_ROWS = 150
+# Tasks due the same day as their prerequisite still get a visible bar
+MIN_BAR_DAYS = 0.5
+LANE_HEIGHT = 0.8
+
+DAY_MS = 86_400_000
+STATUS_ORDER = ['Locked', 'Not Started', 'In Progress', 'Completed']
+
+
+@dataclass(frozen=True)
+class TaskLayout:
+    names: tuple
+    dependencies: tuple       # index of each task's prerequisite, or -1
+    start_offset: np.ndarray  # days after the start date each bar begins
+    end_offset: np.ndarray    # days after the start date each task is due
+    lanes: np.ndarray         # vertical offset of each task within its employee's row, by DAG depth
+
+
+@functools.lru_cache(maxsize=None)
+def task_layout(template=catalogs.TASKS):
+    """Bar offsets and lanes for a task template of (name, dependency, due in days, category)"""
+    names = tuple(name for name, _, _, _ in template)
+    index = {name: i for i, name in enumerate(names)}
+    dependencies = tuple(index.get(dependency, -1) for _, dependency, _, _ in template)
+    end = np.array([due_in for _, _, due_in, _ in template], dtype=float)
+
+    depth = np.zeros(len(names), dtype=int)
+    for i in range(len(names)):
+        parent = dependencies[i]
+        while parent >= 0:
+            depth[i] += 1
+            parent = dependencies[parent]
+
+    start = np.array([end[parent] if parent >= 0 else 0.0 for parent in dependencies])
+    start = np.minimum(start, end - MIN_BAR_DAYS)
+    lanes = depth / max(depth.max(), 1) * LANE_HEIGHT
+    return TaskLayout(names, dependencies, start, end, lanes)
+
+
+def cohort_ids(summaries, cohort=None, department=None):
+    """Ids of employees in a start-month cohort and department, by start date then name"""
+    rows = [s for s in summaries
+            if (cohort is None or analytics.get_cohort(s['start_date']) == cohort)
+            and (department is None or s['department'] == department)]
+    rows.sort(key=lambda s: (s['start_date'], s['name'], s['id']))
+    return [s['id'] for s in rows]
+
+
+def to_ms(dates):
+    """Naive datetimes as float milliseconds since the epoch, which Plotly date axes accept"""
+    return np.array(dates, dtype='datetime64[ms]').astype(np.int64).astype(float)
+
+
+def ms_to_dates(ms):
+    return np.datetime_as_string(np.asarray(ms).astype(np.int64).astype('datetime64[ms]'), unit='D')
+
+
+def bar_bounds(layout, start_ms):
+    """(x0, x1) in ms for every employee × task, shape (employees, tasks)"""
+    base = np.asarray(start_ms, dtype=float)[:, None]
+    return base + layout.start_offset * DAY_MS, base + layout.end_offset * DAY_MS
+
+
+def overdue_mask(layout, start_ms, statuses, now=None):
+    """Tasks past their due date and not completed"""
+    now_ms = to_ms([now or datetime.now()])[0]
+    _, due = bar_bounds(layout, start_ms)
+    return (due < now_ms) & (statuses != 'Completed') & np.not_equal(statuses, None)
+
+
+def status_counts(statuses):
+    """Task count per status across a status array"""
+    return {status: int((statuses == status).sum()) for status in STATUS_ORDER}
+
+
+def _segments(x0, x1, y0, y1, text=None):
+    """Flatten segments into one polyline broken by NaN gaps, the cheapest shape for Scattergl"""
+    n = len(x0)
+    xs = np.full(n * 3, np.nan)
+    ys = np.full(n * 3, np.nan)
+    xs[0::3], xs[1::3] = x0, x1
+    ys[0::3], ys[1::3] = y0, y1
+    if text is None:
+        return xs, ys, None
+    labels = np.full(n * 3, None, dtype=object)
+    labels[0::3] = labels[1::3] = text
+    return xs, ys, labels
+
+
+def timeline_figure(layout, labels, start_dates, statuses, now=None, show_dependencies=False):
+    """Gantt of one window of employees
+
+    `labels` and `start_dates` describe the window's employees in row order
+    and `statuses` is their (employees, tasks) status array.
+    """
+    now = now or datetime.now()
+    rows = len(labels)
+    start_ms = to_ms(start_dates)
+    x0, x1 = bar_bounds(layout, start_ms)
+    y = np.arange(rows)[:, None] + layout.lanes
+    y = np.broadcast_to(y, x0.shape)
+    overdue = overdue_mask(layout, start_ms, statuses, now)
+
+    names = np.broadcast_to(np.asarray(layout.names, dtype=object), statuses.shape)
+    fig = go.Figure()
+
+    if show_dependencies and rows:
+        children = [i for i, parent in enumerate(layout.dependencies) if parent >= 0]
+        parents = [layout.dependencies[i] for i in children]
+        xs, ys, _ = _segments(x1[:, parents].ravel(), x0[:, children].ravel(),
+                              y[:, parents].ravel(), y[:, children].ravel())
+        fig.add_trace(go.Scattergl(x=xs, y=ys, mode='lines', name='Dependency', hoverinfo='skip',
+                                   line=dict(color='#cbd5e1', width=1)))
+
+    traces = [(status, (statuses == status) & ~overdue) for status in STATUS_ORDER] + [('Overdue', overdue)]
+    for status, mask in traces:
+        if not mask.any():
+            continue
+        text = [f"{labels[r]}<br>{task} · {task_status}<br>Due {due}"
+                for r, task, task_status, due in zip(np.nonzero(mask)[0], names[mask], statuses[mask],
+                                                     ms_to_dates(x1[mask]))]
+        xs, ys, hover = _segments(x0[mask], x1[mask], y[mask], y[mask], text)
+        fig.add_trace(go.Scattergl(x=xs, y=ys, mode='lines', name=status, text=hover, hoverinfo='text',
+                                   line=dict(color=catalogs.status_color(status), width=6)))
+        if status == 'Overdue':
+            fig.add_trace(go.Scattergl(x=x1[mask], y=y[mask], mode='markers', name='Due date missed',
+                                       hoverinfo='skip', marker=dict(color=catalogs.status_color('Overdue'),
+                                                                     symbol='x', size=8)))
+
+    fig.add_vline(x=to_ms([now])[0], line_dash='dash', line_color='#475569')
+    fig.update_layout(
+        height=min(max(400, rows * 22), 1600),
+        margin=dict(l=20, r=20, t=30, b=20),
+        legend=dict(orientation='h', y=1.02, x=0),
+        xaxis=dict(type='date'),
+        yaxis=dict(autorange='reversed', showgrid=False, zeroline=False,
+                   tickvals=list(np.arange(rows) + LANE_HEIGHT / 2) if rows <= MAX_LABELED_ROWS else [],
+                   ticktext=list(labels) if rows <= MAX_LABELED_ROWS else []),
+        paper_bgcolor='rgba(0,0,0,0)',
+        plot_bgcolor='rgba(0,0,0,0)',
+    )
+    return fig
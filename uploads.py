@@ -0,0 +1,143 @@
+import hashlib
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+# Content-addressed document store: files are named by their SHA-256 digest
+STORE_DIR = os.environ.get(
+    'ONBOARDING_UPLOAD_DIR',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'uploads')
+)
+CHUNK_SIZE = 1024 * 1024
+MAX_UPLOAD_BYTES = 25 * 1024 * 1024
+UPLOAD_WORKERS = 4
+
+MIME_SIGNATURES = [
+    (b'%PDF-', 'application/pdf'),
+    (b'\x89PNG\r\n\x1a\n', 'image/png'),
+    (b'\xff\xd8\xff', 'image/jpeg'),
+    (b'II*\x00', 'image/tiff'),
+    (b'MM\x00*', 'image/tiff'),
+    (b'PK\x03\x04', 'application/zip'),  # DOCX and other Office Open XML files
+]
+ALLOWED_MIME_TYPES = {'application/pdf', 'image/png', 'image/jpeg', 'image/tiff', 'application/zip'}
+
+EICAR_SIGNATURE = b'X5O!P%@AP[4\\PZX54(P^)7CC)7}$EICAR-STANDARD-ANTIVIRUS-TEST-FILE!'
+
+
+class UploadRejected(Exception):
+    """Raised when an upload fails size, type or scanner validation"""
+
+
+def sniff_mime(head):
+    """Detect the MIME type from the leading bytes of a file"""
+    for signature, mime in MIME_SIGNATURES:
+        if head.startswith(signature):
+            return mime
+    return None
+
+
+def eicar_scanner(path, head):
+    """Stand-in malware scanner that flags the EICAR test signature"""
+    if EICAR_SIGNATURE in head:
+        return "Malware test signature detected"
+    return None
+
+
+# Scanners receive the spooled file path and its first chunk and return a
+# rejection reason, or None when the file is clean
+SCANNERS = [eicar_scanner]
+
+
+def register_scanner(scanner):
+    """Add a scanner to the validation chain"""
+    SCANNERS.append(scanner)
+
+
+def stored_path(sha256, store_dir=None):
+    """Path of a stored file, sharded by the first two hex digits of its hash"""
+    return os.path.join(store_dir or STORE_DIR, sha256[:2], sha256)
+
+
+def store_stream(fileobj, max_bytes=MAX_UPLOAD_BYTES, store_dir=None):
+    """Stream a file into the store chunk by chunk, returning its metadata
+
+    The file is hashed while it is spooled to a temp file, validated, and
+    then moved to its content address. Identical content is stored once.
+    """
+    store_dir = store_dir or STORE_DIR
+    tmp_dir = os.path.join(store_dir, 'tmp')
+    os.makedirs(tmp_dir, exist_ok=True)
+
+    digest = hashlib.sha256()
+    size = 0
+    head = b''
+    fd, tmp_path = tempfile.mkstemp(dir=tmp_dir)
+    try:
+        with os.fdopen(fd, 'wb') as tmp:
+            while True:
+                chunk = fileobj.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > max_bytes:
+                    raise UploadRejected(f"File exceeds the {max_bytes // (1024 * 1024)} MB limit")
+                if not head:
+                    head = chunk
+                digest.update(chunk)
+                tmp.write(chunk)
+
+        if size == 0:
+            raise UploadRejected("File is empty")
+
+        mime = sniff_mime(head)
+        if mime not in ALLOWED_MIME_TYPES:
+            raise UploadRejected("Unsupported file type (PDF, PNG, JPEG, TIFF or DOCX expected)")
+
+        for scanner in SCANNERS:
+            reason = scanner(tmp_path, head)
+            if reason:
+                raise UploadRejected(reason)
+
+        sha256 = digest.hexdigest()
+        path = stored_path(sha256, store_dir)
+        if os.path.exists(path):
+            os.remove(tmp_path)
+            deduplicated = True
+        else:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.replace(tmp_path, path)
+            deduplicated = False
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+    return {'sha256': sha256, 'size': size, 'mime': mime, 'deduplicated': deduplicated}
+
+
+class UploadPipeline:
+    """Worker pool that hashes, validates and stores uploads off the script thread"""
+
+    def __init__(self, workers=UPLOAD_WORKERS, store_dir=None):
+        self.store_dir = store_dir
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='upload')
+
+    def submit(self, fileobj, filename, ref, on_done):
+        """Queue an upload; returns its future. on_done(result) is called on the worker
+        with the outcome, so it is applied whether or not the caller is still around."""
+        return self.executor.submit(self._process, fileobj, filename, ref, on_done)
+
+    def _process(self, fileobj, filename, ref, on_done):
+        result = {'ref': ref, 'filename': filename, 'file': None, 'error': None}
+        try:
+            fileobj.seek(0)
+            result['file'] = store_stream(fileobj, store_dir=self.store_dir)
+            result['file']['filename'] = filename
+        except UploadRejected as e:
+            result['error'] = str(e)
+        except OSError as e:
+            result['error'] = f"Storage error: {e.strerror or e}"
+        result['finished_at'] = datetime.now()
+        on_done(result)
@@ -0,0 +1,220 @@
+import heapq
+import threading
+from datetime import datetime, timedelta
+
+from onboarding import iter_employees
+
+PRIORITY_RANK = {'Critical': 0, 'High': 1, 'Medium': 2, 'Low': 3}
+LEASE_DURATION = timedelta(minutes=15)
+
+
+def queue_key(emp_data, doc_info):
+    """Sort key: priority, then earliest start date, then oldest upload"""
+    return (
+        PRIORITY_RANK.get(doc_info['priority'], len(PRIORITY_RANK)),
+        emp_data['start_date'],
+        doc_info.get('uploaded') or datetime.max,
+    )
+
+
+def uploaded_documents(employees):
+    """(queue key, (employee id, document)) for every uploaded document, in queue order
+
+    Employees of an EmployeeStore still as its snapshot has them are read
+    from the snapshot's document columns in bulk; only the rest are loaded.
+    """
+    entries = []
+    if hasattr(employees, 'source_rows'):
+        ids = list(employees)
+        clean, rows = employees.source_rows(ids)
+        read = set()
+        if clean:
+            source = employees.source
+            found, irregular = source.uploaded_documents(rows)
+            for row, doc_name, priority, start_date, uploaded in found:
+                key = (PRIORITY_RANK.get(priority, len(PRIORITY_RANK)), start_date, uploaded or datetime.max)
+                entries.append((key, (source.ids[row], doc_name)))
+            read = {ids[i] for i, skip in zip(clean, irregular) if not skip}
+        records = employees.scan([emp_id for emp_id in ids if emp_id not in read])
+    else:
+        records = iter_employees(employees)
+    entries.extend((queue_key(emp_data, doc_info), (emp_id, doc_name))
+                   for emp_id, emp_data in records
+                   for doc_name, doc_info in emp_data['documents'].items() if doc_info['status'] == 'Uploaded')
+    entries.sort()
+    return entries
+
+
+class VerificationQueue:
+    """Org-wide queue of uploaded documents awaiting verification
+
+    Items are (employee id, document) pairs kept in a binary min-heap with a
+    position index, so pushes, re-prioritisations and removals of arbitrary
+    items are O(log n). Claimed items leave the heap and are held under a
+    time-limited lease until they are verified, rejected or released.
+    """
+
+    def __init__(self):
+        self._heap = []       # [(key, seq, item)]
+        self._position = {}   # item -> index in _heap
+        self._leases = {}     # item -> (verifier, expires_at, key)
+        self._seq = 0
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._heap)
+
+    def __contains__(self, item):
+        return item in self._position or item in self._leases
+
+    # Heap primitives
+    def _swap(self, i, j):
+        heap = self._heap
+        heap[i], heap[j] = heap[j], heap[i]
+        self._position[heap[i][2]] = i
+        self._position[heap[j][2]] = j
+
+    def _sift_up(self, i):
+        while i > 0:
+            parent = (i - 1) // 2
+            if self._heap[i] < self._heap[parent]:
+                self._swap(i, parent)
+                i = parent
+            else:
+                break
+
+    def _sift_down(self, i):
+        size = len(self._heap)
+        while True:
+            smallest = i
+            for child in (2 * i + 1, 2 * i + 2):
+                if child < size and self._heap[child] < self._heap[smallest]:
+                    smallest = child
+            if smallest == i:
+                break
+            self._swap(i, smallest)
+            i = smallest
+
+    def _insert(self, item, key):
+        self._seq += 1
+        self._heap.append((key, self._seq, item))
+        self._position[item] = len(self._heap) - 1
+        self._sift_up(len(self._heap) - 1)
+
+    def _delete(self, item):
+        i = self._position.pop(item)
+        last = self._heap.pop()
+        if i < len(self._heap):
+            self._heap[i] = last
+            self._position[last[2]] = i
+            self._sift_up(i)
+            self._sift_down(self._position[last[2]])
+
+    def _pop(self):
+        entry = self._heap[0]
+        self._delete(entry[2])
+        return entry
+
+    # Public API
+    def push(self, item, key):
+        """Add an item or update its position if it is already queued"""
+        with self._lock:
+            if item in self._leases:
+                verifier, expires_at, _ = self._leases[item]
+                self._leases[item] = (verifier, expires_at, key)
+            elif item in self._position:
+                self._delete(item)
+                self._insert(item, key)
+            else:
+                self._insert(item, key)
+
+    def remove(self, item):
+        """Drop an item that was verified, rejected or deleted"""
+        with self._lock:
+            if item in self._position:
+                self._delete(item)
+            self._leases.pop(item, None)
+
+    def remove_employee(self, emp_id):
+        """Drop every item belonging to an employee"""
+        with self._lock:
+            for item in [i for i in list(self._position) + list(self._leases) if i[0] == emp_id]:
+                self.remove(item)
+
+    def sync_employees(self, employees, ids):
+        """Re-derive the items of employees changed elsewhere, e.g. by another process:
+        documents no longer uploaded leave the queue, uploaded ones are added or re-keyed"""
+        with self._lock:
+            for emp_id in ids:
+                uploaded = {}
+                if emp_id in employees:
+                    emp_data = employees.peek(emp_id) if hasattr(employees, 'peek') else employees[emp_id]
+                    uploaded = {(emp_id, doc_name): queue_key(emp_data, doc_info)
+                                for doc_name, doc_info in emp_data['documents'].items()
+                                if doc_info['status'] == 'Uploaded'}
+                for item in [i for i in list(self._position) + list(self._leases) if i[0] == emp_id]:
+                    if item not in uploaded:
+                        self.remove(item)
+                for item, key in uploaded.items():
+                    self.push(item, key)
+
+    def peek(self, n):
+        """Return the next n unclaimed items without claiming them"""
+        with self._lock:
+            return [entry[2] for entry in heapq.nsmallest(n, self._heap)]
+
+    def expire_leases(self, now=None):
+        """Return items whose lease ran out to the queue"""
+        now = now or datetime.now()
+        with self._lock:
+            expired = [item for item, (_, expires_at, _) in self._leases.items() if expires_at <= now]
+            for item in expired:
+                _, _, key = self._leases.pop(item)
+                self._insert(item, key)
+            return expired
+
+    def claim(self, verifier, n, now=None, lease=LEASE_DURATION):
+        """Lease the next n items to a verifier so nobody else picks them up"""
+        now = now or datetime.now()
+        with self._lock:
+            self.expire_leases(now)
+            claimed = []
+            while self._heap and len(claimed) < n:
+                key, _, item = self._pop()
+                self._leases[item] = (verifier, now + lease, key)
+                claimed.append(item)
+            return claimed
+
+    def release(self, verifier, items=None):
+        """Give claimed items back to the queue"""
+        with self._lock:
+            for item, (holder, _, key) in list(self._leases.items()):
+                if holder == verifier and (items is None or item in items):
+                    del self._leases[item]
+                    self._insert(item, key)
+
+    def claimed_by(self, verifier, now=None):
+        """Items currently leased to a verifier"""
+        with self._lock:
+            self.expire_leases(now)
+            return [item for item, (holder, _, _) in self._leases.items() if holder == verifier]
+
+    def lease_count(self):
+        """Number of items currently claimed"""
+        with self._lock:
+            return len(self._leases)
+
+    def rebuild(self, employees, entries=None):
+        """Rebuild the queue from scratch from every uploaded document
+
+        `entries` may be a precomputed uploaded_documents(employees) list.
+        """
+        if entries is None:
+            entries = uploaded_documents(employees)
+        with self._lock:
+            self._heap = []
+            self._leases = {}
+            for key, item in entries:
+                self._seq += 1
+                self._heap.append((key, self._seq, item))
+            self._position = {entry[2]: i for i, entry in enumerate(self._heap)}